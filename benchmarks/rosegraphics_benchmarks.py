@@ -0,0 +1,810 @@
+"""
+Benchmarks for the hot paths of  rosegraphics.
+
+Run them from the top-level folder of this project, for example:
+    python benchmarks/rosegraphics_benchmarks.py batched_rendering
+or, to run (without a display) all the benchmarks that can run that way
+and save their results as JSON for comparing with later runs:
+    python benchmarks/rosegraphics_benchmarks.py --headless --json out.json
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SOURCE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "..", "src")
+sys.path.insert(0, SOURCE_FOLDER)
+import rosegraphics as rg  # noqa: E402
+
+# Importing rosegraphics (in a new process) should take at most this long.
+IMPORT_BUDGET_MILLISECONDS = 50
+
+
+def benchmark_batched_rendering(sizes=(1000, 10000, 50000), frames=10):
+    """
+    For each number of Circles in  sizes, moves every Circle on every frame
+    and reports frames per second with and without batch rendering.
+    Returns a list of dictionaries, one per (size, batch_rendering) pair.
+    """
+    results = []
+    for number_of_circles in sizes:
+        for batch_rendering in (False, True):
+            window = rg.RoseWindow(600, 400)
+            window.initial_canvas.batch_rendering = batch_rendering
+            circles = []
+            for k in range(number_of_circles):
+                circle = rg.Circle(rg.Point(k % 600, (k // 600) % 400), 4)
+                circle.fill_color = "blue"
+                circle.attach_to(window)
+                circles.append(circle)
+            window.render()
+
+            start = time.perf_counter()
+            for frame in range(frames):
+                step = 1 if frame % 2 == 0 else -1
+                for circle in circles:
+                    circle.move_by(step, step)
+                window.render()
+            seconds = time.perf_counter() - start
+            window.close()
+
+            results.append({"circles": number_of_circles,
+                            "batch_rendering": batch_rendering,
+                            "frames_per_second": frames / seconds})
+            print("{:>6} circles, batch_rendering={!s:5}: {:8.2f} frames/s"
+                  .format(number_of_circles, batch_rendering,
+                          frames / seconds))
+    return results
+
+
+def benchmark_memory(count=1000000):
+    """
+    Constructs  count  Points (and a tenth as many Circles and
+    Rectangles) and reports the memory that each one takes, in bytes.
+    Returns a dictionary from class name to bytes per shape.
+    """
+    makers = [("Point", count, lambda k: rg.Point(k, k)),
+              ("Circle", count // 10, lambda k: rg.Circle(rg.Point(k, k), 5)),
+              ("Rectangle", count // 10,
+               lambda k: rg.Rectangle(rg.Point(k, k), rg.Point(k + 1, k)))]
+    results = {}
+    for name, number, make in makers:
+        tracemalloc.start()
+        shapes = [make(k) for k in range(number)]
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del shapes
+        results[name] = size / number
+        print("{:>9}: {:7.1f} bytes each ({} of them)".format(
+            name, size / number, number))
+    return results
+
+
+def benchmark_turtle_spiral(iterations=500):
+    """
+    Runs the spiral of  m5e_loopy_turtles  (left 91, forward k, for k in
+    range(iterations)) twice:  pushing the pen, paint_bucket and speed
+    to the real Turtle before every move (as SimpleTurtle once did),
+    and pushing only the changes (as it does now).  Reports the time
+    and the number of state pushes of each.
+    Returns a list of two dictionaries, one per run.
+    """
+    window = rg.TurtleWindow()
+    window.tracer(100)
+    results = []
+    for pushes_only_changes in (False, True):
+        spiral_turtle = rg.SimpleTurtle("triangle")
+        spiral_turtle.pen = rg.Pen("magenta", 1)
+        real_turtle = spiral_turtle._turtle
+        counts = {"pushes": 0}
+        for name in ("pencolor", "pensize", "fillcolor", "speed"):
+            setattr(real_turtle, name,
+                    _counted(getattr(real_turtle, name), counts))
+
+        start = time.perf_counter()
+        for k in range(iterations):
+            if not pushes_only_changes:
+                spiral_turtle._pushed_state = None
+            spiral_turtle.left(91)
+            if not pushes_only_changes:
+                spiral_turtle._pushed_state = None
+            spiral_turtle.forward(k)
+        window.update()
+        seconds = time.perf_counter() - start
+
+        results.append({"pushes_only_changes": pushes_only_changes,
+                        "seconds": seconds,
+                        "state_pushes": counts["pushes"]})
+        print("pushes_only_changes={!s:5}: {:6.3f} seconds, {:5} pushes"
+              .format(pushes_only_changes, seconds, counts["pushes"]))
+    return results
+
+
+def _counted(method, counts):
+    """ Returns the given method, wrapped to count its calls in counts. """
+    def counted_method(*args):
+        counts["pushes"] += 1
+        return method(*args)
+    return counted_method
+
+
+def benchmark_spatial_index(count=100000, queries=1000):
+    """
+    Attaches  count  Circles and Rectangles, scattered over a headless
+    1000 x 1000 window, then reports the average time of  shapes_at
+    and  shapes_in  queries, in milliseconds.
+    Returns a dictionary from query name to milliseconds per query.
+    """
+    generator = random.Random(0)
+    window = rg.RoseWindow(1000, 1000, backend="headless")
+    canvas = window.initial_canvas
+    for k in range(count):
+        x, y = generator.uniform(0, 1000), generator.uniform(0, 1000)
+        if k % 2 == 0:
+            shape = rg.Circle(rg.Point(x, y), generator.uniform(1, 10))
+        else:
+            shape = rg.Rectangle(rg.Point(x, y), rg.Point(x + 8, y + 5))
+        shape.attach_to(window)
+
+    start = time.perf_counter()
+    canvas.shapes_at(rg.Point(0, 0))
+    print("building the index: {:.3f} seconds".format(
+        time.perf_counter() - start))
+
+    points = [rg.Point(generator.uniform(0, 1000), generator.uniform(0, 1000))
+              for _ in range(queries)]
+    rectangles = [rg.Rectangle(point, rg.Point(point.x + 40, point.y + 30))
+                  for point in points]
+    results = {}
+    for name, query, arguments in (("shapes_at", canvas.shapes_at, points),
+                                   ("shapes_in", canvas.shapes_in,
+                                    rectangles)):
+        start = time.perf_counter()
+        for argument in arguments:
+            query(argument)
+        milliseconds = 1000 * (time.perf_counter() - start) / queries
+        results[name] = milliseconds
+        print("{:>9}: {:.3f} ms per query ({} shapes)".format(
+            name, milliseconds, count))
+    return results
+
+
+def benchmark_draw_undraw(sizes=(1000, 10000, 100000)):
+    """
+    For each number of Circles in  sizes, attaches that many Circles to a
+    headless window, renders it, and detaches them all again.  Reports
+    the time per Circle of each of the three, in microseconds.
+    Returns a list of dictionaries, one per size.
+    """
+    results = []
+    for number_of_circles in sizes:
+        window = rg.RoseWindow(600, 400, backend="headless")
+        circles = [rg.Circle(rg.Point(k % 600, (k // 600) % 400), 4)
+                   for k in range(number_of_circles)]
+        times = {}
+        start = time.perf_counter()
+        for circle in circles:
+            circle.attach_to(window)
+        times["attach"] = time.perf_counter() - start
+        start = time.perf_counter()
+        window.render()
+        times["render"] = time.perf_counter() - start
+        start = time.perf_counter()
+        for circle in circles:
+            circle.detach_from(window)
+        times["detach"] = time.perf_counter() - start
+        window.close()
+
+        result = {"circles": number_of_circles}
+        for name, seconds in times.items():
+            result[name + "_microseconds"] = 1e6 * seconds / number_of_circles
+        results.append(result)
+        print("{:>6} circles: {:6.2f} / {:6.2f} / {:6.2f} microseconds each"
+              " to attach / render / detach".format(
+                  number_of_circles, result["attach_microseconds"],
+                  result["render_microseconds"],
+                  result["detach_microseconds"]))
+    return results
+
+
+def benchmark_render(count=5000, frames=10):
+    """
+    Attaches  count  Circles to a headless window, then reports the
+    frames per second of rendering it when none of the Circles move
+    and when all of them move on every frame.
+    Returns a dictionary from "static" and "moving" to frames per second.
+    """
+    results = {}
+    for name in ("static", "moving"):
+        window = rg.RoseWindow(600, 400, backend="headless")
+        circles = []
+        for k in range(count):
+            circle = rg.Circle(rg.Point(k % 600, (k // 600) % 400), 4)
+            circle.fill_color = "blue"
+            circle.attach_to(window)
+            circles.append(circle)
+        window.render()
+
+        start = time.perf_counter()
+        for frame in range(frames):
+            if name == "moving":
+                step = 1 if frame % 2 == 0 else -1
+                for circle in circles:
+                    circle.move_by(step, step)
+            window.render()
+        seconds = time.perf_counter() - start
+        window.close()
+
+        results[name] = frames / seconds
+        print("{:>6} circles, {:6}: {:10.2f} frames/s".format(
+            count, name, frames / seconds))
+    return results
+
+
+def benchmark_static_layer(count=5000, sprites=10, frames=20):
+    """
+    Attaches  count  background Circles and a few moving sprites to a
+    headless window, then reports the milliseconds per frame of moving
+    the sprites, rendering, and drawing the whole frame (as a display
+    would), with the background drawn as usual and as a static layer.
+    Returns a dictionary from "dynamic" and "static" to milliseconds.
+    """
+    results = {}
+    for name in ("dynamic", "static"):
+        window = rg.RoseWindow(600, 400, backend="headless")
+        for k in range(count):
+            circle = rg.Circle(rg.Point(k % 600, (k // 600) % 400 * 7), 4)
+            circle.fill_color = "tan"
+            circle.attach_to(window)
+        if name == "static":
+            window.initial_canvas.make_static()
+        moving = []
+        for k in range(sprites):
+            sprite = rg.Square(rg.Point(60 * k, 200), 20)
+            sprite.fill_color = "red"
+            sprite.attach_to(window)
+            moving.append(sprite)
+        window.render()
+
+        start = time.perf_counter()
+        for frame in range(frames):
+            for sprite in moving:
+                sprite.move_by(1, 0)
+            window.render()
+            window.initial_canvas._tkinter_canvas.rasterize()
+        milliseconds = 1000 * (time.perf_counter() - start) / frames
+        window.close()
+
+        results[name] = milliseconds
+        print("{:>6} background circles, {:7}: {:8.2f} ms/frame".format(
+            count, name, milliseconds))
+    return results
+
+
+def benchmark_text_rendering(count=1000, frames=20):
+    """
+    Attaches  count  Texts to a headless window, then changes the text
+    of each one and renders the window on every frame.  Reports the
+    frames per second.
+    Returns a dictionary with the number of Texts and frames per second.
+    """
+    window = rg.RoseWindow(600, 400, backend="headless")
+    texts = []
+    for k in range(count):
+        text = rg.Text(rg.Point(30 * (k % 20), 10 * (k // 20 % 40)), "")
+        text.font_family = "Arial"
+        text.font_size = 10 + k % 5
+        text.is_bold = bool(k % 2)
+        text.attach_to(window)
+        texts.append(text)
+    window.render()
+
+    start = time.perf_counter()
+    for frame in range(frames):
+        for k, text in enumerate(texts):
+            text.text = str(frame * count + k)
+        window.render()
+    seconds = time.perf_counter() - start
+    window.close()
+
+    print("{:>6} Texts: {:10.2f} frames/s".format(count, frames / seconds))
+    return {"texts": count, "frames_per_second": frames / seconds}
+
+
+def benchmark_serialize(count=10000, repetitions=5):
+    """
+    Attaches  count  shapes of several kinds to a headless window and
+    reports the average time to serialize them, in milliseconds.
+    Returns a dictionary with the number of shapes and milliseconds.
+    """
+    window = rg.RoseWindow(600, 400, backend="headless")
+    for shape in _some_shapes(count):
+        shape.attach_to(window)
+
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        rg._serialize_shapes(window)
+    milliseconds = 1000 * (time.perf_counter() - start) / repetitions
+    window.close()
+
+    print("{:>6} shapes: {:8.2f} ms to serialize".format(count, milliseconds))
+    return {"shapes": count, "milliseconds": milliseconds}
+
+
+def benchmark_scene_recording(count=1000, frames=1000):
+    """
+    Records  count  Circles on a headless window, all of which move on
+    each of  frames  frames (so count * frames change events), then
+    replays the recording.  Reports the milliseconds per frame without
+    and with recording, the bytes per event, the seconds to open the
+    recording and to iterate over all its events, and the milliseconds
+    to reconstruct the scene at the last frame and at the middle one.
+    Returns a dictionary with those results.
+    """
+    window = rg.RoseWindow(600, 400, backend="headless")
+    circles = []
+    for k in range(count):
+        circle = rg.Circle(rg.Point(k % 600, k // 600), 3)
+        circle.attach_to(window)
+        circles.append(circle)
+
+    def move_and_render(frames):
+        start = time.perf_counter()
+        for frame in range(frames):
+            for circle in circles:
+                circle.move_by(1, 0)
+            window.render()
+        return 1000 * (time.perf_counter() - start) / frames
+
+    filename = os.path.join(tempfile.mkdtemp(), "benchmark.scene")
+    results = {"events": count * frames,
+               "plain_milliseconds_per_frame": move_and_render(frames // 10)}
+    window.start_recording(filename)
+    results["recording_milliseconds_per_frame"] = move_and_render(frames)
+    window.stop_recording()
+    results["bytes_per_event"] = os.path.getsize(filename) / (count * frames)
+
+    start = time.perf_counter()
+    replayer = rg.SceneReplayer(filename)
+    results["open_seconds"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in replayer.events():
+        pass
+    results["events_seconds"] = time.perf_counter() - start
+    for name, frame in (("last", -1), ("middle", frames // 2)):
+        start = time.perf_counter()
+        replayer.scene_at(frame)
+        results[name + "_frame_milliseconds"] = \
+            1000 * (time.perf_counter() - start)
+    os.remove(filename)
+    os.rmdir(os.path.dirname(filename))
+    window.close()
+
+    print("{} events; ms/frame: {:.2f} plain, {:.2f} recording;"
+          " {:.1f} bytes/event".format(
+              results["events"], results["plain_milliseconds_per_frame"],
+              results["recording_milliseconds_per_frame"],
+              results["bytes_per_event"]))
+    print("open: {:.2f} s, all events: {:.2f} s, scene at last frame:"
+          " {:.1f} ms, at middle frame: {:.1f} ms".format(
+              results["open_seconds"], results["events_seconds"],
+              results["last_frame_milliseconds"],
+              results["middle_frame_milliseconds"]))
+    return results
+
+
+def benchmark_equality(count=100000):
+    """
+    Compares each of  count  shapes of several kinds with an equal copy
+    and with a different shape of the same kind, and reports the time
+    per comparison (with ==), in microseconds.  Then reports the time
+    to compare all the shapes with all the copies as scenes (multisets,
+    using hashing), in milliseconds.
+    Returns a dictionary from "equal" and "different" to microseconds,
+    and from "scene" to milliseconds.
+    """
+    shapes = list(_some_shapes(count))
+    copies = list(_some_shapes(count))
+    others = shapes[4:] + shapes[:4]  # Different shapes of the same kind
+    results = {}
+    for name, compared_with in (("equal", copies), ("different", others)):
+        start = time.perf_counter()
+        for shape, other in zip(shapes, compared_with):
+            shape == other  # noqa: B015
+        microseconds = 1e6 * (time.perf_counter() - start) / count
+        results[name] = microseconds
+        print("{:>9}: {:6.2f} microseconds per comparison".format(
+            name, microseconds))
+
+    copies.reverse()
+    start = time.perf_counter()
+    is_same_scene = collections.Counter(shapes) == collections.Counter(copies)
+    milliseconds = 1000 * (time.perf_counter() - start)
+    results["scene"] = milliseconds
+    print("{:>9}: {:6.1f} ms to compare scenes of {} shapes ({})".format(
+        "scene", milliseconds, count, "same" if is_same_scene else "DIFFER"))
+    return results
+
+
+def _some_shapes(count):
+    """
+    Yields  count  shapes (Circles, Rectangles, Lines and Texts in turn),
+    the same ones each time this is called.
+    """
+    for k in range(count):
+        x, y = k % 600, (k // 600) % 400
+        kind = k % 4
+        if kind == 0:
+            shape = rg.Circle(rg.Point(x, y), 5)
+            shape.fill_color = "blue"
+        elif kind == 1:
+            shape = rg.Rectangle(rg.Point(x, y), rg.Point(x + 10, y + 5))
+            shape.outline_thickness = 2
+        elif kind == 2:
+            shape = rg.Line(rg.Point(x, y), rg.Point(x + 20, y + 20))
+            shape.color = "red"
+        else:
+            shape = rg.Text(rg.Point(x, y), "Shape {}".format(k))
+        yield shape
+
+
+def benchmark_coordinates(count=10000, frames=10):
+    """
+    Computes the drawing coordinates of  count  shapes of every kind
+    (as each render does) on each of  frames  frames, and reports the
+    time per shape in microseconds, how many shapes (e.g. Points) were
+    constructed along the way per frame, and the peak memory (in
+    kilobytes) allocated while computing one frame's coordinates.
+    Returns a dictionary with those results.
+    """
+    kinds = [lambda x, y: rg.Circle(rg.Point(x, y), 5),
+             lambda x, y: rg.Square(rg.Point(x, y), 8),
+             lambda x, y: rg.Rectangle(rg.Point(x, y), rg.Point(x + 9, y)),
+             lambda x, y: rg.Ellipse(rg.Point(x + 9, y), rg.Point(x, y + 4)),
+             lambda x, y: rg.Line(rg.Point(x, y), rg.Point(x + 5, y + 5)),
+             lambda x, y: rg.Text(rg.Point(x, y), "text"),
+             lambda x, y: rg.Point(x, y)]
+    shapes = [kinds[k % len(kinds)](k % 600, k // 600 % 400)
+              for k in range(count)]
+
+    def compute_coordinates():
+        for shape in shapes:
+            shape._get_coordinates_for_drawing()
+
+    constructed = _count_shape_constructions(compute_coordinates)
+    tracemalloc.start()
+    compute_coordinates()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(frames):
+        compute_coordinates()
+    microseconds = 1e6 * (time.perf_counter() - start) / (frames * count)
+
+    print("{:>6} shapes: {:5.2f} microseconds each, {} shapes constructed"
+          " and {:.1f} KB peak per frame".format(
+              count, microseconds, constructed, peak / 1024))
+    return {"shapes": count, "microseconds_per_shape": microseconds,
+            "shapes_constructed_per_frame": constructed,
+            "peak_kilobytes_per_frame": peak / 1024}
+
+
+def _count_shape_constructions(function):
+    """
+    Calls the given function and returns how many Shapes (including
+    Points) were constructed while it ran.
+    """
+    counts = {"shapes": 0}
+    constructor = rg._Shape.__init__
+
+    def construct_and_count(shape, *args):
+        counts["shapes"] += 1
+        constructor(shape, *args)
+
+    # type.__setattr__ gets past  __FreezeClass__, which forbids this.
+    type.__setattr__(rg._Shape, "__init__", construct_and_count)
+    try:
+        function()
+    finally:
+        type.__setattr__(rg._Shape, "__init__", constructor)
+    return counts["shapes"]
+
+
+def benchmark_headless_turtles(spiral_iterations=500, repetitions=20):
+    """
+    Runs both examples of  m5e_loopy_turtles  (six squares, and a
+    spiral of  spiral_iterations  segments)  repetitions  times on a
+    headless TurtleWindow, once moving the turtles one step at a time and
+    once recording their strokes (see SimpleTurtle.start_recording).
+    Reports the average time of each, in milliseconds.
+    Returns a dictionary from "stepping" and "recording" to milliseconds.
+    """
+    results = {}
+    for name in ("stepping", "recording"):
+        rg.TurtleWindow(backend="headless")
+        start = time.perf_counter()
+        for _ in range(repetitions):
+            _draw_loopy_turtles(name == "recording", spiral_iterations)
+        milliseconds = 1000 * (time.perf_counter() - start) / repetitions
+
+        results[name] = milliseconds
+        print("{:>9}: {:7.3f} ms".format(name, milliseconds))
+    return results
+
+
+def _draw_loopy_turtles(is_recording, spiral_iterations):
+    """ Draws what  m5e_loopy_turtles  draws, on the current TurtleWindow. """
+    blue_turtle = rg.SimpleTurtle("turtle")
+    blue_turtle.pen = rg.Pen("midnight blue", 3)
+    blue_turtle.speed = 20
+    spiral_turtle = rg.SimpleTurtle("triangle")
+    spiral_turtle.pen = rg.Pen("magenta", 1)
+    if is_recording:
+        blue_turtle.start_recording()
+        spiral_turtle.start_recording()
+
+    size = 300
+    for _ in range(6):
+        blue_turtle.draw_square(size)
+        blue_turtle.pen_up()
+        blue_turtle.right(45)
+        blue_turtle.forward(10)
+        blue_turtle.left(45)
+        blue_turtle.pen_down()
+        size = size - 12
+
+    spiral_turtle.backward(50)
+    for k in range(spiral_iterations):
+        spiral_turtle.left(91)
+        spiral_turtle.forward(k)
+
+    if is_recording:
+        blue_turtle.stop_recording()
+        spiral_turtle.stop_recording()
+
+
+def benchmark_window_construction(count=200):
+    """
+    Constructs and closes  count  headless RoseWindows and reports the
+    time per window, in milliseconds.
+    Returns a dictionary with the number of windows and milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(count):
+        window = rg.RoseWindow(400, 300, backend="headless")
+        window.close()
+    milliseconds = 1000 * (time.perf_counter() - start) / count
+
+    print("{:>6} windows: {:6.3f} ms each".format(count, milliseconds))
+    return {"windows": count, "milliseconds": milliseconds}
+
+
+def benchmark_window_open_close(count=50):
+    """
+    Opens a RoseWindow, draws a Circle on it, and closes it,  count
+    times:  as by default (waiting RoseWindow.raise_delay before showing
+    each window, and re-using closed windows), without waiting, and
+    without waiting or re-using.  Reports the windows per second of each.
+    Returns a list of dictionaries, one per way.
+    """
+    raise_delay, pool_size = rg.RoseWindow.raise_delay, rg.RoseWindow.pool_size
+    results = []
+    for name, delay, size in (("default", raise_delay, pool_size),
+                              ("no_delay", 0, pool_size),
+                              ("no_delay_no_pool", 0, 0)):
+        rg.RoseWindow.raise_delay, rg.RoseWindow.pool_size = delay, size
+        rg.RoseWindow().close()  # So that every timed window is not first
+        start = time.perf_counter()
+        for _ in range(count):
+            window = rg.RoseWindow(400, 300)
+            rg.Circle(rg.Point(200, 150), 50).attach_to(window)
+            window.render()
+            window.close()
+        seconds = time.perf_counter() - start
+
+        results.append({"way": name, "raise_delay": delay, "pool_size": size,
+                        "windows_per_second": count / seconds})
+        print("{:>16}: {:8.2f} windows/s".format(name, count / seconds))
+    rg.RoseWindow.raise_delay, rg.RoseWindow.pool_size = raise_delay, pool_size
+    return results
+
+
+def benchmark_asyncio_latency(clicks=100, frames=300, count=200):
+    """
+    Drives a RoseWindow from asyncio (see RoseWindow.next_click and
+    RoseWindow.render_async) and reports, in milliseconds:
+      -- how long  await window.next_click()  takes to return after
+         a (synthetic) click, made at random moments;
+      -- how late a task that sleeps 1 ms at a time wakes up, while
+         another task moves  count  Circles and renders them with
+         render_async, as fast as it can, for  frames  frames;
+    and also those frames per second and the percentage of a CPU that
+    the event pump uses while the window is idle.
+    Returns a dictionary with those results.
+    """
+    return asyncio.run(_asyncio_latency(clicks, frames, count))
+
+
+async def _asyncio_latency(clicks, frames, count):
+    window = rg.RoseWindow(400, 300)
+    rg.start_asyncio_event_pump()
+    latencies = []
+    for _ in range(clicks):
+        await asyncio.sleep(random.uniform(0, 0.02))
+        click = asyncio.ensure_future(window.next_click())
+        await asyncio.sleep(0)  # So that it is waiting for the click
+        start = time.perf_counter()
+        window.toplevel.event_generate("<Button-1>", x=10, y=20,
+                                       when="tail")
+        await click
+        latencies.append(1000 * (time.perf_counter() - start))
+
+    circles = []
+    for k in range(count):
+        circle = rg.Circle(rg.Point(2 * k % 400, 2 * k // 400 * 10), 5)
+        circle.attach_to(window)
+        circles.append(circle)
+    lateness = []
+
+    async def tick():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lateness.append(1000 * (time.perf_counter() - start - 0.001))
+
+    ticker = asyncio.ensure_future(tick())
+    start = time.perf_counter()
+    for frame in range(frames):
+        for circle in circles:
+            circle.move_by(1 if frame % 2 == 0 else -1, 0)
+        await window.render_async()
+    frames_per_second = frames / (time.perf_counter() - start)
+    ticker.cancel()
+
+    start = time.process_time()
+    await asyncio.sleep(1)
+    idle_cpu = 100 * (time.process_time() - start)
+    window.close()
+
+    latencies.sort()
+    lateness.sort()
+    results = {"click_median_ms": latencies[len(latencies) // 2],
+               "click_max_ms": latencies[-1],
+               "tick_lateness_median_ms": lateness[len(lateness) // 2],
+               "tick_lateness_max_ms": lateness[-1],
+               "frames_per_second": frames_per_second,
+               "idle_cpu_percent": idle_cpu}
+    print("click to next_click: {:.2f} ms median, {:.2f} ms max".format(
+        results["click_median_ms"], results["click_max_ms"]))
+    print("1 ms ticks while rendering {} circles at {:.1f} frames/s:"
+          " {:.2f} ms late median, {:.2f} ms max".format(
+              count, frames_per_second, results["tick_lateness_median_ms"],
+              results["tick_lateness_max_ms"]))
+    print("idle event pump: {:.2f}% of a CPU".format(idle_cpu))
+    return results
+
+
+def benchmark_import_time(repetitions=5):
+    """
+    Imports rosegraphics in  repetitions  new Python processes (with
+    python -X importtime) and reports the fastest import, in
+    milliseconds, compared with  IMPORT_BUDGET_MILLISECONDS, and which
+    of tkinter, turtle and numpy the import imported.  As in everyday
+    use, the bytecode of rosegraphics is cached (by a first, untimed
+    import), so that compiling it is not timed.
+    Returns a dictionary with those results.
+    """
+    code = ("import sys, rosegraphics; print(' '.join(sorted({'tkinter',"
+            " 'turtle', 'numpy'} & set(sys.modules))))")
+    environment = dict(os.environ)
+    environment.pop("PYTHONDONTWRITEBYTECODE", None)
+    times = []
+    for _ in range(repetitions + 1):
+        process = subprocess.run([sys.executable, "-X", "importtime",
+                                  "-c", code],
+                                 cwd=SOURCE_FOLDER, env=environment,
+                                 capture_output=True, text=True, check=True)
+        for line in process.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == "rosegraphics":
+                times.append(int(fields[1]) / 1000)  # Microseconds to ms
+    milliseconds = min(times[1:])
+    imported = process.stdout.split()
+
+    print("import rosegraphics: {:.1f} ms (budget {} ms); imported {}"
+          .format(milliseconds, IMPORT_BUDGET_MILLISECONDS,
+                  ", ".join(imported) or "none of tkinter, turtle, numpy"))
+    return {"milliseconds": milliseconds,
+            "budget_milliseconds": IMPORT_BUDGET_MILLISECONDS,
+            "within_budget": milliseconds <= IMPORT_BUDGET_MILLISECONDS,
+            "imported": imported}
+
+
+BENCHMARKS = {"batched_rendering": benchmark_batched_rendering,
+              "memory": benchmark_memory,
+              "turtle_spiral": benchmark_turtle_spiral,
+              "spatial_index": benchmark_spatial_index,
+              "draw_undraw": benchmark_draw_undraw,
+              "render": benchmark_render,
+              "static_layer": benchmark_static_layer,
+              "text_rendering": benchmark_text_rendering,
+              "serialize": benchmark_serialize,
+              "scene_recording": benchmark_scene_recording,
+              "equality": benchmark_equality,
+              "coordinates": benchmark_coordinates,
+              "headless_turtles": benchmark_headless_turtles,
+              "window_construction": benchmark_window_construction,
+              "window_open_close": benchmark_window_open_close,
+              "asyncio_latency": benchmark_asyncio_latency,
+              "import_time": benchmark_import_time}
+
+# These open real windows, so they need a display.
+NEEDS_DISPLAY = ("batched_rendering", "turtle_spiral", "window_open_close",
+                 "asyncio_latency")
+
+
+def run_benchmarks(names):
+    """
+    Runs the benchmarks with the given names (in the given order) and
+    returns a dictionary (that can be written as JSON) with their results
+    and a description of the machine and Python that ran them.
+    """
+    results = {}
+    for name in names:
+        print("---", name, "---")
+        results[name] = BENCHMARKS[name]()
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "processor": platform.machine(),
+            "numpy": _numpy_version(),
+            "results": results}
+
+
+def _numpy_version():
+    """ Returns the version of numpy, or None if it is not installed. """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy.__version__
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs benchmarks of rosegraphics.")
+    parser.add_argument("names", nargs="*",
+                        help="which benchmarks to run (default: all): " +
+                        ", ".join(BENCHMARKS))
+    parser.add_argument("--headless", action="store_true",
+                        help="skip the benchmarks that need a display")
+    parser.add_argument("--json", default=None,
+                        help="a file in which to save the results as JSON")
+    arguments = parser.parse_args()
+
+    unknown = [name for name in arguments.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error("no such benchmark: " + ", ".join(unknown))
+    names = arguments.names or list(BENCHMARKS)
+    if arguments.headless:
+        names = [name for name in names if name not in NEEDS_DISPLAY]
+    report = run_benchmarks(names)
+    if arguments.json:
+        with open(arguments.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Runs many students' copies of the  m*.py  modules, several at a time
+(each in its own process, without a display), and writes a report of
+what each module printed and drew:  one JSON object per line, written
+as soon as that module finishes.
+
+Run it from the top-level folder of this project, for example:
+    python grading/rosegraphics_batch_runner.py submissions report.jsonl
+where each sub-folder of  submissions  is one student's submission
+(e.g. their copy of this project).  Use  --help  for the options.
+"""
+
+import argparse
+import collections
+import contextlib
+import fnmatch
+import io
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import runpy
+import sys
+import time
+import traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "src"))
+import rosegraphics as rg  # noqa: E402
+
+# Printed output beyond this many characters is cut off in the report.
+MAXIMUM_OUTPUT_LENGTH = 100000
+
+
+def find_modules(directory, pattern="m*.py"):
+    """
+    Returns a list of (submission, path) pairs, one per module to run:
+    each file whose name matches  pattern  in each sub-folder (at any
+    depth) of the given directory, where the submission is the name of
+    that sub-folder.  If the directory has no sub-folders, it is itself
+    the (only) submission.
+    """
+    directory = os.path.abspath(directory)
+    submissions = sorted(name for name in os.listdir(directory)
+                         if _is_visible_folder(os.path.join(directory,
+                                                             name)))
+    if not submissions:
+        submissions = [""]
+
+    modules = []
+    for submission in submissions:
+        top = os.path.join(directory, submission)
+        for folder, folders, files in os.walk(top):
+            folders[:] = sorted(name for name in folders
+                                if _is_visible_folder(os.path.join(folder,
+                                                                    name)))
+            for name in sorted(fnmatch.filter(files, pattern)):
+                modules.append((submission or os.path.basename(directory),
+                                os.path.join(folder, name)))
+    return modules
+
+
+def _is_visible_folder(path):
+    name = os.path.basename(path)
+    return (os.path.isdir(path) and not name.startswith(".")
+            and name != "__pycache__")
+
+
+def run_submissions(directory, report, pattern="m*.py", workers=None,
+                    timeout=30.0, image_folder=None):
+    """
+    Runs every module that  find_modules  finds, at most  workers  at a
+    time (default: one per CPU), each in a new process that is killed if
+    it runs for more than  timeout  seconds.  Writes one line of JSON per
+    module to the  report  (an open text file), in the order in which
+    they finish.  If  image_folder  is given, saves there a PNG image of
+    each window that each module drew on.
+    Returns a Counter from each status (ok, error, timeout, crashed)
+    to how many modules ended with that status.
+    """
+    tasks = collections.deque(find_modules(directory, pattern))
+    workers = workers or os.cpu_count() or 1
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    if image_folder:
+        # Absolute, since each module runs in its own folder.
+        image_folder = os.path.abspath(image_folder)
+        os.makedirs(image_folder, exist_ok=True)
+
+    statuses = collections.Counter()
+    running = {}  # receiver -> (process, submission, path, start, deadline)
+    while tasks or running:
+        while tasks and len(running) < workers:
+            submission, path = tasks.popleft()
+            receiver, sender = context.Pipe(duplex=False)
+            image_prefix = None
+            if image_folder:
+                image_prefix = os.path.join(image_folder, "{}__{}".format(
+                    submission, os.path.splitext(os.path.basename(path))[0]))
+            process = context.Process(target=_run_module,
+                                      args=(path, sender, image_prefix),
+                                      daemon=True)
+            start = time.perf_counter()
+            process.start()
+            sender.close()  # So that receiving fails if the process dies
+            running[receiver] = (process, submission, path, start,
+                                 start + timeout)
+
+        now = time.perf_counter()
+        wait_for = max(min(task[4] for task in running.values()) - now, 0)
+        ready = multiprocessing.connection.wait(list(running), wait_for)
+        now = time.perf_counter()
+        for receiver in list(running):
+            process, submission, path, start, deadline = running[receiver]
+            if receiver in ready:
+                try:
+                    result = receiver.recv()
+                except EOFError:
+                    result = {"status": "crashed",
+                              "exit_code": process.exitcode}
+            elif now >= deadline:
+                process.kill()
+                result = {"status": "timeout"}
+            else:
+                continue
+            del running[receiver]
+            receiver.close()
+            process.join()
+
+            result["submission"] = submission
+            result["module"] = os.path.relpath(path, directory)
+            result["seconds"] = round(now - start, 3)
+            report.write(json.dumps(result, sort_keys=True) + "\n")
+            report.flush()
+            statuses[result["status"]] += 1
+    return statuses
+
+
+def _run_module(path, sender, image_prefix):
+    """
+    Runs (in this new process) the module at the given path as if it
+    were the main module, with headless windows, no keyboard input,
+    and its output captured.  Sends the result to the given connection.
+    """
+    os.environ["ROSEGRAPHICS_BACKEND"] = "headless"
+    rg._HeadlessTurtle._screen = None
+    rose_windows = _record_headless_rose_windows()
+    turtle_screens = _record_headless_turtle_screens()
+    folder = os.path.dirname(os.path.abspath(path))
+    os.chdir(folder)
+    sys.path.insert(0, folder)
+    sys.stdin = io.StringIO()
+    sys.argv = [path]
+
+    output = io.StringIO()
+    result = {"status": "ok"}
+    try:
+        with contextlib.redirect_stdout(output), \
+                contextlib.redirect_stderr(output):
+            runpy.run_path(path, run_name="__main__")
+    except SystemExit:
+        pass
+    except BaseException:
+        result["status"] = "error"
+        result["error"] = traceback.format_exc()
+
+    result["stdout"] = output.getvalue()[:MAXIMUM_OUTPUT_LENGTH]
+    # Failing to describe the drawings does not lose the rest either.
+    rose_windows = [window for window in rose_windows
+                    if window.initial_canvas is not None]
+    try:
+        result["scene"] = [rg._serialize_shapes(window)
+                           for window in rose_windows]
+        result["turtle_drawing"] = [
+            [kind, str(color), thickness,
+             [round(value, 2) for value in points]]
+            for turtle_screen in turtle_screens
+            for kind, color, thickness, points in turtle_screen.items]
+    except Exception:
+        result["scene_error"] = traceback.format_exc()
+
+    if image_prefix:
+        # Failing to save an image does not lose the rest of the result.
+        try:
+            for k, window in enumerate(rose_windows):
+                window.initial_canvas.save_image(
+                    "{}__{}.png".format(image_prefix, k + 1))
+            for k, turtle_screen in enumerate(turtle_screens):
+                turtle_screen.rasterize().save_png(
+                    "{}__turtle{}.png".format(
+                        image_prefix, "" if k == 0 else "_{}".format(k + 1)))
+        except Exception:
+            result["image_error"] = traceback.format_exc()
+    sender.send(result)
+
+
+def _record_headless_rose_windows():
+    """
+    Makes every headless RoseWindow constructed from now on (in this
+    process) be appended to the returned list.
+    """
+    windows = []
+    constructor = rg._HeadlessRoseWindow.__init__
+
+    def construct_and_record(window, *args, **kwargs):
+        constructor(window, *args, **kwargs)
+        windows.append(window)
+
+    rg._HeadlessRoseWindow.__init__ = construct_and_record
+    return windows
+
+
+def _record_headless_turtle_screens():
+    """
+    Makes every headless turtle screen constructed from now on (in this
+    process) -- by a headless TurtleWindow, or by a headless SimpleTurtle
+    constructed without one -- be appended to the returned list.
+    """
+    screens = []
+    constructor = rg._HeadlessTurtleScreen.__init__
+
+    def construct_and_record(screen, *args, **kwargs):
+        constructor(screen, *args, **kwargs)
+        screens.append(screen)
+
+    rg._HeadlessTurtleScreen.__init__ = construct_and_record
+    return screens
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs students' modules and reports what they did.")
+    parser.add_argument("directory",
+                        help="a folder with one sub-folder per submission")
+    parser.add_argument("report", nargs="?", default="-",
+                        help="the JSONL file to write (default: stdout)")
+    parser.add_argument("--pattern", default="m*.py",
+                        help="which modules to run (default: m*.py)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="how many to run at once (default: #CPUs)")
+    parser.add_argument("--timeout", type=float, default=30.0,
+                        help="seconds allowed per module (default: 30)")
+    parser.add_argument("--images", default=None,
+                        help="a folder in which to save PNGs of drawings")
+    arguments = parser.parse_args()
+
+    if arguments.report == "-":
+        report = contextlib.nullcontext(sys.stdout)
+    else:
+        report = open(arguments.report, "w", encoding="utf-8")
+    start = time.perf_counter()
+    with report as file:
+        statuses = run_submissions(arguments.directory, file,
+                                   arguments.pattern, arguments.workers,
+                                   arguments.timeout, arguments.images)
+    print("{} modules in {:.1f} seconds: {}".format(
+        sum(statuses.values()), time.perf_counter() - start,
+        ", ".join("{} {}".format(count, status)
+                  for status, count in sorted(statuses.items()))),
+        file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
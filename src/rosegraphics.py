@@ -40,10 +40,64 @@ Authors: David Mutchler, Mark Hays, Michael Wollowswki, Matt Boutell,
          First completed version: September 2014.
 """
 
-import tkinter
-from tkinter import font as tkinter_font
 import time
-import turtle
+import collections
+import re
+import os
+import math
+import struct
+import zlib
+import json
+import sys
+import operator
+import bisect
+import weakref
+import warnings
+import numbers
+import textwrap
+
+# ----------------------------------------------------------------------
+# tkinter (with tkinter.font), turtle and numpy are imported only when
+# first needed:  by the first window or turtle that is drawn by tkinter,
+# and by the first ShapeBatch.  So importing rosegraphics is fast, and
+# works even where Tk is not installed (e.g. for headless windows).
+# ----------------------------------------------------------------------
+tkinter = None
+tkinter_font = None
+turtle = None
+numpy = None  # Optional:  needed only for ShapeBatch
+asyncio = None  # Needed only by the asyncio integration
+
+
+def _import_tkinter():
+    global tkinter, tkinter_font
+    if tkinter is None:
+        from tkinter import font as tkinter_font
+        import tkinter
+
+
+def _import_turtle():
+    global turtle
+    if turtle is None:
+        _import_tkinter()
+        import turtle
+
+
+def _import_asyncio():
+    global asyncio
+    if asyncio is None:
+        import asyncio
+
+
+def _import_numpy():
+    """ Returns True if numpy could be imported (it is optional). """
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+    return True
 
 
 # ----------------------------------------------------------------------
@@ -55,6 +109,108 @@ import turtle
 _master_Tk = None
 
 
+# ----------------------------------------------------------------------
+# Closed RoseWindows that can be re-used, as (Toplevel, tkinter.Canvas or
+# None) pairs, at most  RoseWindow.pool_size  of them.
+# ----------------------------------------------------------------------
+_window_pool = []
+
+
+def _configure(widget, **options):
+    """
+    Configures the given tkinter widget with the given options,
+    where an option whose value is None is reset to its default.
+    """
+    for name, value in options.items():
+        if value is None:
+            options[name] = widget.configure(name)[3]  # The default
+    widget.configure(**options)
+
+
+# ----------------------------------------------------------------------
+# In asyncio programs, a task on the event loop handles the events of
+# all the RoseWindows (see  start_asyncio_event_pump).  These are the
+# running such tasks, keyed by their event loops.
+# ----------------------------------------------------------------------
+_asyncio_event_pumps = {}
+
+
+def start_asyncio_event_pump(min_interval=0.001, max_interval=0.01):
+    """
+    Makes the running asyncio event loop also handle the events of all
+    the RoseWindows (mouse clicks, redrawing, etc), so that asyncio
+    code can use them without ever blocking (see  RoseWindow.next_click
+    and  RoseWindow.render_async, which call this function).
+    Returns the asyncio Task that does that (the same one each time).
+
+    The Task handles all the waiting events, then lets other tasks run
+    for  min_interval  seconds, doubling that (up to  max_interval)
+    each time that there were no events, so an idle window costs
+    almost nothing and a click waits at most  max_interval  seconds.
+    Example:
+       async def main():
+           window = rg.RoseWindow()
+           rg.start_asyncio_event_pump()
+           await serve_forever()  # Meanwhile, the window stays alive
+       asyncio.run(main())
+
+      :type  min_interval:  float
+      :type  max_interval:  float
+    """
+    _import_asyncio()
+    loop = asyncio.get_running_loop()
+    pump = _asyncio_event_pumps.get(loop)
+    if pump is None:
+        pump = loop.create_task(_pump_tk_events(min_interval,
+                                                max_interval))
+        _asyncio_event_pumps[loop] = pump
+        pump.add_done_callback(
+            lambda task: _asyncio_event_pumps.pop(loop, None))
+    return pump
+
+
+async def _pump_tk_events(min_interval, max_interval):
+    flags = tkinter._tkinter.ALL_EVENTS | tkinter._tkinter.DONT_WAIT
+    interval = min_interval
+    while _master_Tk is not None:
+        handled = 0
+        try:
+            # At most 1000 at a time, so that other tasks are not starved.
+            while handled < 1000 and _master_Tk.tk.dooneevent(flags):
+                handled = handled + 1
+        except tkinter.TclError:  # Tk itself was destroyed
+            return
+        if handled:
+            interval = min_interval
+        else:
+            interval = min(2 * interval, max_interval)
+        await asyncio.sleep(interval)
+
+
+# ----------------------------------------------------------------------
+# RoseWindows are drawn either by tkinter (the default) or, if the
+# environment variable  ROSEGRAPHICS_BACKEND  is "headless" (or the
+# window is constructed with  backend="headless"), by a software
+# rasterizer that needs no display.  See  _HeadlessRoseWindow  below.
+# ----------------------------------------------------------------------
+_BACKENDS = ("tkinter", "headless")
+
+
+def _backend_name(backend=None):
+    """
+    Returns the name of the backend to use: the given one if not None,
+    else the one in the environment variable  ROSEGRAPHICS_BACKEND,
+    else "tkinter".
+    """
+    if backend is None:
+        backend = os.environ.get("ROSEGRAPHICS_BACKEND") or "tkinter"
+    backend = backend.lower()
+    if backend not in _BACKENDS:
+        msg = 'The rosegraphics backend must be one of {}, not "{}".'
+        raise ValueError(msg.format(", ".join(_BACKENDS), backend))
+    return backend
+
+
 # ----------------------------------------------------------------------
 # RoseWindow is the top-level object.  It starts with a single RoseCanvas.
 # ----------------------------------------------------------------------
@@ -71,6 +227,7 @@ class RoseWindow(object):
 
     window = rg.RoseWindow(400, 300)  # 400 wide by 300 tall
     window = rg.RoseWindow(400, 300, "Funny window")  # with a title
+    window = rg.RoseWindow(backend="headless")  # drawn without a display
 
     Instance variables include:
 
@@ -78,11 +235,44 @@ class RoseWindow(object):
       height: width of this window (in pixels)
       title:  displayed on the window's bar
       widgets: the things attached to this window
+
+    Class variables (for programs that open many windows) include:
+
+      raise_delay:  Seconds to wait before showing each window after
+      the first, which helps it appear on top of other windows (e.g.
+      of an IDE).  Set it to 0 to open windows without waiting:
+         rg.RoseWindow.raise_delay = 0
+
+      pool_size:  How many closed windows to keep (hidden) for re-use,
+      so that opening another window is quicker.  0 means none.
+
+      headless_animation_seconds:  How much animation time  run_animation
+      runs on a headless window when it is not given  seconds  (since no
+      one can close a headless window to stop it).
     """
+    raise_delay = 0.1
+    pool_size = 4
+    headless_animation_seconds = 10
+
+    # True for windows that are drawn without a display.
+    _is_headless = False
+
+    # The tkinter.Canvas (from the pool) for the initial canvas to use.
+    _pooled_tkinter_canvas = None
+
+    # A FrameProfiler while profiling (see start_profiling).
+    profiler = None
+
+    def __new__(cls, *args, backend=None, **kwargs):
+        # Constructing a RoseWindow with the headless backend
+        # actually constructs a _HeadlessRoseWindow.
+        if cls is RoseWindow and _backend_name(backend) == "headless":
+            cls = _HeadlessRoseWindow
+        return super().__new__(cls)
 
     def __init__(self, width=400, height=300, title="Rose Graphics",
                  color="black", canvas_color=None,
-                 make_initial_canvas=True):
+                 make_initial_canvas=True, backend=None):
         """
 
         Pops up a   tkinter.Toplevel   window with (by default)
@@ -97,6 +287,7 @@ class RoseWindow(object):
           -- make_initial_canvas:
                -- If True, a default canvas is placed on the window.
                -- Otherwise, no default canvas is placed on the window.
+          -- backend:  "tkinter" or "headless" (see _backend_name).
 
         If this is the first RoseWindow constructed, then a
         hidden   Tk   object is constructed to control the event loop.
@@ -108,6 +299,7 @@ class RoseWindow(object):
           :type color: Color
           :type canvas_color: Color
           :type make_initial_canvas: bool
+          :type backend: str
         """
 #         check_types([(width, (int, float)),
 #                      (height, (int, float)),
@@ -119,18 +311,28 @@ class RoseWindow(object):
         # then construct the _master_Tk object.
         # --------------------------------------------------------------
         global _master_Tk
+        _import_tkinter()
         if not _master_Tk:
             _master_Tk = tkinter.Tk()
             _master_Tk.withdraw()
-        else:
-            time.sleep(0.1)  # Helps the window appear on TOP of Eclipse
+        elif RoseWindow.raise_delay:
+            # Helps the window appear on TOP of Eclipse
+            time.sleep(RoseWindow.raise_delay)
 
         # --------------------------------------------------------------
-        # Has a tkinter.Toplevel, and a tkinter.Canvas on the Toplevel.
+        # Has a tkinter.Toplevel, and a tkinter.Canvas on the Toplevel
+        # (both re-used from a closed window in the pool, if possible).
         # --------------------------------------------------------------
-        self.toplevel = tkinter.Toplevel(_master_Tk,
-                                         background=color,
-                                         width=width, height=height)
+        if _window_pool:
+            self.toplevel, self._pooled_tkinter_canvas = _window_pool.pop()
+            _configure(self.toplevel, background=color,
+                       width=width, height=height)
+            self.toplevel.geometry("")  # Its natural size, even if resized
+            self.toplevel.deiconify()
+        else:
+            self.toplevel = tkinter.Toplevel(_master_Tk,
+                                             background=color,
+                                             width=width, height=height)
         self.toplevel.title(title)
         self._is_closed = False
         self.toplevel.protocol("WM_DELETE_WINDOW", self.close)
@@ -150,6 +352,10 @@ class RoseWindow(object):
 
         self.widgets = [self.initial_canvas]
 
+        if self._pooled_tkinter_canvas is not None:  # Not used after all
+            self._pooled_tkinter_canvas.destroy()
+            self._pooled_tkinter_canvas = None
+
         # FIXME: Do any other tailoring of the toplevel as desired,
         #       e.g. borderwidth and style...
 
@@ -161,15 +367,55 @@ class RoseWindow(object):
         self.toplevel.bind("<Button>", self._on_mouse_click)
         self.toplevel.bind("<KeyPress>", self._on_key_press)
 
+        # Waiting for a mouse click waits (without polling) for a change
+        # to this variable, which changes on every click in this window,
+        # when this window closes, and when the wait times out.
+        self._wake_up_variable = tkinter.BooleanVar(_master_Tk)
+
+        # The asyncio Futures of the  next_click  calls that are waiting.
+        self._click_futures = []
+
+        self.animation_stats = None  # Set by run_animation
+        self._animation_is_running = False
+
         self.update()
 
     def close(self):
         """ Closes this RoseWindow. """
+        self._stop_recordings()
         if self.toplevel:
-            self.toplevel.destroy()
+            if not self._put_in_pool():
+                self.toplevel.destroy()
             self.toplevel = None
         self.update()
         self._is_closed = True
+        self._wake_up()
+        self._resolve_click_futures(None)
+
+    def _stop_recordings(self):
+        for widget in self.widgets:
+            if isinstance(widget, RoseCanvas):
+                widget.stop_recording()
+
+    def _put_in_pool(self):
+        """
+        If there is room in the pool (see pool_size) and this window has
+        no widgets other than its initial canvas, then hides this window
+        and puts its Toplevel and the (now empty) tkinter.Canvas of its
+        initial canvas (if any) into the pool, for the next window to
+        re-use.  Returns True if it did so.
+        """
+        if (len(_window_pool) >= RoseWindow.pool_size or
+                self.widgets != [self.initial_canvas]):
+            return False
+        tk_canvas = None
+        if self.initial_canvas is not None:
+            tk_canvas = self.initial_canvas._tkinter_canvas
+            tk_canvas.delete("all")
+            self.initial_canvas._tkinter_canvas = _ClosedCanvas()
+        self.toplevel.withdraw()
+        _window_pool.append((self.toplevel, tk_canvas))
+        return True
 
     def update(self):
         """
@@ -177,7 +423,12 @@ class RoseWindow(object):
         in this RoseWindow (e.g. mouse clicks, drawing shapes).
         """
         global _master_Tk
-        _master_Tk.update()
+        if self.profiler is None:
+            _master_Tk.update()
+        else:
+            start = time.perf_counter()
+            _master_Tk.update()
+            self.profiler._record("tk_update", start, time.perf_counter())
 
     def render(self, seconds_to_pause=None):
         """
@@ -186,15 +437,201 @@ class RoseWindow(object):
         After doing so, pauses the given number of seconds.
           :type  seconds_to_pause:  float
         """
+        profiler = self.profiler
+        if profiler is not None:
+            profiler._begin_frame()
         for widget in self.widgets:
             if type(widget) == RoseCanvas:
                 widget.render()
 
         self.update()
+        if profiler is not None:
+            profiler._end_frame()
 
-        if seconds_to_pause:
+        if seconds_to_pause and not self._is_headless:
             time.sleep(seconds_to_pause)
 
+    def run_animation(self, update, fps=60, seconds=None,
+                      max_updates_per_frame=5):
+        """
+        Runs an animation on this window:  calls  update(step)  once per
+        step = 1 / fps  seconds of animation time, where  update  is a
+        function that moves (or otherwise changes) shapes, and renders
+        this window after each frame's updates.
+
+        Stops when  update  returns False, when  seconds  of animation
+        time have passed (if  seconds  is given), when  stop_animation  is
+        called, or when this window is closed.  Returns an AnimationStats
+        (which is also this window's  animation_stats  while it runs).
+        A headless window cannot be closed by the user, so there, if
+        seconds  is not given, the animation stops after
+        RoseWindow.headless_animation_seconds  of animation time.
+
+        Frames are timed by Tk's timer (not by sleeping), so the time
+        that updating and rendering take does not make the animation
+        drift.  If it falls behind, it calls  update  several times
+        (at most  max_updates_per_frame) before the next render
+        and drops the frames in between.
+
+        Example:
+           def move(step):
+               circle.move_by(100 * step, 0)  # 100 pixels per second
+           window.run_animation(move, fps=60, seconds=5)
+
+          :type  update:  function
+          :type  fps:  float
+          :type  seconds:  float
+          :type  max_updates_per_frame:  int
+        """
+        stats = AnimationStats()
+        self.animation_stats = stats
+        self._animation_is_running = True
+        step = 1.0 / fps
+        if seconds is None and self._is_headless:
+            seconds = RoseWindow.headless_animation_seconds
+        if seconds is not None:
+            stats._updates_wanted = int(round(seconds * fps))
+
+        if self._is_headless:
+            # Nothing to wait for:  run the frames back to back.
+            while self._animation_is_running and not self._is_closed:
+                self._run_animation_frame(update, step, 1)
+            return stats
+
+        errors = []
+        next_frame_time = [time.perf_counter() + step]
+        timer = [None]
+
+        def on_timer():
+            timer[0] = None
+            if not self._animation_is_running or self._is_closed:
+                return
+            # How many frames are due (more than 1 if behind):
+            frames_due = 1 + max(0, int((time.perf_counter() -
+                                         next_frame_time[0]) // step))
+            stats.dropped_frames = stats.dropped_frames + frames_due - 1
+            next_frame_time[0] = next_frame_time[0] + frames_due * step
+            try:
+                self._run_animation_frame(
+                    update, step, min(frames_due, max_updates_per_frame))
+            except BaseException as exception:
+                errors.append(exception)
+                self.stop_animation()
+                return
+            if self._animation_is_running:
+                delay = next_frame_time[0] - time.perf_counter()
+                timer[0] = _master_Tk.after(max(0, int(delay * 1000)),
+                                            on_timer)
+            else:
+                self._wake_up()
+
+        timer[0] = _master_Tk.after(int(step * 1000), on_timer)
+        while self._animation_is_running and not self._is_closed:
+            _master_Tk.wait_variable(self._wake_up_variable)
+        self._animation_is_running = False
+        if timer[0] is not None:
+            _master_Tk.after_cancel(timer[0])
+
+        if errors:
+            raise errors[0]
+        return stats
+
+    def start_profiling(self, show_hud=False, max_frames=1000):
+        """
+        Starts recording how long each frame (each render) of this window
+        takes, by phase, and how many Shapes of each type it re-draws.
+        Returns the FrameProfiler that records them (which is also this
+        window's  profiler  until  stop_profiling  is called).
+        If  show_hud  is True, also shows the timings of the most recent
+        frame at the top-left of this window.
+
+        Example:
+           profiler = window.start_profiling()
+           ... move shapes and render the window, many times ...
+           print(profiler.summary())
+
+          :type  show_hud:  bool
+          :type  max_frames:  int
+          :rtype: FrameProfiler
+        """
+        self.stop_profiling()
+        self.profiler = FrameProfiler(max_frames)
+        if show_hud:
+            self.profiler.show_hud(self.initial_canvas)
+        return self.profiler
+
+    def stop_profiling(self):
+        """
+        Stops the recording that  start_profiling  started (if any) and
+        returns its FrameProfiler (or None).
+          :rtype: FrameProfiler
+        """
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.hide_hud()
+            self.profiler = None
+        return profiler
+
+    def start_recording(self, filename, keyframe_interval=10000):
+        """
+        Starts recording how the Shapes on this window's initial canvas
+        change (see RoseCanvas.start_recording).
+          :type  filename:  str
+          :type  keyframe_interval:  int
+        """
+        self.initial_canvas.start_recording(filename, keyframe_interval)
+
+    def stop_recording(self):
+        """
+        Stops the recording (if any) that  start_recording  started
+        and returns how many frames it recorded (or None).
+          :rtype: int
+        """
+        if self.initial_canvas is None:
+            return None
+        return self.initial_canvas.stop_recording()
+
+    def stop_animation(self):
+        """ Stops the animation (if any) that  run_animation  is running. """
+        self._animation_is_running = False
+        self._wake_up()
+
+    def _run_animation_frame(self, update, step, number_of_updates):
+        """
+        Calls  update(step)  the given number of times (fewer if the
+        animation stops), then renders this window, recording the times
+        taken in its animation_stats.
+        """
+        stats = self.animation_stats
+        profiler = self.profiler
+        if profiler is not None:
+            profiler._begin_frame(since_previous_frame=False)
+        start = time.perf_counter()
+        for _ in range(number_of_updates):
+            if update(step) is False:
+                self._animation_is_running = False
+                break
+            stats.updates = stats.updates + 1
+            if stats.updates == stats._updates_wanted:
+                self._animation_is_running = False
+                break
+
+        rendering = time.perf_counter()
+        if profiler is not None:
+            profiler._record("update", start, rendering)
+        for widget in self.widgets:
+            if type(widget) == RoseCanvas:
+                widget._update_shapes()
+        if not self._is_headless and self.toplevel:
+            drawing = time.perf_counter()
+            self.toplevel.update_idletasks()
+            if profiler is not None:
+                profiler._record("tk_update", drawing, time.perf_counter())
+        stats._record_frame(rendering - start,
+                            time.perf_counter() - rendering)
+        if profiler is not None:
+            profiler._end_frame()
+
     def close_on_mouse_click(self):
         """
         Displays a message at the bottom center of the window and waits
@@ -251,36 +688,144 @@ class RoseWindow(object):
 
         return click_position
 
-    def get_next_mouse_click(self):
+    def get_next_mouse_click(self, timeout=None):
         """
         Waits for the user to click in the window. Then returns the rg.Point
         that represents the point where the user clicked.
 
+        If  timeout  (in seconds) is given and the user does not click
+        within that many seconds, returns None instead.
+        Also returns None if the window is closed while waiting.
+
         Example:
         If this method is called and then the user clicks near
         the upper-right corner of a 300 x 500 window,
         this function would return something like rg.Point(295, 5).
+
+        This blocks everything else until the click;  asyncio code should
+        instead use   await window.next_click().
+          :type  timeout:  float
         """
         self.mouse.position = None
-        while True:
-            if self._is_closed:
-                return None
-            if self.mouse.position is not None:
-                break
-            self.update()
-            time.sleep(.05)  # allow time for other events to be handled
+        if self._is_closed:
+            return None
+
+        # Tk handles events while we wait; nothing runs while it is idle.
+        timed_out = []
+
+        def on_timeout():
+            timed_out.append(True)
+            self._wake_up()
+
+        timer = None
+        if timeout is not None:
+            timer = _master_Tk.after(max(0, int(timeout * 1000)), on_timeout)
+
+        while (self.mouse.position is None and not self._is_closed
+               and not timed_out):
+            _master_Tk.wait_variable(self._wake_up_variable)
+
+        if timer is not None and not timed_out:
+            _master_Tk.after_cancel(timer)
 
         click_point = self.mouse.position
         self.mouse.position = None
 
         return click_point
 
+    async def next_click(self, timeout=None):
+        """
+        Like  get_next_mouse_click, but for asyncio coroutines:  waits
+        for the user to click in the window (or for  timeout  seconds,
+        or for the window to close) while the event loop runs other
+        tasks.  Returns the rg.Point where the user clicked (or None).
+        Example:
+           async def main():
+               window = rg.RoseWindow()
+               while True:
+                   click = await window.next_click()
+                   if click is None:  # The window was closed
+                       break
+                   rg.Circle(click, 5).attach_to(window)
+                   await window.render_async()
+           asyncio.run(main())
+          :type  timeout:  float
+          :rtype: Point
+        """
+        if self._is_closed:
+            return None
+        start_asyncio_event_pump()
+        future = asyncio.get_running_loop().create_future()
+        self._click_futures.append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            if future in self._click_futures:
+                self._click_futures.remove(future)
+
+    async def render_async(self, seconds_to_pause=None):
+        """
+        Like  render, but for asyncio coroutines:  renders this window,
+        then pauses the given number of seconds (if any) while the event
+        loop runs other tasks and handles this window's events.
+          :type  seconds_to_pause:  float
+        """
+        _import_asyncio()
+        if not self._is_headless:
+            start_asyncio_event_pump()
+        self.render()
+        if self._is_headless:
+            seconds_to_pause = None  # As for render
+        await asyncio.sleep(seconds_to_pause or 0)
+
+    def _wake_up(self):
+        """ Ends the current wait (if any) in  get_next_mouse_click. """
+        self._wake_up_variable.set(not self._wake_up_variable.get())
+
+    def _resolve_click_futures(self, point):
+        """ Ends the current waits (if any) in  next_click. """
+        futures = self._click_futures
+        self._click_futures = []
+        for future in futures:
+            if not future.done():
+                future.set_result(point)
+
     def _on_mouse_click(self, event):
         self.mouse._update(event)
+        self._wake_up()
+        if self._click_futures:
+            self._resolve_click_futures(self.mouse.position)
 
     def _on_key_press(self, event):
         self.keyboard._update(event)
 
+    def _make_tkinter_canvas(self, width, height, background_color):
+        """
+        Returns a new tkinter.Canvas on this window's Toplevel
+        (or, if this window re-uses a pooled one, its tkinter.Canvas).
+        """
+        tk_canvas = self._pooled_tkinter_canvas
+        if tk_canvas is None:
+            return tkinter.Canvas(self.toplevel,
+                                  width=width, height=height,
+                                  background=background_color)
+        self._pooled_tkinter_canvas = None
+        _configure(tk_canvas, width=width, height=height,
+                   background=background_color)
+        return tk_canvas
+
+    def save_image(self, filename):
+        """
+        Renders this window, then saves what its initial canvas shows
+        to the given file (.png or .ppm).
+        Available only for windows that use the headless backend.
+          :type  filename:  str
+        """
+        self.render()
+        self.initial_canvas.save_image(filename)
+
 #      def add_canvas(self, width=None, height=None, background_color=0):
 # FIXME: Set defaults based on the main canvas.
 #         new_canvas = RoseCanvas(self, background_color="white")
@@ -295,6 +840,283 @@ class RoseWindow(object):
         return _serialize_shapes(self)
 
 
+class AnimationStats(object):
+    """
+    Statistics about an animation run by  RoseWindow.run_animation,
+    kept up to date while it runs.
+
+    Instance variables include:
+      frames:  How many frames have been rendered.
+      updates:  How many times the animation's update function has
+          been called.
+      dropped_frames:  How many frames were not rendered because
+          the animation had fallen behind.
+
+    Properties (in seconds, averaged over all frames so far unless
+    noted otherwise):  frame_seconds (time from one frame to the next),
+    longest_frame_seconds (the longest such time), update_seconds,
+    render_seconds, and frames_per_second.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.updates = 0
+        self.dropped_frames = 0
+        self.longest_frame_seconds = 0.0
+        self._updates_wanted = None  # Stop after this many updates
+        self._start_time = time.perf_counter()
+        self._last_frame_time = self._start_time
+        self._total_update_seconds = 0.0
+        self._total_render_seconds = 0.0
+
+    def __repr__(self):
+        return ("{} frames ({:.1f} per second, {} dropped); per frame:"
+                " {:.1f} ms updating, {:.1f} ms rendering").format(
+                    self.frames, self.frames_per_second, self.dropped_frames,
+                    1000 * self.update_seconds, 1000 * self.render_seconds)
+
+    @property
+    def frame_seconds(self):
+        if self.frames == 0:
+            return 0.0
+        return (self._last_frame_time - self._start_time) / self.frames
+
+    @property
+    def frames_per_second(self):
+        seconds = self.frame_seconds
+        return 1 / seconds if seconds > 0 else 0.0
+
+    @property
+    def update_seconds(self):
+        return self._total_update_seconds / max(self.frames, 1)
+
+    @property
+    def render_seconds(self):
+        return self._total_render_seconds / max(self.frames, 1)
+
+    def _record_frame(self, update_seconds, render_seconds):
+        now = time.perf_counter()
+        self.longest_frame_seconds = max(self.longest_frame_seconds,
+                                         now - self._last_frame_time)
+        self._last_frame_time = now
+        self.frames = self.frames + 1
+        self._total_update_seconds = (self._total_update_seconds +
+                                      update_seconds)
+        self._total_render_seconds = (self._total_render_seconds +
+                                      render_seconds)
+
+
+class FrameProfiler(object):
+    """
+    Records how long each frame (each render of a RoseWindow or
+    RoseCanvas) takes, split into phases, and how many Shapes of each
+    type it re-drew.  To get one, use:  window.start_profiling()
+
+    The phases are:
+      update:  the time since the previous frame ended, i.e. the time
+          that the program itself took (e.g. to move Shapes).
+      coordinates:  computing where the Shapes go.
+      options:  computing the colors, fonts, etc. of the Shapes.
+      tcl:  sending the Shapes to Tk (creating, moving and
+          configuring its items).  All the work of a ShapeBatch
+          counts as this phase.
+      tk_update:  letting Tk draw and handle events.
+
+    Instance variables include:
+      frames:  The most recent frames (at most  max_frames  of them),
+          each a dictionary with keys  number, start  and  seconds
+          (when it started and how long it took),  phases  (from phase
+          name to seconds) and  shape_counts  (from type name to how
+          many Shapes of that type were re-drawn).
+
+    Example:
+       profiler = window.start_profiling(show_hud=True)
+       ... move shapes and render the window, many times ...
+       print(profiler.summary())
+       profiler.save_chrome_trace("trace.json")  # For chrome://tracing
+    """
+    PHASES = ("update", "coordinates", "options", "tcl", "tk_update")
+
+    def __init__(self, max_frames=1000):
+        """
+          :type  max_frames:  int
+        """
+        self.frames = collections.deque(maxlen=max_frames)
+        self.number_of_frames = 0
+        self._origin = time.perf_counter()
+        self._frame = None  # The frame in progress, if any
+        self._depth = 0  # How many nested renders are in progress
+        self._events = collections.deque()  # (frame, phase, start, seconds)
+        self._previous_frame_end = None
+        self._hud = None
+
+    def __repr__(self):
+        if not self.frames:
+            return "FrameProfiler with no frames yet"
+        return self._describe(self.frames[-1])
+
+    def summary(self):
+        """
+        Returns a dictionary with the number of frames, and the average
+        milliseconds per frame of each phase (and in all) and the average
+        number of Shapes of each type re-drawn per frame, over the frames
+        that this FrameProfiler still has.
+        """
+        number = max(len(self.frames), 1)
+        milliseconds = dict.fromkeys(FrameProfiler.PHASES, 0.0)
+        shapes = collections.Counter()
+        total = 0.0
+        for frame in self.frames:
+            for phase, seconds in frame["phases"].items():
+                milliseconds[phase] += 1000 * seconds / number
+            shapes.update(frame["shape_counts"])
+            total += 1000 * frame["seconds"] / number
+        return {"frames": len(self.frames),
+                "milliseconds_per_frame": total,
+                "milliseconds_per_phase": milliseconds,
+                "shapes_per_frame": {name: count / number
+                                     for name, count in shapes.items()}}
+
+    def save_chrome_trace(self, filename):
+        """
+        Saves the frames that this FrameProfiler still has to the given
+        file, as JSON in the Trace Event Format, to view in Chrome (at
+        chrome://tracing) or Perfetto (at ui.perfetto.dev).
+          :type  filename:  str
+        """
+        first_number = self.frames[0]["number"] if self.frames else 0
+        events = []
+        for frame in self.frames:
+            events.append({"name": "frame", "cat": "frame", "ph": "X",
+                           "pid": 1, "tid": 1,
+                           "ts": 1e6 * frame["start"],
+                           "dur": 1e6 * frame["seconds"],
+                           "args": dict(frame["shape_counts"],
+                                        frame=frame["number"])})
+        for number, phase, start, seconds in self._events:
+            if number >= first_number:
+                events.append({"name": phase, "cat": "phase", "ph": "X",
+                               "pid": 1, "tid": 1, "ts": 1e6 * start,
+                               "dur": 1e6 * seconds,
+                               "args": {"frame": number}})
+        with open(filename, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"},
+                      file)
+
+    def show_hud(self, rose_canvas):
+        """
+        Shows (at the top-left of the given RoseCanvas) a line of text
+        that describes the most recent frame, updated after every frame.
+        The text is drawn straight onto the canvas, above its Shapes; it
+        is not itself a Shape (so it is not saved, recorded, found by
+        shapes_at, or counted in the frames).
+          :type  rose_canvas:  RoseCanvas
+        """
+        self.hide_hud()
+        # This Text is never attached; it just holds the text and font.
+        self._hud = Text(Point(0, 0), "")
+        self._hud.font_family = "Courier"
+        self._hud.font_size = 9
+        self._hud.text_color = "red"
+        self._hud.justify = "left"
+        self._hud_canvas = rose_canvas
+        self._hud_id = rose_canvas._tkinter_canvas.create_text(0, 0)
+        self._update_hud()
+
+    def hide_hud(self):
+        """ Stops showing the text that  show_hud  shows, if any. """
+        if self._hud is not None:
+            if not self._hud_canvas._window._is_closed:
+                self._hud_canvas._tkinter_canvas.delete(self._hud_id)
+            self._hud = None
+            self._hud_canvas = None
+
+    def _describe(self, frame):
+        phases = ", ".join("{} {:.1f}".format(phase, 1000 * seconds)
+                           for phase, seconds in frame["phases"].items())
+        shapes = ", ".join("{} {}".format(count, name) for name, count
+                           in sorted(frame["shape_counts"].items()))
+        return "frame {}: {:.1f} ms ({})  {}".format(
+            frame["number"], 1000 * frame["seconds"], phases,
+            shapes or "no shapes re-drawn")
+
+    def _update_hud(self):
+        rose_canvas = self._hud_canvas
+        if rose_canvas._window._is_closed:
+            return
+        tk_canvas = rose_canvas._tkinter_canvas
+        width = int(tk_canvas.cget("width"))
+        height = int(tk_canvas.cget("height"))
+
+        # Wrap the text to fit in the canvas, then keep it on the canvas.
+        hud = self._hud
+        hud.text = repr(self)
+        left, top, right, bottom = hud._get_bounds()
+        character_width = (right - left) / max(len(hud.text), 1)
+        hud.text = "\n".join(textwrap.wrap(
+            hud.text, max(int((width - 8) / character_width), 10)))
+        left, top, right, bottom = hud._get_bounds()
+        half_width, half_height = (right - left) / 2, (bottom - top) / 2
+        x = max(min(4 + half_width, width - half_width), half_width)
+        y = max(min(4 + half_height, height - half_height), half_height)
+
+        tk_canvas.coords(self._hud_id, x, y)
+        tk_canvas.itemconfigure(self._hud_id, hud._get_options_for_drawing())
+        tk_canvas.tag_raise(self._hud_id)
+
+    def _begin_frame(self, since_previous_frame=True):
+        """
+        Starts a frame (unless one is in progress, i.e. this is a render
+        within a render).  Unless told otherwise, the time since the
+        previous frame ended counts as this frame's update phase.
+        """
+        self._depth = self._depth + 1
+        if self._depth > 1:
+            return
+        now = time.perf_counter()
+        self._frame = {"number": self.number_of_frames + 1,
+                       "start": now - self._origin,
+                       "seconds": 0.0,
+                       "phases": dict.fromkeys(FrameProfiler.PHASES, 0.0),
+                       "shape_counts": {}}
+        if since_previous_frame and self._previous_frame_end is not None:
+            self._record("update", self._previous_frame_end, now)
+
+    def _end_frame(self):
+        self._depth = self._depth - 1
+        if self._depth > 0:
+            return
+        now = time.perf_counter()
+        frame = self._frame
+        frame["seconds"] = now - self._origin - frame["start"]
+        self._frame = None
+        self.number_of_frames = frame["number"]
+        self.frames.append(frame)
+        while (self._events and self.frames.maxlen and
+               self._events[0][0] <= frame["number"] - self.frames.maxlen):
+            self._events.popleft()
+        if self._hud is not None:
+            self._update_hud()
+        self._previous_frame_end = time.perf_counter()
+
+    def _record(self, phase, start, end):
+        """ Records that the given phase ran from start to end. """
+        frame = self._frame
+        if frame is not None:
+            frame["phases"][phase] += end - start
+            self._events.append((frame["number"], phase,
+                                 start - self._origin, end - start))
+
+    def _count(self, shapes):
+        """ Records that the given Shapes are re-drawn in this frame. """
+        frame = self._frame
+        if frame is not None:
+            counts = frame["shape_counts"]
+            for shape in shapes:
+                name = type(shape).__name__
+                counts[name] = counts.get(name, 0) + 1
+
+
 class RoseWidget(object):
     """
        A Widget is a thing that one can put on a Window,
@@ -312,13 +1134,16 @@ class RoseCanvas(RoseWidget):
     defaults = {"colors": [None, "yellow", "light blue", "dark grey"]}
     count = 0
 
+    # The _SceneRecorder that start_recording started (if any).
+    _recorder = None
+
     """
        A RoseCanvas is a RoseWidget (i.e., a thing on a RoseWindow)
        upon which one can draw shapes and other Drawable things.
     """
 
     def __init__(self, window, width=200, height=200,
-                 background_color=0):
+                 background_color=0, batch_rendering=False):
         super().__init__(window)
 
         RoseCanvas.count = RoseCanvas.count + 1
@@ -335,75 +1160,713 @@ class RoseCanvas(RoseWidget):
 #         else:
 #             self.background_color = background_color
 
-        tk_canvas = tkinter.Canvas(window.toplevel,
-                                   width=width, height=height,
-                                   background=background_color)
+        tk_canvas = window._make_tkinter_canvas(width, height,
+                                                background_color)
         self._tkinter_canvas = tk_canvas
 
         # FIXME: Automate gridding better.
         self._tkinter_canvas.grid(padx=5, pady=5)
-        self.shapes = []
+
+        # The attached Shapes, keyed by id (so lookups never use ==),
+        # in the order they were attached (bottom-most first).
+        self._shapes_by_id = {}
+
+        # Shapes that have been attached or have changed since they were
+        # last drawn, in the order in which that happened (keyed by id).
+        # Only these are re-drawn by the next  render.
+        self._changed_shapes = {}
+        self.number_of_shapes_rendered = 0
+
+        # If True, render sends all its drawing commands to tkinter
+        # as a single Tcl script instead of one call per command.
+        self.batch_rendering = batch_rendering
+
+        # A _SpatialIndex of the attached Shapes, made by the first
+        # shapes_at or shapes_in (and then kept up to date).
+        self._spatial_index = None
+
+        # The Shapes in the static layer (see make_static), keyed by id,
+        # and (on a headless window) the image item that draws all of
+        # them.  If the layer is stale, the next render draws it again
+        # (headless) or moves its Tk items below the others (on Tk).
+        self._static_shapes = {}
+        self._static_layer_id = None
+        self._static_layer_is_stale = False
+        self.number_of_static_layer_renders = 0
+
+    @property
+    def shapes(self):
+        """
+        A list of the Shapes attached to this RoseCanvas,
+        in the order they were attached (bottom-most first).
+        """
+        return list(self._shapes_by_id.values())
+
+    def __contains__(self, shape):
+        """ Returns True if the given Shape is attached to this RoseCanvas. """
+        return id(shape) in self._shapes_by_id
+
+    def shapes_at(self, point):
+        """
+        Returns a list of the Shapes attached to this RoseCanvas whose
+        bounding boxes contain the given rg.Point, in the order they
+        were attached (so the top-most is last).  A ShapeBatch is there
+        if any of its members contains the Point (see its  indices_at).
+        Example:
+           click = window.get_next_mouse_click()
+           for shape in window.initial_canvas.shapes_at(click):
+               shape.fill_color = "red"
+        """
+        found = self._get_spatial_index().shapes_at(point.x, point.y)
+        return [shape for shape in found
+                if not isinstance(shape, ShapeBatch)
+                or len(shape.indices_at(point)) > 0]
+
+    def shapes_in(self, rectangle, touching=False):
+        """
+        Returns a list of the Shapes attached to this RoseCanvas whose
+        bounding boxes are inside the given rg.Rectangle (or, if
+        touching  is True, overlap it), in the order they were attached.
+        """
+        left = min(rectangle.corner_1.x, rectangle.corner_2.x)
+        top = min(rectangle.corner_1.y, rectangle.corner_2.y)
+        right = max(rectangle.corner_1.x, rectangle.corner_2.x)
+        bottom = max(rectangle.corner_1.y, rectangle.corner_2.y)
+        return self._get_spatial_index().shapes_in(left, top, right, bottom,
+                                                   touching)
+
+    def _get_spatial_index(self):
+        if self._spatial_index is None:
+            self._spatial_index = _SpatialIndex(self._shapes_by_id.values())
+        return self._spatial_index
+
+    def start_recording(self, filename, keyframe_interval=10000):
+        """
+        Starts recording, in the given (new) file, every attach, detach
+        and change of the Shapes on this RoseCanvas, along with the frame
+        (the number of renders since recording started) in which it
+        happened.  A SceneReplayer reads the file and shows the scene
+        as it was at any frame.
+
+        The file is binary and is only ever appended to (and flushed
+        after each frame).  Changes are recorded once per frame, for
+        each Shape that changed.  Besides the Shapes on this RoseCanvas
+        when recording starts, the file holds all of them again (a
+        keyframe) whenever at least  keyframe_interval  events (and at
+        least as many as there are Shapes) were recorded since the
+        previous keyframe, so that replaying any frame starts from a
+        nearby keyframe.
+        Example:
+           window.start_recording("bouncing.scene")
+           ... move shapes and render the window, many times ...
+           window.stop_recording()
+           replayer = rg.SceneReplayer("bouncing.scene")
+           print(replayer.scene_at(100))
+
+          :type  filename:  str
+          :type  keyframe_interval:  int
+        """
+        self.stop_recording()
+        self._recorder = _SceneRecorder(self, filename, keyframe_interval)
+
+    def stop_recording(self):
+        """
+        Stops the recording (if any) that  start_recording  started,
+        ending its current frame if anything changed in it, and returns
+        how many frames it recorded (or None).
+          :rtype: int
+        """
+        recorder = self._recorder
+        if recorder is None:
+            return None
+        self._recorder = None
+        return recorder.close()
+
+    def make_static(self, shapes=None):
+        """
+        Puts the given Shapes (default: all the Shapes attached to this
+        RoseCanvas) in this RoseCanvas's static layer, below all the
+        other Shapes.  Use it for backgrounds (grids, terrain, labels)
+        that seldom change.
+
+        On a headless window, the next render draws the whole layer,
+        once, as a single image.  After that, render (and rasterizing
+        the canvas) skips the static Shapes, so each frame costs only as
+        much as the other Shapes, until one of them changes or is
+        detached, which makes the next render draw the layer again.
+        On a Tk window, the static Shapes stay Tk items of their own
+        (Tk already draws unchanged items cheaply); they are just kept
+        below the other Shapes, and one that changes is re-drawn alone.
+        Example:
+           for k in range(100):
+               line = rg.Line(rg.Point(4 * k, 0), rg.Point(4 * k, 300))
+               line.attach_to(window)
+           window.initial_canvas.make_static()
+          :type  shapes:  list[_Shape]
+        """
+        if shapes is None:
+            shapes = self.shapes
+        for shape in shapes:
+            if id(shape) not in self._shapes_by_id:
+                msg = "Only Shapes that are attached to a RoseCanvas\n"
+                msg += "can be put in its static layer."
+                raise Exception(msg)
+
+        for shape in shapes:
+            if id(shape) not in self._static_shapes:
+                self._static_shapes[id(shape)] = shape
+                self._static_layer_is_stale = True
+                if self._window._is_headless:
+                    self._changed_shapes.pop(id(shape), None)
+                    self._delete_items_of(shape)
+                    shape.shape_id_by_canvas[self] = None
+
+    def make_dynamic(self, shapes=None):
+        """
+        Takes the given Shapes (default: all of them) out of this
+        RoseCanvas's static layer (see make_static), so that they are
+        drawn on their own again, on top of the other Shapes.
+          :type  shapes:  list[_Shape]
+        """
+        if shapes is None:
+            shapes = list(self._static_shapes.values())
+        for shape in shapes:
+            if self._static_shapes.pop(id(shape), None) is None:
+                continue
+            if self._window._is_headless:
+                self._changed_shapes[id(shape)] = shape
+                self._static_layer_is_stale = True
+            else:
+                for item_id in self._items_of(shape):
+                    self._tkinter_canvas.tag_raise(item_id)
+
+    @property
+    def static_shapes(self):
+        """
+        A list of the Shapes in this RoseCanvas's static layer (see
+        make_static), bottom-most first.
+        """
+        return [shape for shape in self._shapes_by_id.values()
+                if id(shape) in self._static_shapes]
 
     def render(self, seconds_to_pause=None):
         """
         Updates all the Shapes attached to this RoseCanvas, then draws
         all those Shapes.  After doing so, pauses the given number of seconds.
+
+        Only Shapes that were attached or changed since the previous
+        render are actually re-drawn; afterwards
+          number_of_shapes_rendered
+        is how many that was.
           :type  seconds_to_pause:  float
         """
+        profiler = self._window.profiler
+        if profiler is not None:
+            profiler._begin_frame()
         self._update_shapes()
         self._window.update()
+        if profiler is not None:
+            profiler._end_frame()
 
-        if seconds_to_pause:
+        if seconds_to_pause and not self._window._is_headless:
             time.sleep(seconds_to_pause)
 
+    def save_image(self, filename):
+        """
+        Saves what this RoseCanvas shows (as of its most recent render)
+        to the given file:  a PNG file if the filename ends in .png,
+        else a PPM file.
+        Available only for canvases on windows that use the headless
+        backend.
+          :type  filename:  str
+        """
+        if not self._window._is_headless:
+            msg = "Only windows that use the headless backend\n"
+            msg += "can save their images."
+            raise Exception(msg)
+        framebuffer = self._tkinter_canvas.rasterize()
+        if filename.lower().endswith(".png"):
+            framebuffer.save_png(filename)
+        else:
+            framebuffer.save_ppm(filename)
+
     def _renderShape(self, shape, render_NOW=False):
         """Renders a shape."""
-        coordinates = shape._get_coordinates_for_drawing()
-        options = shape._get_options_for_drawing()
-
-        if shape.shape_id_by_canvas[self] is None:
-            shape.shape_id_by_canvas[self] = \
-                shape._method_for_drawing(self._tkinter_canvas, *coordinates)
+        self._changed_shapes.pop(id(shape), None)
+        if isinstance(shape, ShapeBatch):
+            shape._render_on(self)
+            return
+        self._place_shape(shape, shape._get_coordinates_for_drawing(),
+                          shape._get_options_for_drawing())
+        if render_NOW:
+            # redraw NOW
+            self._window.update()
 
+    def _place_shape(self, shape, coordinates, options):
+        """
+        Creates (if need be), moves and re-configures the Tk item of the
+        given shape, with the given coordinates and options.
+        """
         try:
+            if shape.shape_id_by_canvas[self] is None:
+                create = getattr(self._tkinter_canvas,
+                                 shape._method_name_for_drawing)
+                shape.shape_id_by_canvas[self] = create(*coordinates)
             self._tkinter_canvas.coords(shape.shape_id_by_canvas[self],
                                         *coordinates)
         except tkinter.TclError:
-            msg = "Could not place the shape\n"
-            msg += "on the given window.\n"
-            msg += "Did you accidentally close a window\n"
-            msg += "that later needed to be rendered again?"
-            raise Exception(msg) from None
+            if self._window_was_closed():
+                raise _could_not_place_shape_exception() from None
+            raise
 
         self._tkinter_canvas.itemconfigure(shape.shape_id_by_canvas[self],
                                            options)
-        if render_NOW:
-            # redraw NOW
-            self._window.update()
+
+    def _render_static_layer(self):
+        """
+        Draws the static Shapes (see make_static), bottom-most first, on
+        a new image and shows that image below all the other Shapes.
+        Only for headless windows.
+        """
+        self._static_layer_is_stale = False
+        tk_canvas = self._tkinter_canvas
+        if not self._static_shapes:
+            if self._static_layer_id is not None:
+                tk_canvas.delete(self._static_layer_id)
+            self._static_layer_id = None
+            return
+
+        layer = _HeadlessCanvas(tk_canvas.width, tk_canvas.height)
+        layer.background_rgb = tk_canvas.background_rgb
+        for shape in self.static_shapes:
+            item_type = shape._method_name_for_drawing[len("create_"):]
+            if isinstance(shape, ShapeBatch):
+                coordinates = shape._get_coordinates_for_drawing().tolist()
+                for index, xy in enumerate(coordinates):
+                    layer._create(item_type, tuple(xy),
+                                  shape._get_options_for_drawing(index))
+            else:
+                layer._create(item_type,
+                              shape._get_coordinates_for_drawing(),
+                              shape._get_options_for_drawing())
+        image = layer.rasterize()
+
+        if self._static_layer_id is None:
+            self._static_layer_id = tk_canvas.create_image(0, 0, image=image,
+                                                           anchor="nw")
+        else:
+            tk_canvas.itemconfigure(self._static_layer_id, image=image)
+        tk_canvas.tag_lower(self._static_layer_id)
+        self.number_of_static_layer_renders += 1
+
+    def _lower_static_items(self):
+        """
+        Moves the Tk items of the static Shapes (see make_static) below
+        all the other items, keeping their order.  Only for Tk windows.
+        """
+        self._static_layer_is_stale = False
+        for shape in reversed(self.static_shapes):
+            for item_id in reversed(self._items_of(shape)):
+                self._tkinter_canvas.tag_lower(item_id)
 
     def _draw(self, shape):
         """Queues a shape for being drawn. Does NOT draw it just yet."""
-        shapeInList = False
-        for listShape in self.shapes:
-            if listShape is shape:
-                shapeInList = True
-                break
-
-        if not shapeInList:
+        if id(shape) not in self._shapes_by_id:
             shape.shape_id_by_canvas[self] = None
-            self.shapes.append(shape)
+            self._shapes_by_id[id(shape)] = shape
+            self._changed_shapes[id(shape)] = shape
+            if self._spatial_index is not None:
+                self._spatial_index.add(shape)
+            if self._recorder is not None:
+                self._recorder.attached(shape)
 
     def _undraw(self, shape):
-        if shape in self.shapes:
-            for i in range(len(self.shapes)):
-                if self.shapes[i] is shape:
-                    self._tkinter_canvas.delete(shape.shape_id_by_canvas[self])
-                    del self.shapes[i]
-                    break
+        if self._shapes_by_id.pop(id(shape), None) is not None:
+            self._changed_shapes.pop(id(shape), None)
+            if (self._static_shapes.pop(id(shape), None) is not None and
+                    self._window._is_headless):
+                self._static_layer_is_stale = True
+            if self._spatial_index is not None:
+                self._spatial_index.remove(shape)
+            if self._recorder is not None:
+                self._recorder.detached(shape)
+            self._delete_items_of(shape)
+            del shape.shape_id_by_canvas[self]
+
+    def _items_of(self, shape):
+        """ Returns a list of the Tk item(s) that draw the given shape. """
+        shape_id = shape.shape_id_by_canvas[self]
+        if isinstance(shape_id, list):  # The items of a ShapeBatch
+            return shape_id
+        return [] if shape_id is None else [shape_id]
+
+    def _delete_items_of(self, shape):
+        """ Deletes the Tk item(s) that draw the given shape, if any. """
+        item_ids = self._items_of(shape)
+        if item_ids:
+            self._tkinter_canvas.delete(*item_ids)
+
+    def _shape_changed(self, shape):
+        """ Records that the given (attached) Shape must be re-drawn. """
+        if id(shape) in self._static_shapes and self._window._is_headless:
+            self._static_layer_is_stale = True
+        else:
+            self._changed_shapes[id(shape)] = shape
+        if self._spatial_index is not None:
+            self._spatial_index.mark_changed(shape)
+        if self._recorder is not None:
+            self._recorder.changed(shape)
 
     def _update_shapes(self):
-        for shape in self.shapes:
-            self._renderShape(shape)
+        if self._static_layer_is_stale and self._window._is_headless:
+            self._render_static_layer()
+        changed_shapes = self._changed_shapes
+        self._changed_shapes = {}
+        if self._window.profiler is not None:
+            self._update_shapes_with_profiler(changed_shapes.values(),
+                                              self._window.profiler)
+        elif self.batch_rendering and not self._window._is_headless:
+            self._render_shapes_in_batch(changed_shapes.values())
+        else:
+            for shape in changed_shapes.values():
+                self._renderShape(shape)
+        self.number_of_shapes_rendered = len(changed_shapes)
+        if self._static_layer_is_stale:  # Only on Tk (see make_static)
+            self._lower_static_items()
+        if self._recorder is not None:
+            self._recorder.end_frame()
+
+    def _update_shapes_with_profiler(self, shapes, profiler):
+        """
+        Renders the given shapes as _update_shapes does, but one phase
+        at a time (all their coordinates, then all their options, then
+        sending them to Tk), recording the time of each phase and the
+        number of shapes of each type in the given FrameProfiler.
+        """
+        profiler._count(shapes)
+        start = time.perf_counter()
+        batches = [shape for shape in shapes if isinstance(shape, ShapeBatch)]
+        for batch in batches:
+            batch._render_on(self)
+        shapes = [shape for shape in shapes
+                  if not isinstance(shape, ShapeBatch)]
+        computing = time.perf_counter()
+        profiler._record("tcl", start, computing)
+
+        coordinates = [shape._get_coordinates_for_drawing()
+                       for shape in shapes]
+        start = time.perf_counter()
+        profiler._record("coordinates", computing, start)
+        options = [shape._get_options_for_drawing() for shape in shapes]
+        computing = time.perf_counter()
+        profiler._record("options", start, computing)
+
+        if self.batch_rendering and not self._window._is_headless:
+            self._place_shapes_in_batch(shapes, coordinates, options)
+        else:
+            for k in range(len(shapes)):
+                self._place_shape(shapes[k], coordinates[k], options[k])
+        profiler._record("tcl", computing, time.perf_counter())
+        self.number_of_shapes_rendered = len(batches) + len(shapes)
+
+    def _render_shapes_in_batch(self, shapes):
+        """
+        Renders the given shapes by building a single Tcl script that
+        creates (or moves and re-configures) all of them, then evaluating
+        that script with one call into the Tcl interpreter.
+        """
+        shapes_to_place = []
+        for shape in shapes:
+            if isinstance(shape, ShapeBatch):
+                shape._render_on(self)  # With its own (single) script
+            else:
+                shapes_to_place.append(shape)
+        self._place_shapes_in_batch(
+            shapes_to_place,
+            [shape._get_coordinates_for_drawing()
+             for shape in shapes_to_place],
+            [shape._get_options_for_drawing() for shape in shapes_to_place])
+
+    def _place_shapes_in_batch(self, shapes, coordinates, options):
+        """
+        Creates (or moves and re-configures) the Tk items of the given
+        shapes, with the given coordinates and options (one per shape),
+        by evaluating a single Tcl script.
+        """
+        canvas_name = str(self._tkinter_canvas)
+        new_shapes = []
+        commands = []
+        for k, shape in enumerate(shapes):
+            coordinates_k = _tcl_words(coordinates[k])
+            options_k = _tcl_options(options[k])
+            shape_id = shape.shape_id_by_canvas[self]
+            if shape_id is None:
+                method_name = shape._method_name_for_drawing
+                item_type = method_name[len("create_"):]
+                new_shapes.append(shape)
+                commands.append(
+                    "lappend ::rosegraphics_ids [{} create {} {} {}]".format(
+                        canvas_name, item_type, coordinates_k, options_k))
+            else:
+                commands.append("{} coords {} {}".format(
+                    canvas_name, shape_id, coordinates_k))
+                commands.append("{} itemconfigure {} {}".format(
+                    canvas_name, shape_id, options_k))
+
+        if not commands:
+            return
+        if new_shapes:
+            commands.insert(0, "set ::rosegraphics_ids {}")
+            commands.append("set ::rosegraphics_ids")
+
+        try:
+            result = self._tkinter_canvas.tk.eval("\n".join(commands))
+        except tkinter.TclError:
+            if self._window_was_closed():
+                raise _could_not_place_shape_exception() from None
+            # The script stopped part way:  keep the ids of the items it
+            # did create (so they are not created again) and draw all
+            # the shapes again next time.
+            if new_shapes:
+                created = self._tkinter_canvas.tk.eval(
+                    "set ::rosegraphics_ids").split()
+                for shape, shape_id in zip(new_shapes, created):
+                    shape.shape_id_by_canvas[self] = int(shape_id)
+            for shape in shapes:
+                self._changed_shapes[id(shape)] = shape
+            raise
+
+        if new_shapes:
+            for shape, shape_id in zip(new_shapes, result.split()):
+                shape.shape_id_by_canvas[self] = int(shape_id)
+
+    def _window_was_closed(self):
+        """
+        Returns True if this RoseCanvas can no longer be drawn on
+        because its window (or its tkinter.Canvas) was closed.
+        """
+        if self._window._is_closed:
+            return True
+        try:
+            return not self._tkinter_canvas.winfo_exists()
+        except Exception:  # A TclError, or from a _ClosedCanvas
+            return True
+
+
+class _ClosedCanvas(object):
+    """
+    Stands in for the tkinter.Canvas of a RoseCanvas whose window was
+    closed and put into the pool (so that its tkinter.Canvas may now
+    belong to another window):  drawing on it fails, just as drawing
+    on a destroyed tkinter.Canvas does.
+    """
+
+    def __getattr__(self, name):
+        raise _could_not_place_shape_exception()
+
+
+def _could_not_place_shape_exception():
+    msg = "Could not place the shape\n"
+    msg += "on the given window.\n"
+    msg += "Did you accidentally close a window\n"
+    msg += "that later needed to be rendered again?"
+    return Exception(msg)
+
+
+# ----------------------------------------------------------------------
+# Helpers for building Tcl scripts (for batch rendering).
+# Every character that is special to Tcl is escaped with a backslash,
+# so that each value is exactly one word of the resulting command.
+# ----------------------------------------------------------------------
+_TCL_SPECIAL_CHARACTERS = re.compile(r'[\\\[\]{}$";\s]')
+_TCL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def _tcl_quote(value):
+    """ Returns the given value as a single (escaped) Tcl word. """
+    word = str(value)
+    if word == "":
+        return "{}"
+    return _TCL_SPECIAL_CHARACTERS.sub(
+        lambda match: _TCL_ESCAPES.get(match.group(), "\\" + match.group()),
+        word)
+
+
+def _tcl_words(values):
+    return " ".join([_tcl_quote(value) for value in values])
+
+
+def _tcl_options(options):
+    """
+    Returns the given tkinter options as Tcl words  -name value ...
+    Options whose value is None are omitted, just as tkinter does.
+    """
+    words = []
+    for name, value in options.items():
+        if value is not None:
+            words.append("-" + name)
+            words.append(_tcl_quote(value))
+    return " ".join(words)
+
+
+class _SpatialIndex(object):
+    """
+    A uniform grid of square cells over a RoseCanvas, for finding the
+    shapes near a point or in a rectangle without looking at every shape.
+    Each shape is listed in each cell that its bounds overlap -- or, if
+    that is a great many cells, in a short list of big shapes that every
+    query checks.  Shapes that changed are re-indexed at the next query.
+    """
+    CELL_SIZE = 16
+    MAXIMUM_CELLS_PER_SHAPE = 256
+
+    _BIG = "big"  # Instead of the cells of a big shape
+
+    def __init__(self, shapes=()):
+        self._cells = {}  # (column, row) -> {id(shape): shape}
+        self._big_shapes = {}  # id(shape) -> shape
+        self._entries = {}  # id(shape) -> [shape, order, bounds, cells]
+        self._stale = {}  # id(shape) -> shape, for shapes to re-index
+        self._next_order = 0
+        for shape in shapes:
+            self.add(shape)
+
+    def add(self, shape):
+        self._entries[id(shape)] = [shape, self._next_order, None, ()]
+        self._next_order = self._next_order + 1
+        self._stale[id(shape)] = shape
+
+    def remove(self, shape):
+        entry = self._entries.pop(id(shape), None)
+        if entry is not None:
+            self._unlist(id(shape), entry[3])
+        self._stale.pop(id(shape), None)
+
+    def mark_changed(self, shape):
+        self._stale[id(shape)] = shape
+
+    def shapes_at(self, x, y):
+        """
+        Returns a list of the indexed shapes whose bounds contain (x, y),
+        in the order they were added.
+        """
+        self._refresh()
+        size = _SpatialIndex.CELL_SIZE
+        try:
+            cell = self._cells.get((int(x // size), int(y // size)), {})
+        except (OverflowError, ValueError):  # Infinite or NaN
+            cell = {}  # Only big shapes can have such points
+        found = []
+        for candidates in (cell, self._big_shapes):
+            for key, shape in candidates.items():
+                entry = self._entries[key]
+                left, top, right, bottom = entry[2]
+                if left <= x <= right and top <= y <= bottom:
+                    found.append((entry[1], shape))
+        found.sort(key=_first_item)
+        return [shape for _, shape in found]
+
+    def shapes_in(self, left, top, right, bottom, touching=False):
+        """
+        Returns a list of the indexed shapes whose bounds are inside
+        the given rectangle (or, if touching is True, overlap it),
+        in the order they were added.
+        """
+        self._refresh()
+        size = _SpatialIndex.CELL_SIZE
+        try:
+            first_column, first_row = int(left // size), int(top // size)
+            last_column, last_row = int(right // size), int(bottom // size)
+        except (OverflowError, ValueError):  # Infinite or NaN
+            first_column = first_row = -math.inf
+            last_column = last_row = math.inf
+        number_of_cells = ((last_column - first_column + 1) *
+                           (last_row - first_row + 1))
+        if number_of_cells <= len(self._cells):
+            cells = [self._cells.get((column, row))
+                     for column in range(first_column, last_column + 1)
+                     for row in range(first_row, last_row + 1)]
+        else:
+            cells = [shapes for (column, row), shapes in self._cells.items()
+                     if first_column <= column <= last_column and
+                     first_row <= row <= last_row]
+        cells.append(self._big_shapes)
+
+        found = {}
+        for candidates in cells:
+            if not candidates:
+                continue
+            for key, shape in candidates.items():
+                if key in found:
+                    continue
+                entry = self._entries[key]
+                x1, y1, x2, y2 = entry[2]
+                if touching:
+                    is_found = (x1 <= right and left <= x2 and
+                                y1 <= bottom and top <= y2)
+                else:
+                    is_found = (left <= x1 and x2 <= right and
+                                top <= y1 and y2 <= bottom)
+                if is_found:
+                    found[key] = (entry[1], shape)
+        return [shape for _, shape in sorted(found.values(),
+                                             key=_first_item)]
+
+    def _refresh(self):
+        """ Re-indexes the shapes that were added or changed. """
+        if not self._stale:
+            return
+        for key, shape in self._stale.items():
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            bounds = shape._get_bounds()
+            if bounds == entry[2]:
+                continue
+            self._unlist(key, entry[3])
+            entry[2] = bounds
+            entry[3] = self._list(key, shape, bounds)
+        self._stale = {}
+
+    def _list(self, key, shape, bounds):
+        """ Lists the shape in the cells for the given bounds. """
+        if bounds is None:
+            return ()
+        size = _SpatialIndex.CELL_SIZE
+        left, top, right, bottom = bounds
+        try:
+            first_column, first_row = int(left // size), int(top // size)
+            last_column, last_row = int(right // size), int(bottom // size)
+        except (OverflowError, ValueError):  # Infinite or NaN
+            self._big_shapes[key] = shape
+            return _SpatialIndex._BIG
+        if ((last_column - first_column + 1) * (last_row - first_row + 1)
+                > _SpatialIndex.MAXIMUM_CELLS_PER_SHAPE):
+            self._big_shapes[key] = shape
+            return _SpatialIndex._BIG
+        cells = tuple((column, row)
+                      for column in range(first_column, last_column + 1)
+                      for row in range(first_row, last_row + 1))
+        for cell in cells:
+            shapes = self._cells.get(cell)
+            if shapes is None:
+                shapes = self._cells[cell] = {}
+            shapes[key] = shape
+        return cells
+
+    def _unlist(self, key, cells):
+        if cells is _SpatialIndex._BIG:
+            del self._big_shapes[key]
+            return
+        for cell in cells:
+            shapes = self._cells[cell]
+            del shapes[key]
+            if not shapes:
+                del self._cells[cell]
+
+
+def _first_item(pair):
+    return pair[0]
 
 
 class Mouse(object):
@@ -437,13 +1900,24 @@ class __FreezeClass__ (type):
         raise SyntaxError(err)
 
 
+def _box_coordinates(x1, y1, x2, y2):
+    """
+    Returns (left, top, right, bottom) of the box with corners (x1, y1)
+    and (x2, y2) -- the coordinates with which Tk draws an oval or
+    rectangle in that box.  It is the same as  min  and  max  would
+    compute, but quicker (this is on the path of every render).
+    """
+    return (x1 if x1 <= x2 else x2, y1 if y1 <= y2 else y2,
+            x2 if x2 > x1 else x1, y2 if y2 > y1 else y1)
+
+
 class _Shape(object, metaclass=__FreezeClass__):
     """
     A Shape is a thing that can be drawn on a RoseCanvas
     (which itself draws on a tkinter Canvas).
 
-    Its constructor provides the tkinter method to be used to
-    draw this Shape.
+    Its constructor provides the name of the tkinter method to be used
+    to draw this Shape.
 
     This abstract type has concrete subclasses that include:
       Arc, Bitmap, Circle, Ellipse, Image, Line, Path, Polygon,
@@ -452,31 +1926,231 @@ class _Shape(object, metaclass=__FreezeClass__):
     Public data attributes:  None.
     Public methods: attach_to.
     """
+    # The bookkeeping attributes live in slots (not in a __dict__),
+    # to save memory.  Subclasses that declare no __slots__ of their own
+    # keep their other attributes in a __dict__ as usual.
+    __slots__ = ("_owners", "_method_name_for_drawing",
+                 "_shape_id_by_canvas", "_hash")
+
+    def __init__(self, method_name_for_drawing):
+        """  Arguments:
+          -- the name of the tkinter.Canvas method for drawing the Shape
+               (e.g. "create_oval").
+        """
+        self._hash = None  # Computed when first needed (see __hash__)
+        self._owners = None  # See _add_owner
+        self._method_name_for_drawing = method_name_for_drawing
+        self._shape_id_by_canvas = None  # A dict, once first attached
+
+    @property
+    def shape_id_by_canvas(self):
+        """
+        A dictionary whose keys are the RoseCanvases to which this Shape
+        is attached; the value for a RoseCanvas is the id of the item
+        that draws this Shape on it (None until first drawn).
+        """
+        if self._shape_id_by_canvas is None:
+            self._shape_id_by_canvas = {}
+        return self._shape_id_by_canvas
 
-    def __init__(self, method_for_drawing):
-        """  Arguments:
-          -- the tkinter method for drawing the Shape.
+    def __setattr__(self, name, value):
+        """
+        Sets the attribute as usual.  Setting a public attribute
+        (e.g. center, radius, fill_color) also records that this Shape
+        has changed, so that the next render re-draws it.
+        Setting a color (e.g. fill_color) to something that is not
+        a color raises an Exception at once (but see _check_color).
+        """
+        if name[0] == "_":
+            object.__setattr__(self, name, value)
+            return
+        if name[-5:] == "color":
+            _check_color(value)
+        old_value = getattr(self, name, None)
+        object.__setattr__(self, name, value)
+        if old_value is not value:
+            if isinstance(old_value, _Shape):
+                old_value._remove_owner(self)
+            if isinstance(value, _Shape):
+                value._add_owner(self)
+        self._mark_changed()
+
+    def _add_owner(self, shape):
+        """
+        Records that this Shape is part of the given Shape
+        (e.g. is a Circle's center), so that changes to this Shape
+        also count as changes to the given Shape.
+
+        The owners are held by weak references (so that being part of
+        a Shape does not keep that Shape alive):  a single weakref.ref
+        for the usual single owner, else a dictionary from the id of
+        each owner to a weakref.ref to it.
+        """
+        owners = self._owners
+        if owners is None:
+            self._owners = weakref.ref(shape)
+            return
+        if type(owners) is not dict:
+            owner = owners()
+            if owner is shape:
+                return
+            self._owners = {}
+            if owner is not None:
+                self._owners[id(owner)] = owners
+            owners = self._owners
+        reference = owners.get(id(shape))
+        if reference is None or reference() is not shape:
+            owners[id(shape)] = weakref.ref(shape)
+
+    def _remove_owner(self, shape):
+        """
+        Records that this Shape is no longer part of the given Shape
+        (e.g. because it is no longer that Circle's center).
+        """
+        owners = self._owners
+        if owners is None:
+            return
+        if type(owners) is not dict:
+            if owners() is shape or owners() is None:
+                self._owners = None
+            return
+        reference = owners.get(id(shape))
+        if reference is not None and reference() is shape:
+            del owners[id(shape)]
+
+    def _mark_changed(self):
+        object.__setattr__(self, "_hash", None)  # It may have changed
+        canvases = self._shape_id_by_canvas
+        if canvases:
+            for canvas in canvases:
+                canvas._shape_changed(self)
+        owners = self._owners
+        if owners is not None:
+            if type(owners) is not dict:
+                owner = owners()
+                if owner is None:  # It no longer exists
+                    self._owners = None
+                else:
+                    owner._mark_changed()
+                return
+            for key, reference in list(owners.items()):
+                owner = reference()
+                if owner is None:
+                    del owners[key]
+                else:
+                    owner._mark_changed()
+
+    def _get_public_attributes(self):
+        """
+        Returns a new dictionary of the public attributes of this Shape
+        (e.g. center, radius, fill_color), whether they are stored in
+        slots or in its __dict__.
+        """
+        names = _public_slot_names(self.__class__)
+        if names:
+            attributes = dict(zip(names, [getattr(self, name)
+                                          for name in names]))
+        else:
+            attributes = {}
+        instance_dict = getattr(self, "__dict__", None)
+        if instance_dict:
+            for name, value in instance_dict.items():
+                if name[0] != "_":
+                    attributes[name] = value
+        return attributes
+
+    def _get_bounds(self):
         """
-        self._method_for_drawing = method_for_drawing
-        self.shape_id_by_canvas = {}
+        Returns (left, top, right, bottom) of the box that encloses
+        this Shape as drawn, or None if it has no coordinates.
+        """
+        coordinates = self._get_coordinates_for_drawing()
+        if len(coordinates) < 2:
+            return None
+        xs = coordinates[0::2]
+        ys = coordinates[1::2]
+        return (min(xs), min(ys), max(xs), max(ys))
 
     def __eq__(self, other):
         """
         Two Shape objects are equal (==) if all their attributes
         are equal to each other.
         """
-        # check before we go deleting keys that may or may not exist
-        if(not isinstance(other, self.__class__)):
+        if self is other:
+            return True
+        if not isinstance(other, self.__class__):
+            return False
+        if (self._hash is not None and other._hash is not None and
+                self._hash != other._hash):
+            # Equal Shapes have equal hashes, and a cached hash is never
+            # stale (see __hash__).
+            return False
+
+        # Compare the attributes in slots (all at once), then the
+        # attributes in the __dict__ (if any) -- directly, unless
+        # a private attribute there might spoil the comparison.
+        get_slots, has_dict = _attribute_layout(self.__class__)
+        if get_slots is not None and get_slots(self) != get_slots(other):
             return False
-        self_dict = self.__dict__.copy()
-        other_dict = other.__dict__.copy()
-        del self_dict["shape_id_by_canvas"]
-        del other_dict["shape_id_by_canvas"]
-        return (self_dict == other_dict)
+        if not has_dict:
+            return True
+        mine = self.__dict__
+        theirs = getattr(other, "__dict__", None)
+        if mine == theirs:
+            return True
+        if not (_has_private_names(mine) or _has_private_names(theirs)):
+            return False
+        return (self._get_public_attributes() ==
+                other._get_public_attributes())
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
+    def __hash__(self):
+        """
+        Returns a hash of this Shape's attributes, so that equal Shapes
+        have equal hashes (and so Shapes can be put into sets and be
+        keys of dictionaries).  It is computed only when first needed
+        after this Shape (or a Shape that is part of it) changes.
+        Beware:  a Shape that changes while it is in a set (or is a key
+        of a dictionary) may no longer be found there.
+
+        The hash is kept (until this Shape changes) only if every
+        attribute is a str, number, bool, None or Shape whose own hash is
+        kept, since only then does every change go through __setattr__.
+        Otherwise (e.g. an attribute is a list, which can change in
+        place) it is computed afresh each time.  So __eq__ can trust a
+        kept hash.
+        """
+        hash_value = self._hash
+        if hash_value is not None:
+            return hash_value
+        try:
+            key = self._get_hash_key(False)
+            hash_value = hash(key)
+        except TypeError:  # Some attribute (e.g. a list) is unhashable
+            return hash(self._get_hash_key(True))
+        if _changes_are_tracked(self):
+            object.__setattr__(self, "_hash", hash_value)
+        return hash_value
+
+    def _get_hash_key(self, is_converting):
+        """
+        Returns the public attributes of this Shape, as values in slots
+        and a frozenset of the (name, value) pairs in its __dict__.
+        If  is_converting, each value is first made hashable.
+        """
+        get_slots, has_dict = _attribute_layout(self.__class__)
+        key = get_slots(self) if get_slots is not None else ()
+        attributes = self.__dict__ if has_dict else None
+        if attributes:
+            items = attributes.items()
+            if is_converting or _has_private_names(attributes):
+                items = [(name, _hashable(value) if is_converting else value)
+                         for name, value in items if name[0] != "_"]
+            key = (key, frozenset(items))
+        return _hashable(key) if is_converting else key
+
     def attach_to(self, window_or_canvas):
         """
         "draws" this Shape.  More precisely:
@@ -498,11 +2172,101 @@ class _Shape(object, metaclass=__FreezeClass__):
         this shape will no longer appear
         on that RoseWindow/RoseCanvas.
         """
-        if type(rose_canvas) == RoseWindow:
+        if isinstance(rose_canvas, RoseWindow):
             rose_canvas = rose_canvas.initial_canvas
         rose_canvas._undraw(self)
 
 
+def _has_private_names(attributes):
+    """ Returns True if the given dictionary has a key that starts with _ """
+    if attributes:
+        for name in attributes:
+            if name[0] == "_":
+                return True
+    return False
+
+
+_PLAINLY_HASHABLE_TYPES = frozenset([str, int, float, bool, type(None)])
+
+
+def _changes_are_tracked(shape):
+    """
+    Returns True if the public attributes of the given Shape are all
+    values that cannot change without the Shape being told:  strs,
+    numbers, bools, None and Shapes whose hashes are kept.
+    """
+    values = [getattr(shape, name)
+              for name in _public_slot_names(shape.__class__)]
+    attributes = getattr(shape, "__dict__", None)
+    if attributes:
+        values.extend(value for name, value in attributes.items()
+                      if name[0] != "_")
+    for value in values:
+        if value.__class__ in _PLAINLY_HASHABLE_TYPES:
+            continue
+        if not isinstance(value, _Shape) or value._hash is None:
+            return False
+    return True
+
+
+def _hashable(value):
+    """
+    Returns the given value, or a hashable stand-in for it that is equal
+    for values that are equal (e.g. a tuple for a list).
+    """
+    if value.__class__ in _PLAINLY_HASHABLE_TYPES or isinstance(value,
+                                                                _Shape):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple([_hashable(item) for item in value])
+    if isinstance(value, dict):
+        return frozenset([(key, _hashable(item))
+                          for key, item in value.items()])
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    try:
+        hash(value)
+    except TypeError:
+        return type(value).__name__  # Coarse, but equal when equal
+    return value
+
+
+_attribute_layout_by_class = {}
+
+
+def _attribute_layout(cls):
+    """
+    Returns (get_slots, has_dict) for Shapes of the given class, where
+    get_slots  is a function that returns the values of the public slots
+    of such a Shape (as a tuple, or a single value if there is only one),
+    or None if there are none, and  has_dict  is whether such a Shape
+    has a __dict__.
+    """
+    try:
+        return _attribute_layout_by_class[cls]
+    except KeyError:
+        names = _public_slot_names(cls)
+        layout = (operator.attrgetter(*names) if names else None,
+                  cls.__dictoffset__ != 0)
+        _attribute_layout_by_class[cls] = layout
+        return layout
+
+
+_public_slot_names_by_class = {}
+
+
+def _public_slot_names(cls):
+    """ Returns the names of the public slots of the given class. """
+    names = _public_slot_names_by_class.get(cls)
+    if names is None:
+        names = tuple(name
+                      for klass in reversed(cls.__mro__)
+                      for name in klass.__dict__.get("__slots__", ())
+                      if name[0] != "_")
+        _public_slot_names_by_class[cls] = names
+    return names
+
+
 class _ShapeWithOutline(object):
     """
     A Shape that has an interior (which can be filled with a color)
@@ -515,6 +2279,8 @@ class _ShapeWithOutline(object):
     Public data attributes:  fill_color, outline_color, outline_thickness.
     Public methods:  _initialize_options.
     """
+    __slots__ = ()
+
     defaults = {"fill_color": None,
                 "outline_color": "black",
                 "outline_thickness": 1}
@@ -526,16 +2292,10 @@ class _ShapeWithOutline(object):
             "outline_thickness"]
 
     def _get_options_for_drawing(self):
-        options = {"fill": self.fill_color,
-                   "outline": self.outline_color,
-                   "width": self.outline_thickness}
-
-        # If a color is None, that means transparent here:
-        for option in ("fill", "outline"):
-            if not options[option]:
-                options[option] = ""
-
-        return options
+        # If a color is None, that means transparent here.
+        return {"fill": _tk_color(self.fill_color),
+                "outline": _tk_color(self.outline_color),
+                "width": self.outline_thickness}
 
 
 class _ShapeWithThickness(object):
@@ -549,6 +2309,8 @@ class _ShapeWithThickness(object):
     Public data attributes:  color, thickness.
     Public methods:  _initialize_options.
     """
+    __slots__ = ()
+
     defaults = {"color": "black",
                 "thickness": 1,
                 "arrow": None}
@@ -559,15 +2321,53 @@ class _ShapeWithThickness(object):
         self.arrow = _ShapeWithThickness.defaults["arrow"]
 
     def _get_options_for_drawing(self):
-        options = {"fill": self.color,
-                   "width": self.thickness,
-                   "arrow": self.arrow}
+        # If a color is None, that means "black" here.
+        color = self.color
+        return {"fill": "#000000" if color is None else _tk_color(color),
+                "width": self.thickness,
+                "arrow": self.arrow}
 
-        # If a color is None, that means "black" here:
-        if options["fill"] is None:
-            options["fill"] = "black"
 
-        return options
+# ----------------------------------------------------------------------
+# All the Text shapes with the same font characteristics share a single
+# tkinter Font (each of which is a named font in the Tcl interpreter).
+# At most  _FONT_CACHE_SIZE  Fonts are kept; when another is needed,
+# the least-recently-used one is discarded.
+# ----------------------------------------------------------------------
+_FONT_CACHE_SIZE = 64
+_font_cache = collections.OrderedDict()
+
+
+def _get_font(family, size, weight, slant, underline, overstrike):
+    """
+    Returns the (shared) tkinter Font with the given characteristics,
+    constructing it only if it is not already in the font cache.
+    """
+    if not _master_Tk:
+        # No tkinter root (e.g. only headless windows): a Tk font
+        # description says the same thing without needing Tk.
+        styles = [weight, slant]
+        if underline:
+            styles.append("underline")
+        if overstrike:
+            styles.append("overstrike")
+        return (family, size, " ".join(styles))
+
+    key = (family, size, weight, slant, underline, overstrike)
+    font = _font_cache.get(key)
+    if font is None:
+        font = tkinter_font.Font(family=family,
+                                 size=size,
+                                 weight=weight,
+                                 slant=slant,
+                                 underline=underline,
+                                 overstrike=overstrike)
+        _font_cache[key] = font
+        if len(_font_cache) > _FONT_CACHE_SIZE:
+            _font_cache.popitem(last=False)
+    else:
+        _font_cache.move_to_end(key)
+    return font
 
 
 class _ShapeWithText(object):
@@ -582,6 +2382,8 @@ class _ShapeWithText(object):
 
     Public methods:  _initialize_options.
     """
+    __slots__ = ()
+
     # FIXME: Add more to the above docstring.
     defaults = {"font_family": "helvetica",
                 "font_size": 14,
@@ -589,7 +2391,7 @@ class _ShapeWithText(object):
                 "slant":  "roman",
                 "underline":  0,
                 "overstrike":  0,
-                "justify": tkinter.CENTER,
+                "justify": "center",
                 "text_box_width": None,
                 "text_color": "black",
                 "text": ""}
@@ -612,16 +2414,13 @@ class _ShapeWithText(object):
         slant = "italic" if self.is_italic else "roman"
         underline = 1 if self.is_underline else 0
         overstrike = 1 if self.is_overstrike else 0
-        font = tkinter_font.Font(family=self.font_family,
-                                 size=self.font_size,
-                                 weight=weight,
-                                 slant=slant,
-                                 underline=underline,
-                                 overstrike=overstrike)
+        font = _get_font(self.font_family, self.font_size,
+                         weight, slant, underline, overstrike)
 
         options = {"font": font,
                    "justify": self.justify,
-                   "fill": self.text_color,
+                   "fill": (None if self.text_color is None
+                            else _tk_color(self.text_color)),
                    "text": self.text}
         if self.text_box_width:
             options["width"] = self.text_box_width
@@ -643,16 +2442,16 @@ class _ShapeWithCenter(_Shape):
     Public methods: move_by, move_center_to.
     """
 
-    def __init__(self, center, method_for_drawing):
+    def __init__(self, center, method_name_for_drawing):
         """
         Arguments:
           -- the Point that is the center of the Shape
                (the Shape stores a CLONE of that Point)
-          -- the tkinter method for drawing the Shape.
+          -- the name of the tkinter method for drawing the Shape.
         """
         # Clone the   center   argument, so that if the caller
         # mutates the argument, it does NOT affect this Shape.
-        super().__init__(method_for_drawing)
+        super().__init__(method_name_for_drawing)
         self.center = center.clone()
 
     def move_by(self, dx, dy):
@@ -710,19 +2509,17 @@ class _RectangularShape(_Shape):
       shape.corner_2 = shape.corner_2 - 50
     """
 
-    def __init__(self, corner_1, corner_2, method_for_drawing):
+    def __init__(self, corner_1, corner_2, method_name_for_drawing):
         """
           :type  corner_1:  Point
           :type  corner_2:  Point
-          :type  method_for_drawing: callable(int, int, int, int) -> int
+          :type  method_name_for_drawing: str
         """
-        super().__init__(method_for_drawing)
+        super().__init__(method_name_for_drawing)
 
         self.corner_1 = corner_1.clone()
         self.corner_2 = corner_2.clone()
 
-        self._update_corners()
-
     def __repr__(self):
         """ Returns a string representation of this shape. """
         f_string = ""
@@ -761,8 +2558,8 @@ class _RectangularShape(_Shape):
         corner of this _RectanglarShape.
         The returned value is an rg.Point.
         """
-        self._update_corners()
-        return self._upper_left_corner
+        return Point(min(self.corner_1.x, self.corner_2.x),
+                     min(self.corner_1.y, self.corner_2.y))
 
     def get_lower_left_corner(self):
         """
@@ -770,8 +2567,8 @@ class _RectangularShape(_Shape):
         corner of this _RectanglarShape.
         The returned value is an rg.Point.
         """
-        self._update_corners()
-        return self._lower_left_corner
+        return Point(min(self.corner_1.x, self.corner_2.x),
+                     max(self.corner_1.y, self.corner_2.y))
 
     def get_upper_right_corner(self):
         """
@@ -779,8 +2576,8 @@ class _RectangularShape(_Shape):
         corner of this _RectanglarShape.
         The returned value is an rg.Point.
         """
-        self._update_corners()
-        return self._upper_right_corner
+        return Point(max(self.corner_1.x, self.corner_2.x),
+                     min(self.corner_1.y, self.corner_2.y))
 
     def get_lower_right_corner(self):
         """
@@ -788,8 +2585,8 @@ class _RectangularShape(_Shape):
         corner of this _RectanglarShape.
         The returned value is an rg.Point.
         """
-        self._update_corners()
-        return self._lower_right_corner
+        return Point(max(self.corner_1.x, self.corner_2.x),
+                     max(self.corner_1.y, self.corner_2.y))
 
     def get_center(self):
         """
@@ -821,22 +2618,13 @@ class _RectangularShape(_Shape):
         """
         return Rectangle(self.corner_1, self.corner_2)
 
-    def _update_corners(self):
-        min_x = min(self.corner_1.x, self.corner_2.x)
-        min_y = min(self.corner_1.y, self.corner_2.y)
-        max_x = max(self.corner_1.x, self.corner_2.x)
-        max_y = max(self.corner_1.y, self.corner_2.y)
-
-        self._upper_left_corner = Point(min_x, min_y)
-        self._upper_right_corner = Point(max_x, min_y)
-        self._lower_left_corner = Point(min_x, max_y)
-        self._lower_right_corner = Point(max_x, max_y)
-
     def _get_coordinates_for_drawing(self):
-        return [self.get_upper_left_corner().x,
-                self.get_upper_left_corner().y,
-                self.get_lower_right_corner().x,
-                self.get_lower_right_corner().y]
+        corner_1, corner_2 = self.corner_1, self.corner_2
+        return _box_coordinates(corner_1.x, corner_1.y,
+                                corner_2.x, corner_2.y)
+
+    def _get_bounds(self):
+        return self._get_coordinates_for_drawing()
 
 
 class Arc(_RectangularShape, _ShapeWithOutline):
@@ -908,7 +2696,7 @@ class Circle(_ShapeWithCenter, _ShapeWithOutline):
         # The following sets instance variable
         #   self.center
         # to a clone (copy) of the given rg.Point.
-        super().__init__(center, tkinter.Canvas.create_oval)
+        super().__init__(center, "create_oval")
 
         # The following sets default values for:
         #   self.fill_color
@@ -944,7 +2732,13 @@ class Circle(_ShapeWithCenter, _ShapeWithOutline):
         return Rectangle(c1, c2)
 
     def _get_coordinates_for_drawing(self):
-        return self.get_bounding_box()._get_coordinates_for_drawing()
+        # The corners of the bounding box, computed without constructing it.
+        x, y, radius = self.center.x, self.center.y, self.radius
+        return _box_coordinates(x - radius, y - radius, x + radius, y + radius)
+
+    def _get_bounds(self):
+        x, y, radius = self.center.x, self.center.y, abs(self.radius)
+        return (x - radius, y - radius, x + radius, y + radius)
 
 
 class Ellipse(_RectangularShape, _ShapeWithOutline):
@@ -1036,7 +2830,7 @@ class Ellipse(_RectangularShape, _ShapeWithOutline):
         #   self.corner_2
         # to clones (copies) of the given rg.Points.
         super().__init__(corner_1, corner_2,
-                         tkinter.Canvas.create_oval)
+                         "create_oval")
 
         # The following sets default values for:
         #   self.fill_color
@@ -1114,7 +2908,7 @@ class Line(_Shape, _ShapeWithThickness):
           :type  start:  rg.Point
           :type  end:    rg.Point
         """
-        super().__init__(tkinter.Canvas.create_line)
+        super().__init__("create_line")
 
         # The following sets default values for:
         #   self.color
@@ -1160,10 +2954,15 @@ class Line(_Shape, _ShapeWithThickness):
                      (self.start.y + self.end.y) / 2)
 
     def _get_coordinates_for_drawing(self):
-        return [self.start.x,
-                self.start.y,
-                self.end.x,
-                self.end.y]
+        start, end = self.start, self.end
+        return (start.x, start.y, end.x, end.y)
+
+    def _get_bounds(self):
+        half = self.thickness / 2
+        return (min(self.start.x, self.end.x) - half,
+                min(self.start.y, self.end.y) - half,
+                max(self.start.x, self.end.x) + half,
+                max(self.start.y, self.end.y) + half)
 
 
 class Path(_Shape, _ShapeWithThickness):
@@ -1222,6 +3021,13 @@ class Point(_Shape, _ShapeWithOutline):
        p.outline_color = "black"
        p.outline_thickness = 1
     """
+    # A program may make millions of Points, so all of a Point's
+    # attributes live in slots, which take far less memory than a
+    # __dict__ (and so a Point has no other attributes).
+    __slots__ = ("x", "y", "fill_color", "outline_color",
+                 "outline_thickness", "width_for_drawing",
+                 "height_for_drawing")
+
     defaults = {"width_for_drawing": 5,
                 "height_for_drawing": 5,
                 "fill_color": "black",
@@ -1233,7 +3039,7 @@ class Point(_Shape, _ShapeWithOutline):
           :type  x:  float
           :type  y:  float
         """
-        super().__init__(tkinter.Canvas.create_oval)
+        super().__init__("create_oval")
 
         self.fill_color = Point.defaults["fill_color"]
         self.outline_color = Point.defaults["outline_color"]
@@ -1286,7 +3092,12 @@ class Point(_Shape, _ShapeWithOutline):
         return Rectangle(c1, c2)
 
     def _get_coordinates_for_drawing(self):
-        return self.get_bounding_box()._get_coordinates_for_drawing()
+        # The corners of the bounding box, computed without constructing it.
+        x, y = self.x, self.y
+        half_width = self.width_for_drawing / 2
+        half_height = self.height_for_drawing / 2
+        return _box_coordinates(x - half_width, y - half_width,
+                                x + half_height, y + half_height)
 
 
 class Polygon(_Shape, _ShapeWithOutline):
@@ -1378,7 +3189,7 @@ class Rectangle(_RectangularShape, _ShapeWithOutline):
         #   self.corner_2
         # to clones (copies) of the given rg.Points.
         super().__init__(corner_1, corner_2,
-                         tkinter.Canvas.create_rectangle)
+                         "create_rectangle")
 
         # The following sets default values for:
         #   self.fill_color
@@ -1460,7 +3271,7 @@ class Square(_ShapeWithCenter, _ShapeWithOutline):
         # The following sets instance variable
         #   self.center
         # to a clone (copy) of the given rg.Point.
-        super().__init__(center, tkinter.Canvas.create_rectangle)
+        super().__init__(center, "create_rectangle")
 
         # The following sets default values for:
         #   self.fill_color
@@ -1496,7 +3307,15 @@ class Square(_ShapeWithCenter, _ShapeWithOutline):
         return Rectangle(c1, c2)
 
     def _get_coordinates_for_drawing(self):
-        return self.get_bounding_box()._get_coordinates_for_drawing()
+        # The corners of the bounding box, computed without constructing it.
+        x, y = self.center.x, self.center.y
+        half = self.length_of_each_side / 2
+        return _box_coordinates(x - half, y - half, x + half, y + half)
+
+    def _get_bounds(self):
+        x, y = self.center.x, self.center.y
+        half = abs(self.length_of_each_side) / 2
+        return (x - half, y - half, x + half, y + half)
 
 
 class Text(_ShapeWithCenter, _ShapeWithText):
@@ -1530,7 +3349,7 @@ class Text(_ShapeWithCenter, _ShapeWithText):
            :type center: rg.Point
            :type text str
         """
-        super().__init__(center, tkinter.Canvas.create_text)
+        super().__init__(center, "create_text")
         super()._initialize_options()
 
         self.text = text
@@ -1541,58 +3360,1229 @@ class Text(_ShapeWithCenter, _ShapeWithText):
         return "Text displaying '{}' at position {}".format(self.text,
                                                             self.center)
 
-    # FIXME: Have repr include characteristics??
-    # FIXME: Do a clone?
+    # FIXME: Have repr include characteristics??
+    # FIXME: Do a clone?
+
+#     def clone(self):
+#         return Square(self.center, self.length_of_each_side)
+
+#     def get_bounding_box(self):
+#         return Rectangle(self.center,
+#                          2 * self.length_of_each_side,
+#                          2 * self.length_of_each_side)
+
+# FIXME: Implement bounding_box using the tkinter function for it.
+
+    def _get_coordinates_for_drawing(self):
+        center = self.center
+        return (center.x, center.y)
+
+    def _get_bounds(self):
+        # Roughly:  characters are about 0.6 times as wide as they are
+        # tall, and Tk font sizes are in points (pixels if negative).
+        size = self.font_size
+        height = size * 4 / 3 if size > 0 else -size
+        lines = str(self.text).split("\n")
+        half_width = max(len(line) for line in lines) * 0.6 * height / 2
+        half_height = len(lines) * height / 2
+        return (self.center.x - half_width, self.center.y - half_height,
+                self.center.x + half_width, self.center.y + half_height)
+
+# Mark: Window/RoseWindow naming collision is causing mass confusion.
+# class Window(_Shape):
+#    """ Not yet implemented. """
+#    default_options = {}
+
+
+# CONSIDER: Are these right for here?
+class ShapeBatch(_Shape):
+    """
+    A collection of many Circles, Squares or Rectangles (its "members")
+    that is stored in NumPy arrays and is attached, moved, re-colored
+    and drawn all at once.  Use it instead of thousands of individual
+    shapes (e.g. for particles, cells of a grid, or points of a plot).
+    It needs the  numpy  package.
+
+    To construct a ShapeBatch, use:
+    -   rg.ShapeBatch(kind, centers, sizes)
+    where  kind  is "circle", "square" or "rectangle",
+    centers  is a sequence of (x, y) pairs (or an N x 2 array), and
+    sizes  is the radius (circle), length of each side (square) or
+    (width, height) pair (rectangle) of each member -- or a single
+    radius / length / pair to use for every member.
+
+    Instance variables include:
+
+      kind:  "circle", "square" or "rectangle".
+
+      centers:  An N x 2 NumPy array of the centers of the members.
+
+      sizes:  A NumPy array of the sizes of the members (see above).
+
+      fill_colors, outline_colors:  NumPy arrays of the colors
+      of the members (None means transparent).
+
+      outline_thickness:  The thickness (in pixels) of every
+      member's outline.
+
+    Examples:
+       centers = [(x, 100) for x in range(0, 400, 10)]
+       dots = rg.ShapeBatch("circle", centers, 4)
+       dots.set_fill_color("red")
+       dots.set_fill_color("blue", dots.indices_at(rg.Point(50, 100)))
+
+       window = rg.RoseWindow()
+       dots.attach_to(window)
+
+       dots.move_by(0, 5)                  # Every member
+       dots.move_by(3, 0, slice(0, 10))    # Just the first 10 members
+       dots.move_by(numpy.random.randn(len(dots)), 0)  # Each differently
+       window.render()
+
+    If you change the arrays yourself (e.g.  dots.centers[3] = (5, 5)),
+    call  dots.mark_changed()  afterwards so that they are re-drawn.
+    """
+    _ITEM_TYPES = {"circle": "oval", "square": "rectangle",
+                   "rectangle": "rectangle"}
+
+    def __init__(self, kind, centers, sizes):
+        """
+          :type  kind:  str
+          :type  centers:  numpy.ndarray
+          :type  sizes:  numpy.ndarray | float
+        """
+        if not _import_numpy():
+            msg = "A ShapeBatch needs the  numpy  package.\n"
+            msg += "Install it (e.g. with:  pip install numpy)."
+            raise Exception(msg)
+        if kind not in ShapeBatch._ITEM_TYPES:
+            msg = 'The kind of a ShapeBatch must be "circle", "square"'
+            msg += ' or "rectangle", not "{}".'.format(kind)
+            raise Exception(msg)
+
+        super().__init__("create_" + ShapeBatch._ITEM_TYPES[kind])
+
+        # For each RoseCanvas:  which members changed since last drawn.
+        self._changed_members_by_canvas = {}
+
+        centers = numpy.array(centers, dtype=float).reshape(-1, 2)
+        number_of_members = len(centers)
+        size_shape = (number_of_members, 2) if kind == "rectangle" \
+            else (number_of_members,)
+
+        self.kind = kind
+        self.centers = centers
+        self.sizes = numpy.broadcast_to(
+            numpy.array(sizes, dtype=float), size_shape).copy()
+        self.fill_colors = numpy.full(number_of_members, None, dtype=object)
+        self.outline_colors = numpy.full(
+            number_of_members, _ShapeWithOutline.defaults["outline_color"],
+            dtype=object)
+        self.outline_thickness = _ShapeWithOutline.defaults[
+            "outline_thickness"]
+
+    def __len__(self):
+        return len(self.centers)
+
+    def __repr__(self):
+        return "ShapeBatch of {} {}s".format(len(self), self.kind)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, ShapeBatch):
+            return False
+        # Unlike a Shape, its arrays can change in place (unseen), so its
+        # cached hash might be stale.  Compare them instead.
+        return (self.kind == other.kind and
+                self.outline_thickness == other.outline_thickness and
+                numpy.array_equal(self.centers, other.centers) and
+                numpy.array_equal(self.sizes, other.sizes) and
+                numpy.array_equal(self.fill_colors, other.fill_colors) and
+                numpy.array_equal(self.outline_colors, other.outline_colors))
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash((
+                self.kind, _hashable(self.outline_thickness),
+                tuple(self.centers.ravel().tolist()),
+                tuple(self.sizes.ravel().tolist()),
+                tuple(self.fill_colors.tolist()),
+                tuple(self.outline_colors.tolist()))))
+        return self._hash
+
+    def move_by(self, dx, dy, which=None):
+        """
+        Moves the members of this ShapeBatch selected by  which  (all of
+        them if None; else an index, slice, index array or boolean mask)
+        to the right by dx and down by dy.  Each of dx and dy is
+        either a number or an array with one number per selected member.
+        """
+        which = slice(None) if which is None else which
+        self.centers[which, 0] += dx
+        self.centers[which, 1] += dy
+        self.mark_changed(which)
+
+    def move_to(self, x, y, which=None):
+        """
+        Moves the centers of the selected members (see move_by)
+        to x and y (each a number or an array of numbers).
+        """
+        which = slice(None) if which is None else which
+        self.centers[which, 0] = x
+        self.centers[which, 1] = y
+        self.mark_changed(which)
+
+    def set_fill_color(self, color, which=None):
+        """ Sets the fill color of the selected members (see move_by). """
+        _check_color(color)
+        which = slice(None) if which is None else which
+        self.fill_colors[which] = color
+        self.mark_changed(which)
+
+    def set_outline_color(self, color, which=None):
+        """ Sets the outline color of the selected members (see move_by). """
+        _check_color(color)
+        which = slice(None) if which is None else which
+        self.outline_colors[which] = color
+        self.mark_changed(which)
+
+    def indices_at(self, point):
+        """
+        Returns a NumPy array of the indices of the members
+        of this ShapeBatch that contain the given rg.Point.
+        """
+        offsets = numpy.abs(self.centers - (point.x, point.y))
+        if self.kind == "circle":
+            inside = (offsets ** 2).sum(axis=1) <= self.sizes ** 2
+        else:
+            inside = (offsets <= self._get_half_sizes()).all(axis=1)
+        return numpy.flatnonzero(inside)
+
+    def mark_changed(self, which=None):
+        """
+        Records that the selected members (see move_by) have changed,
+        so that the next render re-draws them.
+        """
+        for changed_members in self._changed_members_by_canvas.values():
+            changed_members[slice(None) if which is None else which] = True
+        _Shape._mark_changed(self)
+
+    def _mark_changed(self):
+        # Setting a public attribute (e.g. centers) changes every member.
+        self.mark_changed()
+
+    def detach_from(self, rose_canvas):
+        if isinstance(rose_canvas, RoseWindow):
+            rose_canvas = rose_canvas.initial_canvas
+        super().detach_from(rose_canvas)
+        self._changed_members_by_canvas.pop(rose_canvas, None)
+
+    def _get_half_sizes(self):
+        """ Returns an N x 2 array of the half-widths and half-heights. """
+        if self.kind == "circle":
+            return numpy.column_stack((self.sizes, self.sizes))
+        if self.kind == "square":
+            return numpy.column_stack((self.sizes, self.sizes)) / 2
+        return self.sizes / 2
+
+    def _get_coordinates_for_drawing(self):
+        """ Returns an N x 4 array of the corners of the members. """
+        half_sizes = self._get_half_sizes()
+        return numpy.hstack((self.centers - half_sizes,
+                             self.centers + half_sizes))
+
+    def _get_bounds(self):
+        if len(self) == 0:
+            return None
+        coordinates = self._get_coordinates_for_drawing()
+        left, top = coordinates[:, :2].min(axis=0).tolist()
+        right, bottom = coordinates[:, 2:].max(axis=0).tolist()
+        return (left, top, right, bottom)
+
+    def _get_options_for_drawing(self, index):
+        return {"fill": _tk_color(self.fill_colors[index]),
+                "outline": _tk_color(self.outline_colors[index]),
+                "width": self.outline_thickness}
+
+    def _render_on(self, rose_canvas):
+        """
+        Draws the members of this ShapeBatch that changed since it was
+        last drawn on the given RoseCanvas (all of them the first time).
+        On a tkinter canvas, that is done with a single Tcl script.
+        """
+        item_ids = self.shape_id_by_canvas[rose_canvas]
+        if item_ids is None:
+            changed = numpy.arange(len(self))
+        else:
+            changed_members = self._changed_members_by_canvas[rose_canvas]
+            changed = numpy.flatnonzero(changed_members)
+            if len(item_ids) != len(self):
+                # Members were added or removed:  start over.
+                rose_canvas._tkinter_canvas.delete(*item_ids)
+                item_ids = None
+                changed = numpy.arange(len(self))
+        self._changed_members_by_canvas[rose_canvas] = \
+            numpy.zeros(len(self), dtype=bool)
+
+        coordinates = self._get_coordinates_for_drawing()[changed].tolist()
+        tk_canvas = rose_canvas._tkinter_canvas
+        if rose_canvas._window._is_headless:
+            create = getattr(tk_canvas, self._method_name_for_drawing)
+            if item_ids is None:
+                item_ids = [create(*xy) for xy in coordinates]
+            for index, xy in zip(changed.tolist(), coordinates):
+                tk_canvas.coords(item_ids[index], *xy)
+                tk_canvas.itemconfigure(item_ids[index],
+                                        self._get_options_for_drawing(index))
+        else:
+            try:
+                item_ids = self._render_with_tcl(tk_canvas, item_ids,
+                                                 changed, coordinates)
+            except tkinter.TclError:
+                if item_ids is None:  # None were kept (see below)
+                    self.shape_id_by_canvas[rose_canvas] = None
+                else:  # Draw them again next time
+                    self._changed_members_by_canvas[rose_canvas][
+                        changed] = True
+                if rose_canvas._window_was_closed():
+                    raise _could_not_place_shape_exception() from None
+                raise
+        self.shape_id_by_canvas[rose_canvas] = item_ids
+
+    def _render_with_tcl(self, tk_canvas, item_ids, changed, coordinates):
+        canvas_name = str(tk_canvas)
+        commands = []
+        if item_ids is None:
+            commands.append("set ::rosegraphics_ids {}")
+            command = "lappend ::rosegraphics_ids [{} create {} {{}} {{}}]"
+            command = command.format(canvas_name,
+                                     ShapeBatch._ITEM_TYPES[self.kind])
+            for index, xy in zip(changed.tolist(), coordinates):
+                commands.append(command.format(
+                    _tcl_words(xy),
+                    _tcl_options(self._get_options_for_drawing(index))))
+            commands.append("set ::rosegraphics_ids")
+        else:
+            for index, xy in zip(changed.tolist(), coordinates):
+                commands.append("{} coords {} {}".format(
+                    canvas_name, item_ids[index], _tcl_words(xy)))
+                commands.append("{} itemconfigure {} {}".format(
+                    canvas_name, item_ids[index],
+                    _tcl_options(self._get_options_for_drawing(index))))
+        if not commands:
+            return item_ids
+        try:
+            result = tk_canvas.tk.eval("\n".join(commands))
+        except tkinter.TclError:
+            if item_ids is None:
+                # Delete the items that the script created before it
+                # stopped, so that the next render starts over cleanly.
+                try:
+                    created = tk_canvas.tk.eval("set ::rosegraphics_ids")
+                    if created.split():
+                        tk_canvas.delete(*created.split())
+                except tkinter.TclError:
+                    pass
+            raise
+        if item_ids is None:
+            item_ids = [int(item_id) for item_id in result.split()]
+        return item_ids
+
+
+class Button(_Shape):
+    """ Not yet implemented. """
+    default_options = {}
+
+
+class Entry(_Shape):
+    """ Not yet implemented. """
+    default_options = {}
+
+
+class Color(object):
+    """
+    A Color represents a  fill or outline color created from custom
+    amounts of red, green, and blue light. The arguments are:
+    - The RED component (0-255),
+    - the GREEN component (0-255),
+    - the BLUE component (0-255).
+
+    This Color can be passed to RoseGraphics colors
+    such as fill_color and outline_color.
+
+    A Color can also be constructed from any other color, e.g.
+       rg.Color("midnight blue")   or   rg.Color("#191970")
+    """
+    __slots__ = ("red", "green", "blue", "_string")
+
+    def __init__(self, red, green=None, blue=None):
+        if green is None and blue is None:
+            packed = _color_to_packed(red)
+            if packed is None:
+                raise Exception("A Color cannot be transparent.")
+            red, green, blue = packed >> 16, (packed >> 8) & 255, packed & 255
+        self.red = red
+        self.green = green
+        self.blue = blue
+
+    def __setattr__(self, name, value):
+        if name != "_string":
+            # Any integer type will do (e.g. a numpy integer from an
+            # array of pixels), but it is stored as a plain int.
+            if (not isinstance(value, numbers.Integral)
+                    or not 0 <= value <= 255):
+                msg = "The {} of a Color must be an integer from 0 to 255,"
+                msg += " not {!r}."
+                raise Exception(msg.format(name, value))
+            value = int(value)
+            object.__setattr__(self, "_string", None)
+        object.__setattr__(self, name, value)
+
+    def __repr__(self):
+        if self._string is None:
+            self._string = "#{:02x}{:02x}{:02x}".format(self.red, self.green,
+                                                        self.blue)
+        return self._string
+
+    @property
+    def packed(self):
+        """ This Color as a packed RGB int:  0xRRGGBB. """
+        return (self.red << 16) | (self.green << 8) | self.blue
+
+
+# ----------------------------------------------------------------------
+# Colors.  A color can be a Tk color name (e.g. "midnight blue"; case,
+# spaces and "grey" versus "gray" do not matter), a "#rgb" / "#rrggbb"
+# (or "#rrrgggbbb" / "#rrrrggggbbbb") string, an rg.Color, or a
+# (red, green, blue) tuple of ints from 0 to 255.  None and "" mean
+# transparent.  Each color is resolved (once, then cached) to a packed
+# RGB int, 0xRRGGBB.
+#
+# The table of Tk color names below is generated from  COLORS.txt:
+# each name is followed by its "rrggbb" and then, for names that have
+# numbered variants (e.g. antiquewhite1 to antiquewhite4), theirs.
+# The Tk 8.6 web colors (aqua, crimson, ...) are included as well.
+# The "rr" of gray0 to gray100 are in _TK_GRAY_LEVELS.
+# ----------------------------------------------------------------------
+_TK_COLORS = (
+    "aliceblue f0f8ff antiquewhite faebd7 ffefdb eedfcc cdc0b0 8b8378 "
+    "aqua 00ffff aquamarine 7fffd4 7fffd4 76eec6 66cdaa 458b74 azure "
+    "f0ffff f0ffff e0eeee c1cdcd 838b8b beige f5f5dc bisque ffe4c4 ffe4c4 "
+    "eed5b7 cdb79e 8b7d6b black 000000 blanchedalmond ffebcd blue 0000ff "
+    "0000ff 0000ee 0000cd 00008b blueviolet 8a2be2 brown a52a2a ff4040 "
+    "ee3b3b cd3333 8b2323 burlywood deb887 ffd39b eec591 cdaa7d 8b7355 "
+    "cadetblue 5f9ea0 98f5ff 8ee5ee 7ac5cd 53868b chartreuse 7fff00 "
+    "7fff00 76ee00 66cd00 458b00 chocolate d2691e ff7f24 ee7621 cd661d "
+    "8b4513 coral ff7f50 ff7256 ee6a50 cd5b45 8b3e2f cornflowerblue "
+    "6495ed cornsilk fff8dc fff8dc eee8cd cdc8b1 8b8878 crimson dc143c "
+    "cyan 00ffff 00ffff 00eeee 00cdcd 008b8b darkblue 00008b darkcyan "
+    "008b8b darkgoldenrod b8860b ffb90f eead0e cd950c 8b6508 darkgray "
+    "a9a9a9 darkgreen 006400 darkkhaki bdb76b darkmagenta 8b008b "
+    "darkolivegreen 556b2f caff70 bcee68 a2cd5a 6e8b3d darkorange ff8c00 "
+    "ff7f00 ee7600 cd6600 8b4500 darkorchid 9932cc bf3eff b23aee 9a32cd "
+    "68228b darkred 8b0000 darksalmon e9967a darkseagreen 8fbc8f c1ffc1 "
+    "b4eeb4 9bcd9b 698b69 darkslateblue 483d8b darkslategray 2f4f4f "
+    "97ffff 8deeee 79cdcd 528b8b darkturquoise 00ced1 darkviolet 9400d3 "
+    "deeppink ff1493 ff1493 ee1289 cd1076 8b0a50 deepskyblue 00bfff "
+    "00bfff 00b2ee 009acd 00688b dimgray 696969 dodgerblue 1e90ff 1e90ff "
+    "1c86ee 1874cd 104e8b firebrick b22222 ff3030 ee2c2c cd2626 8b1a1a "
+    "floralwhite fffaf0 forestgreen 228b22 fuchsia ff00ff gainsboro "
+    "dcdcdc ghostwhite f8f8ff gold ffd700 ffd700 eec900 cdad00 8b7500 "
+    "goldenrod daa520 ffc125 eeb422 cd9b1d 8b6914 gray bebebe green "
+    "00ff00 00ff00 00ee00 00cd00 008b00 greenyellow adff2f honeydew "
+    "f0fff0 f0fff0 e0eee0 c1cdc1 838b83 hotpink ff69b4 ff6eb4 ee6aa7 "
+    "cd6090 8b3a62 indianred cd5c5c ff6a6a ee6363 cd5555 8b3a3a indigo "
+    "4b0082 ivory fffff0 fffff0 eeeee0 cdcdc1 8b8b83 khaki f0e68c fff68f "
+    "eee685 cdc673 8b864e lavender e6e6fa lavenderblush fff0f5 fff0f5 "
+    "eee0e5 cdc1c5 8b8386 lawngreen 7cfc00 lemonchiffon fffacd fffacd "
+    "eee9bf cdc9a5 8b8970 lightblue add8e6 bfefff b2dfee 9ac0cd 68838b "
+    "lightcoral f08080 lightcyan e0ffff e0ffff d1eeee b4cdcd 7a8b8b "
+    "lightgoldenrod eedd82 ffec8b eedc82 cdbe70 8b814c "
+    "lightgoldenrodyellow fafad2 lightgray d3d3d3 lightgreen 90ee90 "
+    "lightpink ffb6c1 ffaeb9 eea2ad cd8c95 8b5f65 lightsalmon ffa07a "
+    "ffa07a ee9572 cd8162 8b5742 lightseagreen 20b2aa lightskyblue 87cefa "
+    "b0e2ff a4d3ee 8db6cd 607b8b lightslateblue 8470ff lightslategray "
+    "778899 lightsteelblue b0c4de cae1ff bcd2ee a2b5cd 6e7b8b lightyellow "
+    "ffffe0 ffffe0 eeeed1 cdcdb4 8b8b7a lime 00ff00 limegreen 32cd32 "
+    "linen faf0e6 magenta ff00ff ff00ff ee00ee cd00cd 8b008b maroon "
+    "b03060 ff34b3 ee30a7 cd2990 8b1c62 mediumaquamarine 66cdaa "
+    "mediumblue 0000cd mediumorchid ba55d3 e066ff d15fee b452cd 7a378b "
+    "mediumpurple 9370db ab82ff 9f79ee 8968cd 5d478b mediumseagreen "
+    "3cb371 mediumslateblue 7b68ee mediumspringgreen 00fa9a "
+    "mediumturquoise 48d1cc mediumvioletred c71585 midnightblue 191970 "
+    "mintcream f5fffa mistyrose ffe4e1 ffe4e1 eed5d2 cdb7b5 8b7d7b "
+    "moccasin ffe4b5 navajowhite ffdead ffdead eecfa1 cdb38b 8b795e navy "
+    "000080 navyblue 000080 oldlace fdf5e6 olive 808000 olivedrab 6b8e23 "
+    "c0ff3e b3ee3a 9acd32 698b22 orange ffa500 ffa500 ee9a00 cd8500 "
+    "8b5a00 orangered ff4500 ff4500 ee4000 cd3700 8b2500 orchid da70d6 "
+    "ff83fa ee7ae9 cd69c9 8b4789 palegoldenrod eee8aa palegreen 98fb98 "
+    "9aff9a 90ee90 7ccd7c 548b54 paleturquoise afeeee bbffff aeeeee "
+    "96cdcd 668b8b palevioletred db7093 ff82ab ee799f cd687f 8b475d "
+    "papayawhip ffefd5 peachpuff ffdab9 ffdab9 eecbad cdaf95 8b7765 peru "
+    "cd853f pink ffc0cb ffb5c5 eea9b8 cd919e 8b636c plum dda0dd ffbbff "
+    "eeaeee cd96cd 8b668b powderblue b0e0e6 purple a020f0 9b30ff 912cee "
+    "7d26cd 551a8b red ff0000 ff0000 ee0000 cd0000 8b0000 rosybrown "
+    "bc8f8f ffc1c1 eeb4b4 cd9b9b 8b6969 royalblue 4169e1 4876ff 436eee "
+    "3a5fcd 27408b saddlebrown 8b4513 salmon fa8072 ff8c69 ee8262 cd7054 "
+    "8b4c39 sandybrown f4a460 seagreen 2e8b57 54ff9f 4eee94 43cd80 2e8b57 "
+    "seashell fff5ee fff5ee eee5de cdc5bf 8b8682 sienna a0522d ff8247 "
+    "ee7942 cd6839 8b4726 silver c0c0c0 skyblue 87ceeb 87ceff 7ec0ee "
+    "6ca6cd 4a708b slateblue 6a5acd 836fff 7a67ee 6959cd 473c8b slategray "
+    "708090 c6e2ff b9d3ee 9fb6cd 6c7b8b snow fffafa fffafa eee9e9 cdc9c9 "
+    "8b8989 springgreen 00ff7f 00ff7f 00ee76 00cd66 008b45 steelblue "
+    "4682b4 63b8ff 5cacee 4f94cd 36648b tan d2b48c ffa54f ee9a49 cd853f "
+    "8b5a2b teal 008080 thistle d8bfd8 ffe1ff eed2ee cdb5cd 8b7b8b tomato "
+    "ff6347 ff6347 ee5c42 cd4f39 8b3626 turquoise 40e0d0 00f5ff 00e5ee "
+    "00c5cd 00868b violet ee82ee violetred d02090 ff3e96 ee3a8c cd3278 "
+    "8b2252 wheat f5deb3 ffe7ba eed8ae cdba96 8b7e66 white ffffff "
+    "whitesmoke f5f5f5 yellow ffff00 ffff00 eeee00 cdcd00 8b8b00 "
+    "yellowgreen 9acd32")
+_TK_GRAY_LEVELS = (
+    "000305080a0d0f1214171a1c1f212426292b2e303336383b3d404245474a4d4f5254"
+    "57595c5e616366696b6e707375787a7d7f8285878a8c8f919496999c9ea1a3a6a8ab"
+    "adb0b3b5b8babdbfc2c4c7c9cccfd1d4d6d9dbdee0e3e5e8ebedf0f2f5f7fafcff")
+_HEX_COLOR = re.compile(r"#(?:[0-9a-fA-F]{3}){1,4}$")
+_COLOR_CACHE_SIZE = 4096
+_packed_by_color = {None: None, "": None}  # Colors seen, resolved
+_packed_by_tk_name = None  # Each normalized Tk color name, resolved
+
+
+def _tk_color_names():
+    """
+    Returns a dictionary that maps each (normalized) Tk color name
+    to its packed RGB int, decoding the table above the first time.
+    """
+    global _packed_by_tk_name
+    if _packed_by_tk_name is None:
+        names = {}
+        name = None
+        variant = 0
+        for word in _TK_COLORS.split():
+            if len(word) == 6 and _HEX_COLOR.match("#" + word):
+                names[name + (str(variant) if variant else "")] = \
+                    int(word, 16)
+                variant = variant + 1
+            else:
+                name = word
+                variant = 0
+        for level in range(101):
+            value = int(_TK_GRAY_LEVELS[2 * level:2 * level + 2], 16)
+            names["gray" + str(level)] = value * 0x010101
+        _packed_by_tk_name = names
+    return _packed_by_tk_name
+
+
+def _color_to_packed(color):
+    """
+    Returns the given color (see above) as a packed RGB int 0xRRGGBB,
+    or None if it is transparent.  Raises an Exception if it is not
+    a color.
+    """
+    if isinstance(color, Color):
+        return color.packed
+    try:
+        return _packed_by_color[color]
+    except KeyError:
+        packed = _parse_color(color)
+    except TypeError:  # Not hashable (e.g. a list), so not cached
+        return _parse_color(color)
+    if len(_packed_by_color) < _COLOR_CACHE_SIZE:
+        _packed_by_color[color] = packed
+    return packed
+
+
+def _parse_color(color):
+    if isinstance(color, (tuple, list)):
+        if len(color) == 3 and all(isinstance(part, numbers.Integral)
+                                   and 0 <= part < 256 for part in color):
+            red, green, blue = (int(part) for part in color)
+            return (red << 16) | (green << 8) | blue
+    elif isinstance(color, str):
+        if _HEX_COLOR.match(color):
+            digits = (len(color) - 1) // 3
+            packed = 0
+            for k in range(3):
+                part = int(color[1 + k * digits:1 + (k + 1) * digits], 16)
+                # As in Tk, the digits are the most significant bits.
+                if digits == 1:
+                    part = part << 4
+                else:
+                    part = part >> (4 * digits - 8)
+                packed = (packed << 8) | part
+            return packed
+        name = color.lower().replace(" ", "").replace("grey", "gray")
+        packed = _tk_color_names().get(name)
+        if packed is not None:
+            return packed
+        if _master_Tk is not None:
+            # Perhaps a color that only this platform's Tk knows,
+            # e.g. SystemButtonFace on Windows.
+            try:
+                red, green, blue = _master_Tk.winfo_rgb(color)
+                return ((red >> 8) << 16) | ((green >> 8) << 8) | (blue >> 8)
+            except tkinter.TclError:
+                pass
+
+    msg = "{!r} is not a color.\n".format(color)
+    msg += 'Use a color name (like "red" or "midnight blue"),\n'
+    msg += 'a string like "#ff8000", or an rg.Color.'
+    raise Exception(msg)
+
+
+def _check_color(color):
+    """
+    Raises an Exception if the given color is not a color -- except for
+    a name that is unknown while no Tk window exists, which only warns:
+    it may be a color that only this platform's Tk knows (e.g.
+    SystemButtonFace on Windows), which cannot be checked until then.
+    """
+    try:
+        _color_to_packed(color)
+    except Exception:
+        if (_master_Tk is not None or not isinstance(color, str)
+                or color.startswith("#")):
+            raise
+        msg = "{!r} is not a known color name.".format(color)
+        msg += "  It will be checked when it is first drawn."
+        warnings.warn(msg, stacklevel=3)
+
+
+def _color_to_rgb(color):
+    """
+    Returns the (red, green, blue) tuple for the given color (see above),
+    or () if it is transparent.
+    """
+    packed = _color_to_packed(color)
+    if packed is None:
+        return ()
+    return (packed >> 16, (packed >> 8) & 255, packed & 255)
+
+
+def _packed_to_string(packed):
+    return "#{:06x}".format(packed)
+
+
+_tk_color_by_color = {None: "", "": ""}  # Colors seen, as given to Tk
+
+
+def _tk_color(color):
+    """
+    Returns the given color (see above) as the "#rrggbb" string that is
+    given to Tk (which knows nothing of tuples, for example), or "" if
+    it is transparent.
+    """
+    if isinstance(color, Color):  # Not cached, since a Color can change
+        return repr(color)
+    try:
+        return _tk_color_by_color[color]
+    except KeyError:
+        pass
+    except TypeError:  # Not hashable (e.g. a list), so not cached
+        return _packed_to_string(_color_to_packed(color))
+    packed = _color_to_packed(color)
+    string = "" if packed is None else _packed_to_string(packed)
+    if len(_tk_color_by_color) < _COLOR_CACHE_SIZE:
+        _tk_color_by_color[color] = string
+    return string
+
+
+def blend_colors(color_1, color_2, fraction):
+    """
+    Returns the color that is the given fraction of the way from color_1
+    to color_2 (so 0 gives color_1, 1 gives color_2, and 0.5 the color
+    halfway between them), as a "#rrggbb" string.  Fast enough to use
+    for many shapes on every frame of an animation.
+    Example:
+       circle.fill_color = rg.blend_colors("red", "blue", k / 100)
+    """
+    packed_1 = _color_to_packed(color_1)
+    packed_2 = _color_to_packed(color_2)
+    if packed_1 is None or packed_2 is None:
+        raise Exception("Cannot blend a transparent color.")
+    return _packed_to_string(_blend_packed(packed_1, packed_2, fraction))
+
+
+def color_gradient(color_1, color_2, steps):
+    """
+    Returns a list of  steps  colors (as "#rrggbb" strings, see
+    blend_colors) going evenly from color_1 to color_2, inclusive.
+    Example:
+       fades = rg.color_gradient("white", "dark green", 60)
+       for k in range(60):
+           square.fill_color = fades[k]
+           window.render(0.02)
+    """
+    if steps == 1:
+        return [blend_colors(color_1, color_2, 0)]
+    return [blend_colors(color_1, color_2, k / (steps - 1))
+            for k in range(steps)]
+
+
+def _blend_packed(packed_1, packed_2, fraction):
+    packed = 0
+    for shift in (16, 8, 0):
+        part_1 = (packed_1 >> shift) & 255
+        part_2 = (packed_2 >> shift) & 255
+        part = int(part_1 + (part_2 - part_1) * fraction + 0.5)
+        packed = packed | (min(max(part, 0), 255) << shift)
+    return packed
+
+
+
+# ----------------------------------------------------------------------
+# Headless backend:  RoseWindows drawn without a display.
+#
+# A _HeadlessRoseWindow has no tkinter parts.  Its RoseCanvases draw on
+# a _HeadlessCanvas, which keeps the canvas items (ovals, rectangles,
+# lines and text) just as a tkinter.Canvas does, using the same
+# coordinates and options, and rasterizes them on demand into a
+# _Framebuffer that can be saved as a PNG or PPM file.
+# ----------------------------------------------------------------------
+class _HeadlessRoseWindow(RoseWindow):
+    """
+    A RoseWindow that needs no display.  Rendering it is fast
+    (pauses are skipped) and nobody can click on it, so waiting for
+    a mouse click returns None at once.
+    """
+    _is_headless = True
+
+    def __init__(self, width=400, height=300, title="Rose Graphics",
+                 color="black", canvas_color=None,
+                 make_initial_canvas=True, backend="headless"):
+        self.toplevel = None
+        self.title = title
+        self._is_closed = False
+
+        self.width = width
+        self.height = height
+
+        if make_initial_canvas:
+            self.initial_canvas = RoseCanvas(self, width, height,
+                                             canvas_color)
+        else:
+            self.initial_canvas = None
+
+        self.widgets = [self.initial_canvas]
+
+        self.mouse = Mouse()
+        self.keyboard = Keyboard()
+
+        self.animation_stats = None  # Set by run_animation
+        self._animation_is_running = False
+
+    def close(self):
+        """ Closes this RoseWindow. """
+        self._stop_recordings()
+        self._is_closed = True
+
+    def update(self):
+        """ There are no events to handle in a headless window. """
+
+    def get_next_mouse_click(self, timeout=None):
+        """ Returns None, since nobody can click on a headless window. """
+        return None
+
+    async def next_click(self, timeout=None):
+        """ Returns None, since nobody can click on a headless window. """
+        return None
+
+    def _wake_up(self):
+        pass
+
+    def _make_tkinter_canvas(self, width, height, background_color):
+        """ Returns a new _HeadlessCanvas (instead of a tkinter.Canvas). """
+        return _HeadlessCanvas(width, height, background_color)
+
 
-#     def clone(self):
-#         return Square(self.center, self.length_of_each_side)
+class _HeadlessCanvas(object):
+    """
+    Stands in for a tkinter.Canvas on a headless window.  It supports
+    the parts of the tkinter.Canvas API that RoseCanvas uses and keeps
+    its items in the order they were created (bottom-most first).
+    """
+    # Tk's default background color for a canvas.
+    default_background_color = "#d9d9d9"
 
-#     def get_bounding_box(self):
-#         return Rectangle(self.center,
-#                          2 * self.length_of_each_side,
-#                          2 * self.length_of_each_side)
+    _COLOR_OPTIONS = ("fill", "outline")
 
-# FIXME: Implement bounding_box using the tkinter function for it.
+    def __init__(self, width, height, background_color=None):
+        self.width = int(width)
+        self.height = int(height)
+        if background_color in (None, 0, ""):
+            background_color = _HeadlessCanvas.default_background_color
+        self.background_rgb = _color_to_rgb(background_color)
 
-    def _get_coordinates_for_drawing(self):
-        return [self.center.x, self.center.y]
+        self._items = {}  # id -> [item type, coordinates, options]
+        self._next_id = 1
 
-# Mark: Window/RoseWindow naming collision is causing mass confusion.
-# class Window(_Shape):
-#    """ Not yet implemented. """
-#    default_options = {}
+    def grid(self, **options):
+        pass
 
+    def _create(self, item_type, coordinates, options):
+        item_id = self._next_id
+        self._next_id = self._next_id + 1
+        self._items[item_id] = [item_type, coordinates, {}]
+        if len(coordinates) == 1:  # A sequence of coordinates
+            self.coords(item_id, *coordinates)
+        if options:
+            self.itemconfigure(item_id, options)
+        return item_id
+
+    def create_oval(self, *coordinates, **options):
+        return self._create("oval", coordinates, options)
+
+    def create_rectangle(self, *coordinates, **options):
+        return self._create("rectangle", coordinates, options)
+
+    def create_line(self, *coordinates, **options):
+        return self._create("line", coordinates, options)
+
+    def create_polygon(self, *coordinates, **options):
+        return self._create("polygon", coordinates, options)
+
+    def create_text(self, *coordinates, **options):
+        return self._create("text", coordinates, options)
+
+    def create_image(self, *coordinates, **options):
+        # The image is a _Framebuffer, drawn with its upper-left corner
+        # at the given point.
+        return self._create("image", coordinates, options)
+
+    def coords(self, item_id, *coordinates):
+        if len(coordinates) == 1:  # A sequence of coordinates
+            coordinates = tuple(coordinates[0])
+        self._items[item_id][1] = coordinates
+
+    def itemconfigure(self, item_id, options=None, **more_options):
+        item_options = self._items[item_id][2]
+        for given in (options or {}), more_options:
+            for name, value in given.items():
+                if value is None:
+                    continue
+                if name in _HeadlessCanvas._COLOR_OPTIONS:
+                    # As 3 bytes, ready for drawing (b"" if transparent).
+                    # Fails here (as tkinter does) if the color is unknown.
+                    value = bytes(_color_to_rgb(value))
+                item_options[name] = value
+
+    def delete(self, *item_ids):
+        for item_id in item_ids:
+            self._items.pop(item_id, None)
+
+    def cget(self, option):
+        """ Returns the canvas's "width" or "height". """
+        return {"width": self.width, "height": self.height}[option]
+
+    def tag_raise(self, item_id):
+        """ Moves the given item above all the other items. """
+        self._items[item_id] = self._items.pop(item_id)
+
+    def tag_lower(self, item_id):
+        """ Moves the given item below all the other items. """
+        items = {item_id: self._items.pop(item_id)}
+        items.update(self._items)
+        self._items = items
+
+    def rasterize(self):
+        """ Returns a new _Framebuffer with all the items drawn on it. """
+        framebuffer = _Framebuffer(self.width, self.height,
+                                   self.background_rgb)
+        self.draw_items_on(framebuffer)
+        return framebuffer
+
+    def draw_items_on(self, framebuffer):
+        """ Draws all the items on the given _Framebuffer. """
+        for item_type, coordinates, options in self._items.values():
+            if item_type == "text":
+                framebuffer.draw_text(coordinates, options)
+            elif item_type == "image":
+                framebuffer.draw_image(coordinates, options["image"])
+            elif item_type == "line":
+                framebuffer.draw_line(coordinates, options)
+            elif item_type == "polygon":
+                framebuffer.fill_polygon(coordinates,
+                                         options.get("fill", b""))
+            else:
+                framebuffer.draw_box_item(item_type, coordinates, options)
+
+
+class _Framebuffer(object):
+    """
+    An in-memory RGB image (3 bytes per pixel, row by row, top row
+    first) plus methods for drawing canvas items on it.  Colors given
+    to its drawing methods are 3 bytes (red, green, blue).  Pixel (x, y)
+    covers the unit square whose upper-left corner is (x, y), as in Tk.
 
-# CONSIDER: Are these right for here?
-class Button(_Shape):
-    """ Not yet implemented. """
-    default_options = {}
+    Everything is drawn as horizontal spans, each written with a single
+    bytearray slice assignment, which keeps pure Python fast.
+    """
 
+    def __init__(self, width, height, background_rgb=(255, 255, 255)):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(bytes(background_rgb) * (width * height))
 
-class Entry(_Shape):
-    """ Not yet implemented. """
-    default_options = {}
+    def get_pixel(self, x, y):
+        """ Returns the (red, green, blue) of the pixel at (x, y). """
+        k = 3 * (y * self.width + x)
+        return tuple(self.pixels[k:k + 3])
 
+    def fill_span(self, y, x_start, x_stop, rgb):
+        """
+        Colors the pixels in row y from x_start up to (but not including)
+        x_stop, clipped to the framebuffer.  The color  rgb  is 3 bytes.
+        """
+        if y < 0 or y >= self.height:
+            return
+        if x_start < 0:
+            x_start = 0
+        if x_stop > self.width:
+            x_stop = self.width
+        if x_start < x_stop:
+            row = 3 * y * self.width
+            self.pixels[row + 3 * x_start:row + 3 * x_stop] = \
+                rgb * (x_stop - x_start)
+
+    def fill_rectangle(self, x1, y1, x2, y2, rgb):
+        """ Fills the pixels whose centers lie in the given rectangle. """
+        x_start = max(int(math.ceil(min(x1, x2) - 0.5)), 0)
+        x_stop = min(int(math.ceil(max(x1, x2) - 0.5)), self.width)
+        if x_start >= x_stop:
+            return
+        span = rgb * (x_stop - x_start)
+        stride = 3 * self.width
+        for y in range(max(int(math.ceil(min(y1, y2) - 0.5)), 0),
+                       min(int(math.ceil(max(y1, y2) - 0.5)), self.height)):
+            row = y * stride
+            self.pixels[row + 3 * x_start:row + 3 * x_stop] = span
+
+    def fill_ellipse(self, center_x, center_y, radius_x, radius_y, rgb,
+                     inner_radius_x=0, inner_radius_y=0):
+        """
+        Fills the pixels whose centers lie in the given ellipse but not
+        in the (optional, concentric) inner ellipse.
+        """
+        if radius_x <= 0 or radius_y <= 0:
+            return
+        has_hole = inner_radius_x > 0 and inner_radius_y > 0
+        pixels = self.pixels
+        width = self.width
+        sqrt = math.sqrt
+        left = center_x - 0.5  # Pixel x is in a span if x >= left - half
+        for y in range(max(int(math.ceil(center_y - radius_y - 0.5)), 0),
+                       min(int(math.ceil(center_y + radius_y - 0.5)),
+                           self.height)):
+            dy = y + 0.5 - center_y
+            t = 1 - (dy / radius_y) ** 2
+            half = radius_x * sqrt(t) if t > 0 else 0.0
+            x_start = int(math.ceil(left - half))
+            x_stop = int(math.ceil(left + half))
+            if has_hole and abs(dy) < inner_radius_y:
+                inner_half = inner_radius_x * sqrt(
+                    1 - (dy / inner_radius_y) ** 2)
+                self.fill_span(y, x_start,
+                               int(math.ceil(left - inner_half)), rgb)
+                self.fill_span(y, int(math.ceil(left + inner_half)),
+                               x_stop, rgb)
+                continue
+            if x_start < 0:
+                x_start = 0
+            if x_stop > width:
+                x_stop = width
+            if x_start < x_stop:
+                row = 3 * y * width
+                pixels[row + 3 * x_start:row + 3 * x_stop] = \
+                    rgb * (x_stop - x_start)
+
+    def fill_polygon(self, coordinates, rgb):
+        """
+        Fills the pixels whose centers lie in the polygon whose vertices
+        are the given coordinates, using the even-odd rule (as Tk does).
+        """
+        if not rgb or len(coordinates) < 6:
+            return
+        points = list(zip(coordinates[0::2], coordinates[1::2]))
+        edges = []  # [top y, bottom y, x at top y, change in x per y]
+        for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]):
+            if y1 == y2:
+                continue
+            if y1 > y2:
+                x1, y1, x2, y2 = x2, y2, x1, y1
+            edges.append((y1, y2, x1, (x2 - x1) / (y2 - y1)))
+        if not edges:
+            return
+        edges.sort()
+
+        active = []
+        next_edge = 0
+        for y in range(max(int(math.ceil(edges[0][0] - 0.5)), 0),
+                       min(int(math.ceil(max(edge[1] for edge in edges)
+                                         - 0.5)), self.height)):
+            center = y + 0.5
+            while next_edge < len(edges) and edges[next_edge][0] <= center:
+                active.append(edges[next_edge])
+                next_edge = next_edge + 1
+            active = [edge for edge in active if edge[1] > center]
+            crossings = sorted(x + (center - top) * slope
+                               for top, _, x, slope in active)
+            for k in range(0, len(crossings) - 1, 2):
+                self.fill_span(y, int(math.ceil(crossings[k] - 0.5)),
+                               int(math.ceil(crossings[k + 1] - 0.5)), rgb)
+
+    def draw_box_item(self, item_type, coordinates, options):
+        """
+        Draws an oval or rectangle item:  its interior in its "fill"
+        color, then its outline (centered on its boundary, "width"
+        pixels thick) in its "outline" color.  Colors that are "" are
+        transparent.
+        """
+        x1, y1, x2, y2 = coordinates[:4]
+        fill = options.get("fill", b"")
+        outline = options.get("outline", b"\x00\x00\x00")
+        half_width = float(options.get("width", 1)) / 2
+
+        if item_type == "oval":
+            center_x, center_y = (x1 + x2) / 2, (y1 + y2) / 2
+            radius_x, radius_y = abs(x2 - x1) / 2, abs(y2 - y1) / 2
+            if fill:
+                self.fill_ellipse(center_x, center_y, radius_x, radius_y,
+                                  fill)
+            if outline and half_width > 0:
+                self.fill_ellipse(center_x, center_y,
+                                  radius_x + half_width,
+                                  radius_y + half_width,
+                                  outline,
+                                  radius_x - half_width,
+                                  radius_y - half_width)
+        else:
+            left, right = min(x1, x2), max(x1, x2)
+            top, bottom = min(y1, y2), max(y1, y2)
+            if fill:
+                self.fill_rectangle(left, top, right, bottom, fill)
+            if outline and half_width > 0:
+                w = half_width
+                self.fill_rectangle(left - w, top - w, right + w, top + w,
+                                    outline)
+                self.fill_rectangle(left - w, bottom - w, right + w,
+                                    bottom + w, outline)
+                self.fill_rectangle(left - w, top + w, left + w, bottom - w,
+                                    outline)
+                self.fill_rectangle(right - w, top + w, right + w,
+                                    bottom - w, outline)
+
+    def draw_line(self, coordinates, options):
+        """
+        Draws a line item (a polyline through the given coordinates),
+        "width" pixels thick, in its "fill" color.  Arrow-heads are not
+        drawn.
+        """
+        rgb = options.get("fill", b"\x00\x00\x00")
+        if not rgb:
+            return
+        thickness = max(float(options.get("width", 1)), 1.0)
+        points = list(zip(coordinates[0::2], coordinates[1::2]))
+        for (x1, y1), (x2, y2) in zip(points, points[1:]):
+            self._draw_segment(x1, y1, x2, y2, thickness, rgb)
+
+    def _draw_segment(self, x1, y1, x2, y2, thickness, rgb):
+        # Mostly-vertical segments: each row gets a horizontal span
+        # of the given thickness, centered on the segment.
+        half = thickness / 2
+        if abs(y2 - y1) > abs(x2 - x1):
+            if y1 > y2:
+                x1, y1, x2, y2 = x2, y2, x1, y1
+            slope = (x2 - x1) / (y2 - y1)
+            for y in range(max(int(math.ceil(y1 - 0.5)), 0),
+                           min(int(math.ceil(y2 - 0.5)), self.height)):
+                x = x1 + (y + 0.5 - y1) * slope
+                self.fill_span(y, int(math.ceil(x - half - 0.5)),
+                               int(math.ceil(x + half - 0.5)), rgb)
+            return
 
-class Color(object):
+        # Mostly-horizontal segments: each column gets a vertical run
+        # of the given thickness, so each row gets the span of columns
+        # whose run covers it.
+        if x1 > x2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        slope = (y2 - y1) / (x2 - x1) if x2 != x1 else 0.0
+        x_first = int(math.ceil(x1 - 0.5))
+        x_last = int(math.ceil(x2 - 0.5))  # Not included
+        if x_first == x_last:
+            x_last = x_first + 1
+        y_top = min(y1, y2) - half
+        y_bottom = max(y1, y2) + half
+        for y in range(max(int(math.ceil(y_top - 0.5)), 0),
+                       min(int(math.ceil(y_bottom - 0.5)), self.height)):
+            center = y + 0.5
+            if slope == 0:
+                self.fill_span(y, x_first, x_last, rgb)
+                continue
+            # Columns x (at their centers) with |y(x) - center| <= half.
+            a = x1 + (center - half - y1) / slope
+            b = x1 + (center + half - y1) / slope
+            low, high = min(a, b), max(a, b)
+            self.fill_span(y,
+                           max(x_first, int(math.ceil(low - 0.5))),
+                           min(x_last, int(math.floor(high - 0.5)) + 1),
+                           rgb)
+
+    def draw_text(self, coordinates, options):
+        """
+        Draws a text item, centered at its coordinates, in its "fill"
+        color, using a built-in 5 x 7 pixel font scaled to (roughly)
+        the size of the item's font.
+        """
+        rgb = options.get("fill", b"\x00\x00\x00")
+        text = str(options.get("text", ""))
+        if not rgb or not text:
+            return
+        size, is_bold, is_underline, is_overstrike = \
+            _font_characteristics(options.get("font"))
+
+        # Tk font sizes are in points; a glyph cell is 8 pixels tall.
+        scale = max(1, int(round(abs(size) * 4 / 3 / 8)))
+        lines = text.split("\n")
+        cell_width, cell_height = 6 * scale, 8 * scale
+        x_center, y_center = coordinates[0], coordinates[1]
+        top = int(round(y_center - len(lines) * cell_height / 2))
+        for line in lines:
+            left = int(round(x_center - len(line) * cell_width / 2))
+            for k, character in enumerate(line):
+                self._draw_glyph(character, left + k * cell_width, top,
+                                 scale, is_bold, rgb)
+            line_width = len(line) * cell_width
+            if is_underline:
+                self.fill_rectangle(left, top + 7 * scale,
+                                    left + line_width, top + 8 * scale, rgb)
+            if is_overstrike:
+                self.fill_rectangle(left, top + 3 * scale,
+                                    left + line_width, top + 4 * scale, rgb)
+            top = top + cell_height
+
+    def _draw_glyph(self, character, left, top, scale, is_bold, rgb):
+        for row, column_start, column_stop in _glyph_runs(character):
+            x_start = left + column_start * scale
+            x_stop = left + column_stop * scale + (1 if is_bold else 0)
+            for y in range(top + row * scale, top + (row + 1) * scale):
+                self.fill_span(y, x_start, x_stop, rgb)
+
+    def save_ppm(self, filename):
+        """ Saves this image as a (binary) PPM file. """
+        header = "P6\n{} {}\n255\n".format(self.width, self.height)
+        with open(filename, "wb") as file:
+            file.write(header.encode("ascii"))
+            file.write(self.pixels)
+
+    def draw_image(self, coordinates, image):
+        """
+        Copies the given _Framebuffer onto this one, with its upper-left
+        corner at the given (x, y), one row at a time.
+        """
+        left = int(round(coordinates[0]))
+        top = int(round(coordinates[1]))
+        x_start = max(left, 0)
+        x_stop = min(left + image.width, self.width)
+        if x_start >= x_stop:
+            return
+        length = 3 * (x_stop - x_start)
+        for y in range(max(top, 0), min(top + image.height, self.height)):
+            source = 3 * ((y - top) * image.width + (x_start - left))
+            target = 3 * (y * self.width + x_start)
+            self.pixels[target:target + length] = \
+                image.pixels[source:source + length]
+
+    def save_png(self, filename):
+        """ Saves this image as a PNG file. """
+        with open(filename, "wb") as file:
+            file.write(self.to_png())
+
+    def to_png(self):
+        """ Returns this image as the bytes of a PNG file. """
+        stride = 3 * self.width
+        rows = b"".join(b"\x00" + self.pixels[k:k + stride]
+                        for k in range(0, len(self.pixels), stride))
+
+        def chunk(kind, data):
+            return (struct.pack(">I", len(data)) + kind + data +
+                    struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff))
+
+        return (b"\x89PNG\r\n\x1a\n" +
+                chunk(b"IHDR", struct.pack(">IIBBBBB", self.width,
+                                           self.height, 8, 2, 0, 0, 0)) +
+                chunk(b"IDAT", zlib.compress(bytes(rows), 6)) +
+                chunk(b"IEND", b""))
+
+
+def _font_characteristics(font):
     """
-    A Color represents a  fill or outline color created from custom
-    amounts of red, green, and blue light. The arguments are:
-    - The RED component (0-255),
-    - the GREEN component (0-255),
-    - the BLUE component (0-255).
-
-    This Color can be passed to RoseGraphics colors
-    such as fill_color and outline_color.
+    Returns (size, is_bold, is_underline, is_overstrike) for the given
+    font, which is either a tkinter Font or a Tk font description
+    like ("helvetica", 14, "bold roman").
     """
+    if font is None:
+        return _ShapeWithText.defaults["font_size"], False, False, False
+    if isinstance(font, tuple):
+        styles = font[2].split() if len(font) > 2 else []
+        return (font[1], "bold" in styles,
+                "underline" in styles, "overstrike" in styles)
+    return (font.cget("size"), font.cget("weight") == "bold",
+            bool(font.cget("underline")), bool(font.cget("overstrike")))
 
-    def __init__(self, red, green=None, blue=None):
-        self.red = red
-        self.green = green
-        self.blue = blue
 
-    def __repr__(self):
-        return "#{:02x}{:02x}{:02x}".format(self.red, self.green, self.blue)
+# ----------------------------------------------------------------------
+# The built-in font for headless text:  for each printable ASCII
+# character (space through ~), 5 columns of 7 bits each, in hex;
+# bit 0 of each column is the top row of the glyph.
+# ----------------------------------------------------------------------
+_GLYPH_COLUMNS = (
+    "0000000000" "00005f0000" "0007000700" "147f147f14" "242a7f2a12"
+    "2313086462" "3649552250" "0005030000" "001c224100" "0041221c00"
+    "142a1c2a14" "08083e0808" "0050300000" "0808080808" "0060600000"
+    "2010080402" "3e5149453e" "00427f4000" "4261514946" "2141454b31"
+    "1814127f10" "2745454539" "3c4a494930" "0171090503" "3649494936"
+    "064949291e" "0036360000" "0056360000" "0814224100" "1414141414"
+    "0041221408" "0201510906" "3249794136" "7e1111117e" "7f49494936"
+    "3e41414122" "7f4141221c" "7f49494941" "7f09090101" "3e41415132"
+    "7f0808087f" "00417f4100" "2040413f01" "7f08142241" "7f40404040"
+    "7f0204027f" "7f0408107f" "3e4141413e" "7f09090906" "3e4151215e"
+    "7f09192946" "4649494931" "01017f0101" "3f4040403f" "1f2040201f"
+    "7f2018207f" "6314081463" "0304780403" "6151494543" "00007f4141"
+    "0204081020" "41417f0000" "0402010204" "4040404040" "0001020400"
+    "2054545478" "7f48444438" "3844444420" "384444487f" "3854545418"
+    "087e090102" "081454543c" "7f08040478" "00447d4000" "2040443d00"
+    "007f102844" "00417f4000" "7c04180478" "7c08040478" "3844444438"
+    "7c14141408" "081414187c" "7c08040408" "4854545420" "043f444020"
+    "3c4040207c" "1c2040201c" "3c4030403c" "4428102844" "0c5050503c"
+    "4464544c44" "0008364100" "00007f0000" "0041360800" "1008081008")
+
+_glyph_runs_cache = {}
+
+
+def _glyph_runs(character):
+    """
+    Returns a list of (row, column_start, column_stop) runs of lit pixels
+    in the built-in glyph for the given character ("?" if it has none).
+    """
+    runs = _glyph_runs_cache.get(character)
+    if runs is None:
+        index = ord(character) - 32
+        if not 0 <= index < len(_GLYPH_COLUMNS) // 10:
+            index = ord("?") - 32
+        hex_columns = _GLYPH_COLUMNS[10 * index:10 * index + 10]
+        columns = [int(hex_columns[k:k + 2], 16) for k in range(0, 10, 2)]
+        runs = []
+        for row in range(7):
+            start = None
+            for column in range(6):
+                is_lit = column < 5 and columns[column] & (1 << row)
+                if is_lit and start is None:
+                    start = column
+                elif not is_lit and start is not None:
+                    runs.append((row, start, column))
+                    start = None
+        _glyph_runs_cache[character] = runs
+    return runs
 
 
 # begin STUB code for testing
@@ -1612,7 +4602,7 @@ class _RoseWindowStub(RoseWindow):
     def render(self, seconds_to_pause=None):
         pass
 
-    def get_next_mouse_click(self):
+    def get_next_mouse_click(self, timeout=None):
         return Point(0, 0)
 
     def close_on_mouse_click(self):
@@ -1639,11 +4629,21 @@ class _RoseCanvasStub(RoseCanvas):
     def __init__(self, window, width, height, canvas_color):
         # super().__init__(window, width, height, canvas_color)
         # canvases.append(self)
-        self.shapes = []
+        self._shapes_by_id = {}
+        self._changed_shapes = {}
+        self._spatial_index = None
+        self._static_shapes = {}
 
     def _draw(self, shape):
         # super()._draw(shape)
-        self.shapes.append(shape)
+        self._shapes_by_id[id(shape)] = shape
+        if self._spatial_index is not None:
+            self._spatial_index.add(shape)
+
+    def _undraw(self, shape):
+        self._shapes_by_id.pop(id(shape), None)
+        if self._spatial_index is not None:
+            self._spatial_index.remove(shape)
 
     def render(self, seconds_to_pause=None):
         # super().render()  # don"t pause
@@ -1651,10 +4651,26 @@ class _RoseCanvasStub(RoseCanvas):
 
 
 class TurtleWindow(object):
+    _is_headless = False
 
-    def __init__(self):
+    def __new__(cls, *args, backend=None, **kwargs):
+        # Constructing a TurtleWindow with the headless backend
+        # actually constructs a _HeadlessTurtleWindow.
+        if cls is TurtleWindow and _backend_name(backend) == "headless":
+            cls = _HeadlessTurtleWindow
+        return super().__new__(cls)
+
+    def __init__(self, backend=None):
+        """
+        The optional  backend  is "tkinter" or "headless";
+        see the  backend  of a RoseWindow.  SimpleTurtles constructed
+        after a headless TurtleWindow use the headless backend too
+        (until a TurtleWindow that uses tkinter is constructed).
+        """
+        _import_turtle()
         self._screen = turtle.Screen()
         turtle.Turtle._screen = self._screen
+        _HeadlessTurtle._screen = None
 
     def close_on_mouse_click(self):
         message = "To exit, click anywhere in this window"
@@ -1687,6 +4703,23 @@ class TurtleWindow(object):
     def update(self):
         self._screen.update()
 
+    def save_image(self, filename):
+        """
+        Saves what this TurtleWindow shows to the given file:
+        a PNG file if the filename ends in .png, else a PPM file.
+        Available only for windows that use the headless backend.
+          :type  filename:  str
+        """
+        if not self._is_headless:
+            msg = "Only windows that use the headless backend\n"
+            msg += "can save their images."
+            raise Exception(msg)
+        framebuffer = self._screen.rasterize()
+        if filename.lower().endswith(".png"):
+            framebuffer.save_png(filename)
+        else:
+            framebuffer.save_ppm(filename)
+
 
 class ShapesWindow(RoseWindow):
     pass
@@ -1740,25 +4773,37 @@ class SimpleTurtle(object):
        boris.end_fill()
     """
 
-    def __init__(self, shape="classic"):
+    def __init__(self, shape="classic", backend=None):
         """
         What comes in:
           A turtle.Shape that determines how the Turtle looks.
           Defaults to a Bitmap of the "classic" Turtle (an arrowhead) from
           early Turtle Graphics.  Shapes allowed are:
           "turtle"  "arrow"  "classic"  "square"  "circle"  "triangle"  "blank"
+          The optional backend is "tkinter" or "headless" (see TurtleWindow).
 
         Side effects: Constructs and stores in  self._turtle  the "real" Turtle
           to do all the work on behalf of this SimpleTurtle.  This (purposely)
           restricts what this SimpleTurtle knows and can do.
 
         :type shape: str
+        :type backend: str
         """
         self.speed = 1
         self.pen = Pen("black", 1)
         self.paint_bucket = PaintBucket("black")
 
-        self._turtle = turtle.Turtle(shape)
+        if backend is None and _HeadlessTurtle._screen is not None:
+            backend = "headless"  # Draw on the headless TurtleWindow
+        if _backend_name(backend) == "headless":
+            self._turtle = _HeadlessTurtle(shape)
+        else:
+            _import_turtle()
+            self._turtle = turtle.Turtle(shape)
+        self._pushed_state = None  # What _update_real_turtle last pushed
+        self._path = None  # A _TurtlePath while recording
+        self._animate_recording = False
+        self._recorded_fill = (None, None)  # (region, its canvas item)
         self._update_real_turtle()
 
     def forward(self, distance):
@@ -1770,7 +4815,10 @@ class SimpleTurtle(object):
 
         """
         self._update_real_turtle()
-        self._turtle.forward(distance)
+        if self._path is not None:
+            self._path.forward(distance)
+        else:
+            self._turtle.forward(distance)
 
     def backward(self, distance):
         """
@@ -1781,7 +4829,10 @@ class SimpleTurtle(object):
 
         """
         self._update_real_turtle()
-        self._turtle.backward(distance)
+        if self._path is not None:
+            self._path.forward(-distance)
+        else:
+            self._turtle.backward(distance)
 
     def left(self, angle):
         """
@@ -1792,7 +4843,10 @@ class SimpleTurtle(object):
 
         """
         self._update_real_turtle()
-        self._turtle.left(angle)
+        if self._path is not None:
+            self._path.left(angle)
+        else:
+            self._turtle.left(angle)
 
     def right(self, angle):
         """
@@ -1803,7 +4857,10 @@ class SimpleTurtle(object):
 
         """
         self._update_real_turtle()
-        self._turtle.right(angle)
+        if self._path is not None:
+            self._path.left(-angle)
+        else:
+            self._turtle.right(angle)
 
     def go_to(self, point):
         """
@@ -1815,7 +4872,10 @@ class SimpleTurtle(object):
 
         """
         self._update_real_turtle()
-        self._turtle.goto(point.x, point.y)
+        if self._path is not None:
+            self._path.go_to(point.x, point.y)
+        else:
+            self._turtle.goto(point.x, point.y)
 
     def set_heading(self, to_angle):
         """
@@ -1837,7 +4897,10 @@ class SimpleTurtle(object):
           :type to_angle: float
         """
         self._update_real_turtle()
-        self._turtle.setheading(to_angle)
+        if self._path is not None:
+            self._path.set_heading(to_angle)
+        else:
+            self._turtle.setheading(to_angle)
 
     def draw_circle(self, radius):
         """
@@ -1848,7 +4911,10 @@ class SimpleTurtle(object):
 
         """
         self._update_real_turtle()
-        self._turtle.circle(radius)
+        if self._path is not None:
+            self._path.draw_circle(radius)
+        else:
+            self._turtle.circle(radius)
 
     def draw_square(self, length_of_sides):
         """
@@ -1887,7 +4953,10 @@ class SimpleTurtle(object):
 
         """
         self._update_real_turtle()
-        self._turtle.penup()
+        if self._path is not None:
+            self._path.pen_up()
+        else:
+            self._turtle.penup()
 
     def pen_down(self):
         """
@@ -1899,7 +4968,10 @@ class SimpleTurtle(object):
 
         """
         self._update_real_turtle()
-        self._turtle.pendown()
+        if self._path is not None:
+            self._path.pen_down()
+        else:
+            self._turtle.pendown()
 
     def x_cor(self):
         """
@@ -1909,6 +4981,8 @@ class SimpleTurtle(object):
         x = sally.x_cor()
 
         """
+        if self._path is not None:
+            return self._path.x
         return self._turtle.xcor()
 
     def y_cor(self):
@@ -1919,6 +4993,8 @@ class SimpleTurtle(object):
         y = sally.y_cor()
 
         """
+        if self._path is not None:
+            return self._path.y
         return self._turtle.ycor()
 
     def begin_fill(self):
@@ -1941,7 +5017,10 @@ class SimpleTurtle(object):
 
         """
         self._update_real_turtle()
-        self._turtle.begin_fill()
+        if self._path is not None:
+            self._path.begin_fill()
+        else:
+            self._turtle.begin_fill()
 
     def end_fill(self):
         """
@@ -1963,7 +5042,10 @@ class SimpleTurtle(object):
 
         """
         self._update_real_turtle()
-        self._turtle.end_fill()
+        if self._path is not None:
+            self._path.end_fill()
+        else:
+            self._turtle.end_fill()
 
     def clear(self):
         """ Not yet implemented. """
@@ -1976,11 +5058,307 @@ class SimpleTurtle(object):
         """ Not yet implemented. """
         pass
 
+    def start_recording(self, animate=False):
+        """
+        Makes this SimpleTurtle RECORD its moves (very fast) instead of
+        drawing them one at a time (slowly, as an animation).
+        What it records appears when  flush  or  stop_recording  is
+        called, with each stretch drawn with the pen down (and the same
+        pen) as a single line.  If  animate  is True, those lines appear
+        one after another; otherwise they all appear at once.
+        Example (assuming  sally  is an rg.SimpleTurtle):
+
+        sally.start_recording()
+        for k in range(100000):
+            sally.left(91)
+            sally.forward(k % 300)
+        sally.stop_recording()
+
+        """
+        if self._path is None:
+            self._path = _TurtlePath(self._turtle.xcor(),
+                                     self._turtle.ycor(),
+                                     self._turtle.heading(),
+                                     self._turtle.isdown())
+            self._update_real_turtle()
+        self._animate_recording = animate
+
+    def flush(self):
+        """
+        Draws what this SimpleTurtle has recorded (since it started
+        recording or was last flushed) and moves its Turtle to where the
+        recording left it.  Does nothing if it is not recording.
+
+        To draw each stroke as a single canvas item, this uses methods of
+        the turtle module that are private to it (_createline, _drawline,
+        _createpoly and _drawpoly of its Screen).  If this version of the
+        turtle module does not have them, it draws the strokes with the
+        public Turtle methods instead (more slowly).
+        """
+        path = self._path
+        if path is None:
+            return
+        screen = self._turtle.screen
+        if isinstance(screen, _HeadlessTurtleScreen):
+            self._add_items_to_headless_screen(screen, path.take_items())
+        elif (hasattr(self._turtle, "items") and
+                all(hasattr(screen, name)
+                    for name in _TURTLE_SCREEN_INTERNALS)):
+            self._draw_items_on_canvas(screen, path.take_items())
+        else:
+            self._draw_items_with_turtle(path.take_items(),
+                                         path._fill_item)
+
+        # Move the real Turtle (at once, without drawing) to match:
+        self._turtle.speed(0)
+        self._turtle.penup()
+        self._turtle.goto(path.x, path.y)
+        self._turtle.setheading(path.heading)
+        if path.pen_is_down:
+            self._turtle.pendown()
+        self._pushed_state = None  # Its speed (at least) has changed
+        screen.update()
+
+    def _add_items_to_headless_screen(self, screen, items):
+        """
+        Adds the given items (see _TurtlePath) to the items of the given
+        _HeadlessTurtleScreen (which are in the same form).  A region
+        still being filled is added once and grows there.
+        """
+        for path_item in items:
+            if path_item is not self._recorded_fill[0]:
+                screen.items.append(path_item)
+            if path_item[0] == "polygon":
+                self._recorded_fill = (path_item, None)
+
+    def _draw_items_on_canvas(self, screen, items):
+        """
+        Draws the given items (see _TurtlePath) on the canvas of the given
+        turtle.Screen, one canvas item per item, with the Screen's
+        private methods.
+        """
+        for path_item in items:
+            kind, color, thickness, points = path_item
+            coordinates = list(zip(points[0::2], points[1::2]))
+            if kind == "line":
+                item = screen._createline()
+                self._turtle.items.append(item)  # So that  clear  clears it
+                screen._drawline(item, coordinates, fill=color,
+                                 width=thickness)
+            elif len(coordinates) < 3:
+                continue  # Nothing to fill (yet)
+            else:
+                # A region still being filled was drawn by the previous
+                # flush (under what was drawn after it) and grows here.
+                if self._recorded_fill[0] is path_item:
+                    item = self._recorded_fill[1]
+                else:
+                    item = screen._createpoly()
+                    self._turtle.items.append(item)
+                self._recorded_fill = (path_item, item)
+                screen._drawpoly(item, coordinates, fill=color, outline="")
+            if self._animate_recording:
+                screen.update()
+
+    def _draw_items_with_turtle(self, items, unfinished_fill):
+        """
+        Draws the given items (see _TurtlePath) by moving the real Turtle
+        with only public Turtle methods -- except for  unfinished_fill
+        (if not None), a region that is still being filled, which is
+        drawn (whole) by the flush after the region is finished.
+        """
+        real_turtle = self._turtle
+        real_turtle.speed(0)
+        for path_item in items:
+            if path_item is unfinished_fill:
+                continue
+            kind, color, thickness, points = path_item
+            real_turtle.penup()
+            real_turtle.goto(points[0], points[1])
+            if kind == "line":
+                real_turtle.pencolor(color)
+                real_turtle.pensize(thickness)
+                real_turtle.pendown()
+            else:
+                real_turtle.fillcolor(color)
+                real_turtle.begin_fill()
+            for k in range(2, len(points), 2):
+                real_turtle.goto(points[k], points[k + 1])
+            if kind != "line":
+                real_turtle.end_fill()
+            if self._animate_recording:
+                real_turtle.screen.update()
+
+    def stop_recording(self):
+        """
+        Draws what this SimpleTurtle has recorded (see  flush)
+        and makes it draw its moves one at a time again.
+        """
+        if self._path is None:
+            return
+        filling = self._path.is_filling()
+        if filling:
+            self._path.end_fill()
+        self.flush()
+        self._path = None
+        self._update_real_turtle()
+        if filling:
+            self._turtle.begin_fill()
+
     def _update_real_turtle(self):
-        self._turtle.pencolor(self.pen.color)
-        self._turtle.pensize(self.pen.thickness)
-        self._turtle.fillcolor(self.paint_bucket.color)
-        self._turtle.speed(self.speed)
+        """
+        Gives the real Turtle this SimpleTurtle's pen, paint_bucket and
+        speed.  Each of those calls can make the Turtle's screen update,
+        so only the values that changed since they were last given
+        to the real Turtle are given to it again.
+        While recording, gives the pen and paint_bucket to the recording.
+        """
+        if self._path is not None:
+            self._path.set_style(self.pen.color, self.pen.thickness,
+                                 self.paint_bucket.color)
+            return
+        state = (self.pen.color, self.pen.thickness,
+                 self.paint_bucket.color, self.speed)
+        pushed = self._pushed_state
+        if state == pushed:
+            return
+        if pushed is None or state[0] != pushed[0]:
+            self._turtle.pencolor(state[0])
+        if pushed is None or state[1] != pushed[1]:
+            self._turtle.pensize(state[1])
+        if pushed is None or state[2] != pushed[2]:
+            self._turtle.fillcolor(state[2])
+        if pushed is None or state[3] != pushed[3]:
+            self._turtle.speed(state[3])
+        self._pushed_state = state
+
+
+class _TurtlePath(object):
+    """
+    The geometry of a turtle's drawing, computed in pure Python (without
+    the  turtle  module):  where the turtle is, which way it is heading,
+    whether its pen is down, and what it has drawn so far, as vector data.
+
+    What it has drawn is in  items, in the order drawn, each one a list:
+      ["line", pen_color, pen_thickness, [x0, y0, x1, y1, ...]]
+         for each contiguous stroke drawn with the pen down and
+         the same pen, or
+      ["polygon", fill_color, None, [x0, y0, x1, y1, ...]]
+         for each region filled by  begin_fill  ...  end_fill.
+    Coordinates are turtle coordinates:  (0, 0) is the center of the
+    window, y increases upward, and headings are degrees counterclockwise
+    from east.
+    """
+
+    def __init__(self, x=0.0, y=0.0, heading=0.0, pen_is_down=True,
+                 items=None):
+        self.x = x
+        self.y = y
+        self.heading = heading
+        self.pen_is_down = pen_is_down
+        self.items = [] if items is None else items  # May be shared
+        self._pen = ("black", 1)
+        self._fill_color = "black"
+        self._stroke = None  # Points of the line being drawn, if any
+        self._fill_item = None  # The polygon being filled, if any
+
+    def set_style(self, pen_color, pen_thickness, fill_color):
+        """ Sets the pen and paint-bucket for what is drawn from now on. """
+        pen = (pen_color, pen_thickness)
+        if pen != self._pen:
+            self._pen = pen
+            self._stroke = None
+        self._fill_color = fill_color
+
+    def forward(self, distance):
+        angle = math.radians(self.heading)
+        self.go_to(self.x + distance * math.cos(angle),
+                   self.y + distance * math.sin(angle))
+
+    def left(self, angle):
+        self.heading = (self.heading + angle) % 360
+
+    def set_heading(self, to_angle):
+        self.heading = to_angle % 360
+
+    def pen_up(self):
+        self.pen_is_down = False
+        self._stroke = None
+
+    def pen_down(self):
+        self.pen_is_down = True
+
+    def go_to(self, x, y):
+        if self.pen_is_down:
+            stroke = self._stroke
+            if stroke is None:
+                stroke = [self.x, self.y]
+                self._stroke = stroke
+                self.items.append(["line", self._pen[0], self._pen[1],
+                                   stroke])
+            stroke.append(x)
+            stroke.append(y)
+        if self._fill_item is not None:
+            self._fill_item[3].extend((x, y))
+        self.x = x
+        self.y = y
+
+    def draw_circle(self, radius):
+        """
+        Draws a circle as the  turtle  module does:  a regular polygon
+        with enough sides to look round, centered  radius  units to the
+        left of the turtle, ending where it began.
+        """
+        steps = 1 + int(min(11 + abs(radius) / 6.0, 59.0))
+        turn = 360.0 / steps
+        side = 2.0 * radius * math.sin(math.radians(turn / 2))
+        if radius < 0:
+            side, turn = -side, -turn
+        self.left(turn / 2)
+        for _ in range(steps):
+            self.forward(side)
+            self.left(turn)
+        self.left(-turn / 2)
+
+    def is_filling(self):
+        return self._fill_item is not None
+
+    def begin_fill(self):
+        self._fill_item = ["polygon", self._fill_color, None,
+                           [self.x, self.y]]
+        self.items.append(self._fill_item)
+        self._stroke = None  # So that later lines are drawn over the fill
+
+    def end_fill(self):
+        fill_item = self._fill_item
+        if fill_item is not None:
+            fill_item[1] = self._fill_color
+            self._fill_item = None
+            if len(fill_item[3]) < 6:  # Too few points to fill
+                for k in range(len(self.items) - 1, -1, -1):
+                    if self.items[k] is fill_item:
+                        del self.items[k]
+                        break
+
+    def take_items(self):
+        """
+        Returns the items drawn so far and forgets them (so the next call
+        returns only the items drawn after this call) -- except that
+        a region still being filled is returned again by the next call,
+        since it may grow.
+        """
+        items = self.items[:]
+        del self.items[:]
+        if self._fill_item is not None:
+            self.items.append(self._fill_item)
+        self._stroke = None
+        return items
+
+
+# The private methods of a turtle.Screen that SimpleTurtle.flush uses
+# (if the turtle module has them).
+_TURTLE_SCREEN_INTERNALS = ("_createline", "_drawline",
+                            "_createpoly", "_drawpoly")
 
 
 class Pen(object):
@@ -2027,6 +5405,187 @@ class PaintBucket(object):
         self.color = color
 
 
+# ----------------------------------------------------------------------
+# Headless turtles:  TurtleWindows and SimpleTurtles without a display.
+#
+# A _HeadlessTurtle stands in for the turtle.Turtle of a SimpleTurtle.
+# It computes its drawing with a _TurtlePath (no animation, no tkinter),
+# and all the _HeadlessTurtles on a _HeadlessTurtleScreen share that
+# screen's list of items, so the drawing keeps the order in which it
+# was drawn and can be rasterized into a _Framebuffer on demand.
+# ----------------------------------------------------------------------
+class _HeadlessTurtleWindow(TurtleWindow):
+    """
+    A TurtleWindow that needs no display.  Its SimpleTurtles draw
+    instantly, and nobody can click on it, so  close_on_mouse_click
+    returns at once.
+    """
+    _is_headless = True
+
+    def __init__(self, backend="headless"):
+        self._screen = _HeadlessTurtleScreen()
+        _HeadlessTurtle._screen = self._screen
+
+
+class _HeadlessTurtleScreen(object):
+    """
+    Stands in for the turtle.Screen of a headless TurtleWindow.  It has
+    the turtle.Screen methods that TurtleWindow and SimpleTurtle use.
+    Turtle coordinates have (0, 0) at the center of the screen and
+    y increasing upward, as in the  turtle  module.
+    """
+    width = 800
+    height = 600
+
+    def __init__(self):
+        self.xscale = self.yscale = 1.0
+        self.items = []  # What the turtles drew, as in _TurtlePath
+        self._canvas = _HeadlessTurtleCanvas(self.width, self.height,
+                                             "white")
+
+    def delay(self, milliseconds=None):
+        pass
+
+    def tracer(self, n=None, delay=None):
+        pass
+
+    def update(self):
+        pass
+
+    def exitonclick(self):
+        pass
+
+    def rasterize(self):
+        """
+        Returns a new _Framebuffer with what the turtles drew on it,
+        under any messages displayed on this screen.
+        """
+        framebuffer = _Framebuffer(self.width, self.height,
+                                   self._canvas.background_rgb)
+        x_center = self.width / 2
+        y_center = self.height / 2
+        for kind, color, thickness, points in self.items:
+            coordinates = [None] * len(points)
+            coordinates[0::2] = [x_center + x * self.xscale
+                                 for x in points[0::2]]
+            coordinates[1::2] = [y_center - y * self.yscale
+                                 for y in points[1::2]]
+            rgb = bytes(_color_to_rgb(color))
+            if kind == "line":
+                framebuffer.draw_line(coordinates, {"fill": rgb,
+                                                    "width": thickness})
+            else:
+                framebuffer.fill_polygon(coordinates, rgb)
+        self._canvas.draw_items_on(framebuffer)
+        return framebuffer
+
+
+class _HeadlessTurtleCanvas(_HeadlessCanvas):
+    """
+    The canvas of a _HeadlessTurtleScreen.  As on the canvas of a
+    turtle.Screen, (0, 0) is at its center (and y increases downward).
+    """
+
+    def coords(self, item_id, *coordinates):
+        super().coords(item_id, *coordinates)
+        coordinates = list(self._items[item_id][1])
+        coordinates[0::2] = [x + self.width / 2 for x in coordinates[0::2]]
+        coordinates[1::2] = [y + self.height / 2 for y in coordinates[1::2]]
+        self._items[item_id][1] = coordinates
+
+    def _create(self, item_type, coordinates, options):
+        item_id = super()._create(item_type, (), options)
+        self.coords(item_id, *coordinates)
+        return item_id
+
+
+class _HeadlessTurtle(object):
+    """
+    Stands in for the turtle.Turtle of a SimpleTurtle that uses the
+    headless backend.  It has the turtle.Turtle methods that
+    SimpleTurtle uses; it draws instantly, recording what it draws
+    in the items of its screen.
+    """
+    _screen = None  # The screen of the most recent headless TurtleWindow
+
+    def __init__(self, shape="classic"):
+        # Without a headless TurtleWindow, it draws on a screen of its own
+        # (so that later SimpleTurtles are not made headless by this one).
+        self.screen = _HeadlessTurtle._screen or _HeadlessTurtleScreen()
+        self.items = []
+        self._path = _TurtlePath(items=self.screen.items)
+        self._pen_color = "black"
+        self._pen_size = 1
+        self._fill_color = "black"
+        self._speed = 3
+
+    def _set_style(self):
+        self._path.set_style(self._pen_color, self._pen_size,
+                             self._fill_color)
+
+    def pencolor(self, color):
+        self._pen_color = color
+        self._set_style()
+
+    def pensize(self, width):
+        self._pen_size = width
+        self._set_style()
+
+    def fillcolor(self, color):
+        self._fill_color = color
+        self._set_style()
+
+    def speed(self, speed=None):
+        if speed is None:
+            return self._speed
+        self._speed = speed
+
+    def forward(self, distance):
+        self._path.forward(distance)
+
+    def backward(self, distance):
+        self._path.forward(-distance)
+
+    def left(self, angle):
+        self._path.left(angle)
+
+    def right(self, angle):
+        self._path.left(-angle)
+
+    def goto(self, x, y):
+        self._path.go_to(x, y)
+
+    def setheading(self, to_angle):
+        self._path.set_heading(to_angle)
+
+    def heading(self):
+        return self._path.heading
+
+    def circle(self, radius):
+        self._path.draw_circle(radius)
+
+    def penup(self):
+        self._path.pen_up()
+
+    def pendown(self):
+        self._path.pen_down()
+
+    def isdown(self):
+        return self._path.pen_is_down
+
+    def xcor(self):
+        return self._path.x
+
+    def ycor(self):
+        return self._path.y
+
+    def begin_fill(self):
+        self._path.begin_fill()
+
+    def end_fill(self):
+        self._path.end_fill()
+
+
 # ----------------------------------------------------------------------
 # At the risk of not being Pythonic, we provide a simple type-checking
 # facility that attempts to provide meaningful error messages to
@@ -2052,26 +5611,408 @@ def check_types(pairs):
 
 
 def _serialize_shapes(self):
-    """ Returns a list of strings representing the shapes in sorted order. """
-    # Idea: dump all the stats on all shapes,
-    # then return a sorted list for easy comparison.
-    # Problem: the order in which keys appear in dictionaries is random!
-    # Solution: sort keys and manually print
-    shapes = [shape.__dict__ for shape in self.initial_canvas.shapes]
-    keys_by_shape = [sorted(shape) for shape in shapes]
-
-    for k in range(len(shapes)):
-        shapes[k]["_method_for_drawing"] = None
-        shapes[k]["shape_id_by_canvas"] = None
-
-    result = []
-    for k in range(len(keys_by_shape)):
-        shape = shapes[k]
-        result.append([])
-        for key in keys_by_shape[k]:
-            result[-1].append(str(key) + ":" + str(shape[key]))
-        result[-1] = str(result[-1])
-    return "\n".join(sorted(result))
+    """
+    Returns a string representing the shapes on the given window's
+    initial canvas:  one line per shape (see _serialize_shape),
+    in sorted order, so that two windows showing the same shapes
+    (attached in any order) have the same string.
+    Does NOT modify the shapes.
+    """
+    return "\n".join(sorted(_iterate_serialized_shapes(self)))
+
+
+def _iterate_serialized_shapes(self):
+    """
+    Yields the serialization (see _serialize_shape) of each shape on
+    the given window's initial canvas, in the order they were attached.
+    """
+    for shape in self.initial_canvas._shapes_by_id.values():
+        yield _serialize_shape(shape)
+
+
+def _write_serialized_shapes(self, file):
+    """
+    Writes the serialization of each shape on the given window's
+    initial canvas to the given (text) file, one line per shape,
+    in the order they were attached, without building the whole
+    scene in memory.
+    """
+    for line in _iterate_serialized_shapes(self):
+        file.write(line)
+        file.write("\n")
+
+
+def _serialize_shape(shape):
+    """
+    Returns a canonical, compact JSON string for the given shape:
+    an object with its class name (under "class") and its public
+    attributes, keys sorted, in which Points inside the shape are
+    [x, y] and Colors are "#rrggbb".  Does NOT modify the shape.
+    """
+    attributes = shape._get_public_attributes()
+    names = tuple(attributes)
+    keys = _serialized_keys_cache.get(names)
+    if keys is None:
+        keys = sorted(list(names) + ["class"])
+        keys = [(key, _json_string(key) + ":") for key in keys]
+        _serialized_keys_cache[names] = keys
+
+    class_name = _json_string(shape.__class__.__name__)
+    return "{" + ",".join([
+        prefix + (class_name if key == "class"
+                  else _json_value(attributes[key]))
+        for key, prefix in keys]) + "}"
+
+
+# For each (ordered) tuple of a shape's attribute names, its serialized
+# keys in sorted order, each paired with its JSON prefix, e.g. '"x":'.
+_serialized_keys_cache = {}
+_json_string = json.encoder.encode_basestring_ascii
+
+
+def _json_value(value):
+    """ Returns the JSON for an attribute of a shape (see above). """
+    formatter = _JSON_FORMATTERS.get(type(value))
+    if formatter is not None:
+        return formatter(value)
+    if isinstance(value, Point):
+        return _json_point(value)
+    if isinstance(value, _Shape):
+        return _serialize_shape(value)
+    if isinstance(value, float):
+        return _json_float(float(value))
+    if isinstance(value, int):
+        return repr(int(value))
+    numpy_module = sys.modules.get("numpy")  # Even if not imported here
+    if numpy_module is not None:
+        if isinstance(value, numpy_module.ndarray):
+            return _json_value(value.tolist())
+        if isinstance(value, numpy_module.generic):
+            return _json_value(value.item())
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join([_json_value(item) for item in value]) + "]"
+    return _json_string(str(value))
+
+
+def _json_point(point):
+    return "[" + _json_value(point.x) + "," + _json_value(point.y) + "]"
+
+
+def _json_float(value):
+    if value - value == 0:  # Neither infinite nor NaN
+        return repr(value)
+    return json.dumps(value)
+
+
+_JSON_FORMATTERS = {float: _json_float,
+                    int: int.__repr__,
+                    str: _json_string,
+                    bool: lambda value: "true" if value else "false",
+                    type(None): lambda value: "null",
+                    Point: _json_point}
+
+
+def _diff_serialized_shapes(old, new):
+    """
+    Given two results of  _serialize_shapes, returns a pair of lists:
+      -- the lines of  old  that are not in  new  (removed shapes) and
+      -- the lines of  new  that are not in  old  (added shapes),
+    counting repeated lines (identical shapes) separately.
+    """
+    old_counts = collections.Counter(old.split("\n") if old else [])
+    new_counts = collections.Counter(new.split("\n") if new else [])
+    removed = sorted((old_counts - new_counts).elements())
+    added = sorted((new_counts - old_counts).elements())
+    return removed, added
+
+
+# ----------------------------------------------------------------------
+# Scene recording facility:  a scene log file is the 8 bytes of
+# _SCENE_LOG_MAGIC followed by records, each a kind byte and then:
+#   A (attach), C (change):  shape number, length (4 bytes each), state
+#   D (detach):              shape number
+#   F (end of frame):        frame number
+#   K (keyframe):            frame number, length (8 bytes), then the
+#                            length bytes of an A record per Shape
+# (all numbers big-endian and unsigned).  A shape number identifies one
+# attachment of a Shape;  its state is the JSON of _serialize_shape.
+# A keyframe for frame k is the scene before any events of frame k.
+# ----------------------------------------------------------------------
+_SCENE_LOG_MAGIC = b"RGSCENE1"
+_ATTACH, _CHANGE, _DETACH, _FRAME_END, _KEYFRAME = b"ACDFK"
+_SHAPE_RECORD = struct.Struct(">BII")
+_DETACH_RECORD = struct.Struct(">BI")
+_FRAME_RECORD = struct.Struct(">BI")
+_KEYFRAME_RECORD = struct.Struct(">BIQ")
+
+
+class _SceneRecorder(object):
+    """
+    Writes the events of the Shapes on a RoseCanvas to a scene log file
+    (see above and RoseCanvas.start_recording).
+    """
+
+    def __init__(self, rose_canvas, filename, keyframe_interval):
+        self.keyframe_interval = keyframe_interval
+        self.frame = 0
+        self._file = open(filename, "wb")
+        self._file.write(_SCENE_LOG_MAGIC)
+
+        self._numbers = {}  # id(shape) -> its shape number
+        self._states = {}  # shape number -> its most recently written state
+        self._changed = {}  # id(shape) -> Shape, for Shapes changed this frame
+        self._next_number = 0
+        self._events = 0  # Since the most recent keyframe
+        self._frame_has_events = False
+
+        for shape in rose_canvas._shapes_by_id.values():
+            self._add(shape)
+        self._write_keyframe()
+
+    def _add(self, shape):
+        number = self._next_number
+        self._next_number = number + 1
+        self._numbers[id(shape)] = number
+        state = _serialize_shape(shape).encode()
+        self._states[number] = state
+        return number, state
+
+    def attached(self, shape):
+        number, state = self._add(shape)
+        self._changed.pop(id(shape), None)
+        self._file.write(_SHAPE_RECORD.pack(_ATTACH, number, len(state)))
+        self._file.write(state)
+        self._events += 1
+        self._frame_has_events = True
+
+    def detached(self, shape):
+        number = self._numbers.pop(id(shape))
+        del self._states[number]
+        self._changed.pop(id(shape), None)
+        self._file.write(_DETACH_RECORD.pack(_DETACH, number))
+        self._events += 1
+        self._frame_has_events = True
+
+    def changed(self, shape):
+        self._changed[id(shape)] = shape
+
+    def end_frame(self):
+        """
+        Writes a change record for each Shape whose state changed during
+        this frame, then the end of the frame (and maybe a keyframe).
+        """
+        write = self._file.write
+        for key, shape in self._changed.items():
+            number = self._numbers[key]
+            state = _serialize_shape(shape).encode()
+            if state != self._states[number]:
+                self._states[number] = state
+                write(_SHAPE_RECORD.pack(_CHANGE, number, len(state)))
+                write(state)
+                self._events += 1
+        self._changed = {}
+        self._frame_has_events = False
+
+        write(_FRAME_RECORD.pack(_FRAME_END, self.frame))
+        self.frame += 1
+        if self._events >= max(self.keyframe_interval, len(self._states)):
+            self._write_keyframe()
+        self._file.flush()
+
+    def _write_keyframe(self):
+        body = b"".join([
+            _SHAPE_RECORD.pack(_ATTACH, number, len(state)) + state
+            for number, state in self._states.items()])
+        self._file.write(_KEYFRAME_RECORD.pack(_KEYFRAME, self.frame,
+                                               len(body)))
+        self._file.write(body)
+        self._events = 0
+
+    def close(self):
+        """ Ends the current frame (if need be), closes the file. """
+        if self._changed or self._frame_has_events:
+            self.end_frame()
+        self._file.close()
+        return self.frame
+
+
+class SceneReplayer(object):
+    """
+    Reads a file written by  RoseCanvas.start_recording  (or
+    RoseWindow.start_recording) and shows how the scene evolved:
+    the Shapes at any frame, or the events of any frames.  A frame
+    that was being recorded when the file was cut short (e.g. because
+    the program crashed) is ignored.
+
+    Each Shape is shown as the same JSON that the serialization of a
+    window uses (a "class" key plus the Shape's public attributes), as
+    a string.  Each attachment of a Shape has its own shape number.
+    Example:
+       replayer = rg.SceneReplayer("bouncing.scene")
+       print(replayer.number_of_frames)
+       for shape in replayer.scene_at(100):
+           print(shape)
+       for event in replayer.events(100, 110):
+           print(event)
+    """
+
+    def __init__(self, filename):
+        with open(filename, "rb") as file:
+            self._data = file.read()
+        if not self._data.startswith(_SCENE_LOG_MAGIC):
+            msg = "The file " + filename + "\n"
+            msg += "was not written by  start_recording."
+            raise Exception(msg)
+
+        # The frame number and (record) offset of each keyframe, and the
+        # offset of the end of the last complete frame.
+        self._keyframe_frames = []
+        self._keyframe_offsets = []
+        self._end = len(_SCENE_LOG_MAGIC)
+        self.number_of_frames = 0
+        self._index()
+
+    def _index(self):
+        """ Finds the keyframes and the frames, skipping all states. """
+        data = self._data
+        size = len(data)
+        offset = len(_SCENE_LOG_MAGIC)
+        unpack_shape = _SHAPE_RECORD.unpack_from
+        unpack_frame = _FRAME_RECORD.unpack_from
+        unpack_keyframe = _KEYFRAME_RECORD.unpack_from
+        while offset < size:
+            kind = data[offset]
+            if kind == _ATTACH or kind == _CHANGE:
+                if offset + _SHAPE_RECORD.size > size:
+                    break
+                offset += _SHAPE_RECORD.size + unpack_shape(data, offset)[2]
+            elif kind == _DETACH:
+                offset += _DETACH_RECORD.size
+            elif kind == _FRAME_END:
+                if offset + _FRAME_RECORD.size > size:
+                    break
+                self.number_of_frames = unpack_frame(data, offset)[1] + 1
+                offset += _FRAME_RECORD.size
+                self._end = offset
+            elif kind == _KEYFRAME:
+                if offset + _KEYFRAME_RECORD.size > size:
+                    break
+                _, frame, length = unpack_keyframe(data, offset)
+                if offset + _KEYFRAME_RECORD.size + length > size:
+                    break
+                self._keyframe_frames.append(frame)
+                self._keyframe_offsets.append(offset)
+                offset += _KEYFRAME_RECORD.size + length
+            else:
+                msg = "The scene log is damaged at byte {}.".format(offset)
+                raise Exception(msg)
+
+    def scene_at(self, frame):
+        """
+        Returns a list of the Shapes (as JSON strings) that the given
+        frame (0 for the first render after recording started) showed,
+        bottom-most first.  Negative frames count back from the end.
+          :type  frame:  int
+          :rtype: list[str]
+        """
+        frame = self._check_frame(frame)
+        scene, offset = self._keyframe_before(frame)
+        data = self._data
+        end = self._end
+        unpack_shape = _SHAPE_RECORD.unpack_from
+        while offset < end:
+            kind = data[offset]
+            if kind == _ATTACH or kind == _CHANGE:
+                _, number, length = unpack_shape(data, offset)
+                offset += _SHAPE_RECORD.size
+                scene[number] = data[offset:offset + length]
+                offset += length
+            elif kind == _DETACH:
+                del scene[_DETACH_RECORD.unpack_from(data, offset)[1]]
+                offset += _DETACH_RECORD.size
+            elif kind == _FRAME_END:
+                if _FRAME_RECORD.unpack_from(data, offset)[1] == frame:
+                    break
+                offset += _FRAME_RECORD.size
+            else:  # A keyframe:  the scene already is what it holds
+                offset += (_KEYFRAME_RECORD.size +
+                           _KEYFRAME_RECORD.unpack_from(data, offset)[2])
+        return [state.decode() for state in scene.values()]
+
+    def events(self, first_frame=0, last_frame=None):
+        """
+        Yields the events of the given frames (from  first_frame  through
+        last_frame, which defaults to the last frame), in the order they
+        happened, each as a tuple:
+            (frame, event, shape number, Shape as a JSON string)
+        where event is "attach", "change" or "detach" (whose Shape is
+        None), or "frame" (the end of the frame:  its shape number and
+        Shape are None).
+          :type  first_frame:  int
+          :type  last_frame:  int
+        """
+        first_frame = self._check_frame(first_frame)
+        if last_frame is None:
+            last_frame = self.number_of_frames - 1
+        last_frame = self._check_frame(last_frame)
+        k = bisect.bisect_right(self._keyframe_frames, first_frame) - 1
+        frame = self._keyframe_frames[k]
+        offset = self._keyframe_offsets[k]
+        data = self._data
+        names = {_ATTACH: "attach", _CHANGE: "change"}
+        while offset < self._end and frame <= last_frame:
+            kind = data[offset]
+            event = None
+            if kind == _ATTACH or kind == _CHANGE:
+                _, number, length = _SHAPE_RECORD.unpack_from(data, offset)
+                offset += _SHAPE_RECORD.size
+                event = (frame, names[kind], number,
+                         data[offset:offset + length].decode())
+                offset += length
+            elif kind == _DETACH:
+                number = _DETACH_RECORD.unpack_from(data, offset)[1]
+                event = (frame, "detach", number, None)
+                offset += _DETACH_RECORD.size
+            elif kind == _FRAME_END:
+                event = (frame, "frame", None, None)
+                frame += 1
+                offset += _FRAME_RECORD.size
+            else:
+                offset += (_KEYFRAME_RECORD.size +
+                           _KEYFRAME_RECORD.unpack_from(data, offset)[2])
+            if event is not None and event[0] >= first_frame:
+                yield event
+
+    def _check_frame(self, frame):
+        if frame < 0:
+            frame = frame + self.number_of_frames
+        if not 0 <= frame < self.number_of_frames:
+            msg = "There is no frame {} in this recording".format(frame)
+            msg += " (it has {} frames).".format(self.number_of_frames)
+            raise Exception(msg)
+        return frame
+
+    def _keyframe_before(self, frame):
+        """
+        Returns the scene (a dictionary from shape number to state) of
+        the last keyframe at or before the given frame, and the offset
+        of the record after that keyframe.
+        """
+        k = bisect.bisect_right(self._keyframe_frames, frame) - 1
+        offset = self._keyframe_offsets[k]
+        length = _KEYFRAME_RECORD.unpack_from(self._data, offset)[2]
+        offset += _KEYFRAME_RECORD.size
+        end = offset + length
+
+        data = self._data
+        scene = {}
+        unpack_shape = _SHAPE_RECORD.unpack_from
+        while offset < end:
+            _, number, length = unpack_shape(data, offset)
+            offset += _SHAPE_RECORD.size
+            scene[number] = data[offset:offset + length]
+            offset += length
+        return scene, end
 
 # FIXME (errors):
 #  -- clone() does not really make a copy; it just makes a new one
@@ -0,0 +1,12 @@
+"""
+Lets the tests import  rosegraphics  (from src) and the batch runner
+(from grading).  The tests use only headless windows, so they need no
+display.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("src", "grading"):
+    sys.path.insert(0, os.path.join(ROOT, folder))
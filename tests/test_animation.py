@@ -0,0 +1,42 @@
+"""
+Tests run_animation on headless windows, whose frames run back to back.
+"""
+
+import rosegraphics as rg
+
+
+def make_window():
+    window = rg.RoseWindow(100, 100, backend="headless")
+    circle = rg.Circle(rg.Point(0, 50), 5)
+    circle.attach_to(window)
+    return window, circle
+
+
+def test_runs_for_the_given_seconds():
+    window, circle = make_window()
+    stats = window.run_animation(lambda step: circle.move_by(1, 0),
+                                 fps=30, seconds=2)
+    assert stats.updates == 60
+    assert circle.center.x == 60
+    window.close()
+
+
+def test_stops_when_update_returns_false():
+    window, circle = make_window()
+
+    def update(step):
+        circle.move_by(1, 0)
+        return circle.center.x < 5
+
+    stats = window.run_animation(update, seconds=100)
+    assert stats.updates == 4
+    assert circle.center.x == 5
+    window.close()
+
+
+def test_stops_without_seconds(monkeypatch):
+    monkeypatch.setattr(rg.RoseWindow, "headless_animation_seconds", 3)
+    window, circle = make_window()
+    stats = window.run_animation(lambda step: circle.move_by(1, 0), fps=10)
+    assert stats.updates == 30
+    window.close()
@@ -0,0 +1,105 @@
+"""
+Tests the batch runner (grading/rosegraphics_batch_runner.py) on a few
+small submissions, each run headless in its own process.
+"""
+
+import io
+import json
+import os
+
+import rosegraphics_batch_runner as runner
+
+MODULES = {
+    "alice": {"m1.py": "import rosegraphics as rg\n"
+                       "window = rg.RoseWindow(200, 100)\n"
+                       "circle = rg.Circle(rg.Point(50, 50), 20)\n"
+                       "circle.fill_color = 'red'\n"
+                       "circle.attach_to(window)\n"
+                       "window.render()\n"
+                       "print('drew')\n",
+              "helper.py": "raise Exception('not run')\n"},
+    "bob": {"m1.py": "import rosegraphics as rg\n"
+                     "turtle = rg.SimpleTurtle()\n"
+                     "turtle.forward(50)\n"
+                     "turtle.left(90)\n"
+                     "turtle.forward(20)\n"
+                     "rg.Point(1, 2).no_such_method()\n"},
+    "carol": {"m1.py": "while True:\n"
+                       "    pass\n"},
+}
+
+
+def make_submissions(folder):
+    for submission, modules in MODULES.items():
+        os.makedirs(os.path.join(folder, submission))
+        for name, source in modules.items():
+            with open(os.path.join(folder, submission, name), "w") as file:
+                file.write(source)
+
+
+def run(folder, **options):
+    report = io.StringIO()
+    statuses = runner.run_submissions(folder, report, workers=2,
+                                      timeout=3, **options)
+    results = [json.loads(line) for line in report.getvalue().splitlines()]
+    return statuses, {result["submission"]: result for result in results}
+
+
+def test_find_modules_matches_the_pattern(tmp_path):
+    make_submissions(str(tmp_path))
+    modules = runner.find_modules(str(tmp_path))
+    assert [(submission, os.path.basename(path))
+            for submission, path in modules] == [
+        ("alice", "m1.py"), ("bob", "m1.py"), ("carol", "m1.py")]
+
+
+def test_reports_each_module(tmp_path, monkeypatch):
+    make_submissions(str(tmp_path / "submissions"))
+    monkeypatch.chdir(tmp_path)
+    statuses, results = run("submissions", image_folder="images")
+    assert dict(statuses) == {"ok": 1, "error": 1, "timeout": 1}
+
+    alice = results["alice"]
+    assert alice["status"] == "ok"
+    assert alice["stdout"] == "drew\n"
+    [scene] = alice["scene"]
+    assert json.loads(scene)["fill_color"] == "red"
+    assert os.path.exists(os.path.join("images", "alice__m1__1.png"))
+
+    bob = results["bob"]
+    assert bob["status"] == "error"
+    assert "no_such_method" in bob["error"]
+    assert [stroke[3] for stroke in bob["turtle_drawing"]] == [
+        [0, 0, 50, 0, 50, 20]]
+    assert os.path.exists(os.path.join("images", "bob__m1__turtle.png"))
+    assert "image_error" not in bob
+
+    assert results["carol"]["status"] == "timeout"
+
+
+def test_reports_modules_whose_drawings_cannot_be_described(tmp_path):
+    modules = {
+        "dave": "import rosegraphics as rg\n"
+                "window = rg.RoseWindow(200, 100, make_initial_canvas=False)\n"
+                "print('no canvas')\n",
+        "erin": "import rosegraphics as rg\n"
+                "class Odd(object):\n"
+                "    def __str__(self):\n"
+                "        raise ValueError('odd')\n"
+                "window = rg.RoseWindow(200, 100)\n"
+                "circle = rg.Circle(rg.Point(50, 50), 20)\n"
+                "circle.odd = Odd()\n"
+                "circle.attach_to(window)\n"
+                "print('odd')\n"}
+    for submission, source in modules.items():
+        (tmp_path / submission).mkdir()
+        (tmp_path / submission / "m1.py").write_text(source)
+    statuses, results = run(str(tmp_path))
+    assert dict(statuses) == {"ok": 2}
+
+    assert results["dave"]["stdout"] == "no canvas\n"
+    assert results["dave"]["scene"] == []
+    assert "scene_error" not in results["dave"]
+
+    assert results["erin"]["stdout"] == "odd\n"
+    assert "ValueError: odd" in results["erin"]["scene_error"]
@@ -0,0 +1,110 @@
+"""
+Tests the color table (generated from COLORS.txt) and the other ways
+to give a color:  "#rgb" strings, (red, green, blue) tuples and Colors.
+"""
+
+import os
+import re
+import warnings
+
+import pytest
+import rosegraphics as rg
+
+COLORS_FILE = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "COLORS.txt")
+
+
+def listed_colors():
+    """ Yields each (name, (red, green, blue)) listed in COLORS.txt. """
+    pattern = re.compile(r"'?([A-Za-z][A-Za-z0-9 ]*?)'?\s+(\d+)\s+(\d+)"
+                         r"\s+(\d+)\s*$")
+    with open(COLORS_FILE, encoding="utf-16") as file:
+        for line in file:
+            match = pattern.match(line.strip())
+            if match:
+                yield (match.group(1),
+                       tuple(int(part) for part in match.group(2, 3, 4)))
+
+
+def test_table_has_every_color_in_colors_txt():
+    colors = list(listed_colors())
+    assert len(colors) > 700
+    for name, rgb in colors:
+        assert rg._color_to_rgb(name) == rgb, name
+
+
+def test_names_ignore_case_spaces_and_grey():
+    expected = rg._color_to_packed("midnight blue")
+    assert expected == 0x191970
+    for name in ("MidnightBlue", "midnightblue", "Midnight Blue"):
+        assert rg._color_to_packed(name) == expected
+    assert rg._color_to_packed("dark grey") == rg._color_to_packed(
+        "DarkGray")
+    assert rg._color_to_rgb("gray50") == (127, 127, 127)
+
+
+def test_hex_strings_tuples_and_colors():
+    assert rg._color_to_packed("#f80") == 0xf08000  # As in Tk
+    assert rg._color_to_packed("#ff8000") == 0xff8000
+    assert rg._color_to_packed("#ffff80800000") == 0xff8000
+    assert rg._color_to_packed((255, 128, 0)) == 0xff8000
+    assert rg._color_to_packed(rg.Color(255, 128, 0)) == 0xff8000
+    assert rg._color_to_packed(None) is None
+    assert rg._color_to_packed("") is None
+
+
+def test_color_accepts_any_integer_type():
+    numpy = pytest.importorskip("numpy")
+    color = rg.Color(numpy.uint8(255), numpy.int64(128), 0)
+    assert repr(color) == "#ff8000"
+    assert type(color.green) is int
+    assert rg._color_to_packed((numpy.uint8(1), 2, 3)) == 0x010203
+
+
+def test_color_rejects_bad_components():
+    for bad in (256, -1, 1.5, "10"):
+        with pytest.raises(Exception):
+            rg.Color(bad, 0, 0)
+    color = rg.Color("midnight blue")
+    with pytest.raises(Exception):
+        color.red = 300
+
+
+def test_setting_a_color_checks_it():
+    circle = rg.Circle(rg.Point(0, 0), 5)
+    circle.fill_color = "dark sea green"
+    for bad in ("#12", (1, 2), 5):
+        with pytest.raises(Exception):
+            circle.fill_color = bad
+
+
+@pytest.mark.skipif(rg._master_Tk is not None,
+                    reason="Tk itself checks names once it exists")
+def test_unknown_name_only_warns_before_tk_exists():
+    circle = rg.Circle(rg.Point(0, 0), 5)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        circle.fill_color = "SystemButtonFace"
+    assert circle.fill_color == "SystemButtonFace"
+    assert len(caught) == 1
+    assert caught[0].filename == __file__
+
+
+def test_options_give_tk_hex_strings():
+    circle = rg.Circle(rg.Point(0, 0), 5)
+    circle.fill_color = (255, 0, 0)
+    circle.outline_color = "midnight blue"
+    assert circle._get_options_for_drawing()["fill"] == "#ff0000"
+    assert circle._get_options_for_drawing()["outline"] == "#191970"
+    circle.fill_color = None
+    assert circle._get_options_for_drawing()["fill"] == ""
+
+    line = rg.Line(rg.Point(0, 0), rg.Point(5, 5))
+    line.color = rg.Color(0, 128, 255)
+    assert line._get_options_for_drawing()["fill"] == "#0080ff"
+    line.color = None
+    assert line._get_options_for_drawing()["fill"] == "#000000"
+
+    text = rg.Text(rg.Point(0, 0), "hi")
+    text.text_color = [0, 255, 0]
+    assert text._get_options_for_drawing()["fill"] == "#00ff00"
@@ -0,0 +1,90 @@
+"""
+Tests that rendering re-draws only the Shapes that changed, including
+Shapes that change because a Shape that is part of them (e.g. their
+center) changed.
+"""
+
+import gc
+import weakref
+
+import rosegraphics as rg
+
+
+def make_window():
+    return rg.RoseWindow(200, 100, backend="headless")
+
+
+def test_render_redraws_only_changed_shapes():
+    window = make_window()
+    circles = [rg.Circle(rg.Point(20 * k, 50), 5) for k in range(3)]
+    for circle in circles:
+        circle.attach_to(window)
+    canvas = window.initial_canvas
+
+    window.render()
+    assert canvas.number_of_shapes_rendered == 3
+    window.render()
+    assert canvas.number_of_shapes_rendered == 0
+
+    circles[1].fill_color = "red"
+    window.render()
+    assert canvas.number_of_shapes_rendered == 1
+    window.close()
+
+
+def test_changing_a_shared_point_redraws_its_owners():
+    window = make_window()
+    point = rg.Point(50, 50)
+    circle = rg.Circle(rg.Point(0, 0), 10)
+    line = rg.Line(rg.Point(0, 0), rg.Point(0, 0))
+    circle.center = point  # The constructors clone their Points
+    line.start = point
+    for shape in (circle, line, rg.Circle(rg.Point(5, 5), 5)):
+        shape.attach_to(window)
+    window.render()
+
+    point.x = 60
+    window.render()
+    assert window.initial_canvas.number_of_shapes_rendered == 2
+    window.close()
+
+
+def test_replaced_point_no_longer_marks_its_old_owner():
+    window = make_window()
+    old_center = rg.Point(50, 50)
+    circle = rg.Circle(rg.Point(0, 0), 10)
+    circle.center = old_center
+    circle.attach_to(window)
+    circle.center = rg.Point(70, 50)
+    window.render()
+
+    old_center.x = 10
+    window.render()
+    assert window.initial_canvas.number_of_shapes_rendered == 0
+    window.close()
+
+
+def test_owners_are_held_weakly():
+    point = rg.Point(50, 50)
+    circle = rg.Circle(rg.Point(0, 0), 10)
+    circle.center = point
+    circle_reference = weakref.ref(circle)
+
+    del circle
+    gc.collect()
+    assert circle_reference() is None
+    point.x = 5  # Must not fail, with its owner gone
+
+
+def test_detached_shape_is_not_redrawn():
+    window = make_window()
+    circle = rg.Circle(rg.Point(50, 50), 10)
+    circle.attach_to(window)
+    window.render()
+
+    circle.detach_from(window)
+    circle.radius = 20
+    window.render()
+    assert window.initial_canvas.number_of_shapes_rendered == 0
+    assert window.initial_canvas.shapes == []
+    window.close()
@@ -0,0 +1,100 @@
+"""
+Tests the headless backend's software rasterizer:  what the pixels of
+a rendered canvas are, and the images that it saves.
+"""
+
+import struct
+import zlib
+
+import rosegraphics as rg
+
+
+def rasterize(window):
+    window.render()
+    return window.initial_canvas._tkinter_canvas.rasterize()
+
+
+def test_background_and_filled_shapes():
+    window = rg.RoseWindow(100, 80, canvas_color="white", backend="headless")
+    circle = rg.Circle(rg.Point(30, 40), 10)
+    circle.fill_color = "red"
+    circle.attach_to(window)
+    square = rg.Square(rg.Point(70, 40), 20)
+    square.fill_color = (0, 0, 255)
+    square.attach_to(window)
+
+    image = rasterize(window)
+    assert (image.width, image.height) == (100, 80)
+    assert image.get_pixel(30, 40) == (255, 0, 0)
+    assert image.get_pixel(70, 40) == (0, 0, 255)
+    assert image.get_pixel(2, 2) == (255, 255, 255)
+    assert image.get_pixel(30, 30) == (0, 0, 0)  # The circle's outline
+    window.close()
+
+
+def test_later_shapes_are_drawn_on_top():
+    window = rg.RoseWindow(50, 50, backend="headless")
+    bottom = rg.Rectangle(rg.Point(0, 0), rg.Point(40, 40))
+    bottom.fill_color = "green"
+    bottom.attach_to(window)
+    top = rg.Rectangle(rg.Point(10, 10), rg.Point(30, 30))
+    top.fill_color = "yellow"
+    top.attach_to(window)
+
+    image = rasterize(window)
+    assert image.get_pixel(20, 20) == (255, 255, 0)
+    assert image.get_pixel(5, 20) == (0, 255, 0)
+    window.close()
+
+
+def test_moving_a_shape_moves_its_pixels():
+    window = rg.RoseWindow(60, 40, canvas_color="black", backend="headless")
+    square = rg.Square(rg.Point(10, 20), 8)
+    square.fill_color = "white"
+    square.attach_to(window)
+    assert rasterize(window).get_pixel(10, 20) == (255, 255, 255)
+
+    square.move_by(30, 0)
+    image = rasterize(window)
+    assert image.get_pixel(10, 20) == (0, 0, 0)
+    assert image.get_pixel(40, 20) == (255, 255, 255)
+    window.close()
+
+
+def test_static_layer_looks_the_same():
+    window = rg.RoseWindow(60, 40, backend="headless")
+    for k in range(5):
+        circle = rg.Circle(rg.Point(12 * k + 6, 20), 5)
+        circle.fill_color = "blue"
+        circle.attach_to(window)
+    before = bytes(rasterize(window).pixels)
+
+    window.initial_canvas.make_static()
+    assert bytes(rasterize(window).pixels) == before
+    assert window.initial_canvas.number_of_static_layer_renders == 1
+    window.close()
+
+
+def test_saved_png_has_the_pixels(tmp_path):
+    window = rg.RoseWindow(30, 20, canvas_color="white", backend="headless")
+    line = rg.Line(rg.Point(0, 10), rg.Point(30, 10))
+    line.thickness = 3
+    line.color = "red"
+    line.attach_to(window)
+    window.render()
+    filename = str(tmp_path / "line.png")
+    window.initial_canvas.save_image(filename)
+
+    with open(filename, "rb") as file:
+        data = file.read()
+    assert data.startswith(b"\x89PNG\r\n\x1a\n")
+    width, height = struct.unpack(">II", data[16:24])
+    assert (width, height) == (30, 20)
+    start = data.index(b"IDAT") + 4
+    length = struct.unpack(">I", data[start - 8:start - 4])[0]
+    rows = zlib.decompress(data[start:start + length])
+    stride = 1 + 3 * width
+    assert rows[10 * stride + 1 + 3 * 15:10 * stride + 4 + 3 * 15] == \
+        b"\xff\x00\x00"
+    assert rows[2 * stride + 1:2 * stride + 4] == b"\xff\xff\xff"
+    window.close()
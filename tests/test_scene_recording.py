@@ -0,0 +1,79 @@
+"""
+Tests recording the changes to a canvas (start_recording) and replaying
+them (SceneReplayer), including from keyframes and from a file that
+was cut short.
+"""
+
+import json
+
+import pytest
+import rosegraphics as rg
+
+
+def record(filename, frames=10, keyframe_interval=10000):
+    """
+    Records a window on which a Circle moves right each frame, a Square
+    is attached at frame 3 and detached at frame 6.  Returns the scenes
+    (serialized, bottom-most first) that each frame showed.
+    """
+    window = rg.RoseWindow(200, 100, backend="headless")
+    window.start_recording(filename, keyframe_interval)
+    circle = rg.Circle(rg.Point(10, 50), 5)
+    circle.attach_to(window)
+    square = rg.Square(rg.Point(100, 50), 10)
+    scenes = []
+    for frame in range(frames):
+        if frame == 3:
+            square.attach_to(window)
+        if frame == 6:
+            square.detach_from(window)
+        circle.move_by(10, 0)
+        window.render()
+        scenes.append([rg._serialize_shape(shape)
+                       for shape in window.initial_canvas.shapes])
+    assert window.stop_recording() == frames
+    window.close()
+    return scenes
+
+
+@pytest.mark.parametrize("keyframe_interval", [10000, 2])
+def test_scene_at_each_frame(tmp_path, keyframe_interval):
+    filename = str(tmp_path / "moving.scene")
+    scenes = record(filename, keyframe_interval=keyframe_interval)
+    replayer = rg.SceneReplayer(filename)
+    assert replayer.number_of_frames == len(scenes)
+    for frame, scene in enumerate(scenes):
+        assert replayer.scene_at(frame) == scene
+    assert replayer.scene_at(-1) == scenes[-1]
+    assert json.loads(replayer.scene_at(4)[0])["center"] == [60, 50]
+
+
+def test_events(tmp_path):
+    filename = str(tmp_path / "moving.scene")
+    record(filename)
+    events = list(rg.SceneReplayer(filename).events(3, 6))
+    assert [(frame, event) for frame, event, _, _ in events
+            if event != "change"] == [
+        (3, "attach"), (3, "frame"), (4, "frame"), (5, "frame"),
+        (6, "detach"), (6, "frame")]
+    assert all(shape is not None for _, event, _, shape in events
+               if event in ("attach", "change"))
+
+
+def test_unfinished_frame_is_ignored(tmp_path):
+    filename = str(tmp_path / "moving.scene")
+    scenes = record(filename)
+    with open(filename, "rb") as file:
+        data = file.read()
+    with open(filename, "wb") as file:
+        file.write(data[:-3])  # As if the program crashed
+    replayer = rg.SceneReplayer(filename)
+    assert replayer.number_of_frames == len(scenes) - 1
+    assert replayer.scene_at(-1) == scenes[-2]
+
+
+def test_not_a_scene_file(tmp_path):
+    filename = tmp_path / "other.txt"
+    filename.write_text("hello")
+    with pytest.raises(Exception):
+        rg.SceneReplayer(str(filename))
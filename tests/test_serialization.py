@@ -0,0 +1,91 @@
+"""
+Tests the serialization of the Shapes on a window:  each Shape is one
+line of canonical JSON, which parses back to the Shape's attributes.
+"""
+
+import io
+import json
+
+import pytest
+import rosegraphics as rg
+
+
+def some_shapes():
+    circle = rg.Circle(rg.Point(10, 20.5), 7)
+    circle.fill_color = "midnight blue"
+    rectangle = rg.Rectangle(rg.Point(1, 2), rg.Point(30, 40))
+    rectangle.outline_color = rg.Color(255, 128, 0)
+    text = rg.Text(rg.Point(50, 60), 'Say "hi"\nand bye')
+    line = rg.Line(rg.Point(0, 0), rg.Point(100, 50))
+    line.arrow = "last"
+    return [circle, rectangle, text, line]
+
+
+def window_with(shapes):
+    window = rg.RoseWindow(200, 100, backend="headless")
+    for shape in shapes:
+        shape.attach_to(window)
+    return window
+
+
+def test_each_line_parses_back_to_the_shape():
+    shapes = some_shapes()
+    window = window_with(shapes)
+    lines = list(rg._iterate_serialized_shapes(window))
+    assert len(lines) == len(shapes)
+    for shape, line in zip(shapes, lines):
+        parsed = json.loads(line)
+        assert parsed.pop("class") == type(shape).__name__
+        assert list(parsed) == sorted(parsed)
+        for name, value in shape._get_public_attributes().items():
+            if isinstance(value, rg.Point):
+                assert parsed[name] == [value.x, value.y]
+            elif isinstance(value, rg.Color):
+                assert parsed[name] == repr(value)
+            else:
+                assert parsed[name] == value
+    window.close()
+
+
+def test_attach_order_does_not_matter():
+    first = window_with(some_shapes())
+    second = window_with(list(reversed(some_shapes())))
+    assert rg._serialize_shapes(first) == rg._serialize_shapes(second)
+    first.close()
+    second.close()
+
+
+def test_serializing_does_not_change_the_shapes():
+    shapes = some_shapes()
+    window = window_with(shapes)
+    before = [dict(shape._get_public_attributes()) for shape in shapes]
+    rg._serialize_shapes(window)
+    assert [shape._get_public_attributes() for shape in shapes] == before
+    window.close()
+
+
+def test_numpy_values_serialize_like_python_values():
+    numpy = pytest.importorskip("numpy")
+    shapes = some_shapes()
+    window = window_with(shapes)
+    expected = rg._serialize_shapes(window)
+    shapes[0].radius = numpy.int64(7)
+    shapes[0].center.y = numpy.float64(20.5)
+    assert rg._serialize_shapes(window) == expected
+    window.close()
+
+
+def test_written_lines_match_and_diff_finds_changes():
+    shapes = some_shapes()
+    window = window_with(shapes)
+    old = rg._serialize_shapes(window)
+    file = io.StringIO()
+    rg._write_serialized_shapes(window, file)
+    assert sorted(file.getvalue().splitlines()) == old.split("\n")
+
+    shapes[0].radius = 8
+    removed, added = rg._diff_serialized_shapes(
+        old, rg._serialize_shapes(window))
+    assert [json.loads(line)["radius"] for line in removed] == [7]
+    assert [json.loads(line)["radius"] for line in added] == [8]
+    window.close()
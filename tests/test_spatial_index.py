@@ -0,0 +1,48 @@
+"""
+Tests finding the Shapes at a point or in a rectangle (shapes_at and
+shapes_in), including Shapes and queries with infinite coordinates.
+"""
+
+import math
+
+import rosegraphics as rg
+
+
+def make_window(*shapes):
+    window = rg.RoseWindow(400, 300, backend="headless")
+    for shape in shapes:
+        shape.attach_to(window)
+    return window
+
+
+def test_shapes_at_and_in():
+    small = rg.Circle(rg.Point(20, 20), 5)
+    big = rg.Rectangle(rg.Point(0, 0), rg.Point(400, 300))
+    far = rg.Square(rg.Point(300, 200), 10)
+    window = make_window(small, big, far)
+    canvas = window.initial_canvas
+
+    assert canvas.shapes_at(rg.Point(20, 20)) == [small, big]
+    assert canvas.shapes_at(rg.Point(300, 200)) == [big, far]
+    corner = rg.Rectangle(rg.Point(0, 0), rg.Point(100, 100))
+    assert canvas.shapes_in(corner) == [small]
+    assert canvas.shapes_in(corner, touching=True) == [small, big]
+
+    small.move_by(280, 180)
+    assert canvas.shapes_in(corner) == []
+    assert canvas.shapes_at(rg.Point(300, 200)) == [small, big, far]
+    window.close()
+
+
+def test_infinite_shapes_and_queries():
+    small = rg.Circle(rg.Point(20, 20), 5)
+    endless = rg.Line(rg.Point(-math.inf, 50), rg.Point(math.inf, 50))
+    window = make_window(small, endless)
+    canvas = window.initial_canvas
+
+    assert canvas.shapes_at(rg.Point(1000, 50)) == [endless]
+    everywhere = rg.Rectangle(rg.Point(-math.inf, -math.inf),
+                              rg.Point(math.inf, math.inf))
+    assert canvas.shapes_in(everywhere) == [small, endless]
+    assert canvas.shapes_at(rg.Point(math.inf, 20)) == []
+    window.close()